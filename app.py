@@ -27,7 +27,6 @@ def get_cached_statistics():
         return logic.get_total_statistics()
     except Exception:
         return {"total_checked": 0, "total_fixed": 0, "total_failed": 0, "success_rate": 0}
-import streamlit_authenticator as stauth
 from auth import ensure_auth_config
 import asyncio
 import os
@@ -37,7 +36,6 @@ MAX_LOGIN_ATTEMPTS = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
 LOGIN_LOCKOUT_MINUTES = int(os.getenv("LOGIN_LOCKOUT_MINUTES", "15"))
 
 import datetime as dt
-import pandas as pd
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logic
@@ -46,6 +44,17 @@ import time
 import json
 
 import jobs
+import metrics
+import scheduler
+
+# --- STARTUP: Schema anlegen/migrieren (einmal pro Prozess, nicht mehr beim Import) ---
+@st.cache_resource
+def _startup_init_db():
+    logic.ensure_db()
+    jobs.ensure_jobs_db()
+    return True
+
+_startup_init_db()
 
 @st.cache_resource
 def _startup_cleanup_once():
@@ -53,8 +62,9 @@ def _startup_cleanup_once():
     try:
         removed_logs = jobs.cleanup_old_logs()
         removed_runs = jobs.cleanup_old_scan_runs()
-        if removed_logs or removed_runs:
-            print(f"[CLEANUP] removed_logs={removed_logs} removed_scan_runs={removed_runs}")
+        removed_history = logic.compact_state_history()
+        if removed_logs or removed_runs or removed_history:
+            print(f"[CLEANUP] removed_logs={removed_logs} removed_scan_runs={removed_runs} removed_history={removed_history}")
     except Exception as e:
         print(f"[CLEANUP] error: {e}")
     return True
@@ -151,12 +161,20 @@ def _start_scheduler_thread():
 
 _start_scheduler_thread()
 
+# --- STARTUP: Metrik-Endpunkt /metrics (PSR_METRICS_PORT, 0 = aus) ---
+@st.cache_resource
+def _start_metrics_server():
+    return metrics.start_http_server()
+
+_start_metrics_server()
+
 
 # --- BACKGROUND SCAN JOB RUNNER ---
 
-def _run_scan_job(job_id: str, settings: dict):
+def _run_scan_job(job_id: str, settings: dict, candidates=None):
     """
     Führt einen Scan als Background-Job aus und beachtet cancel_requested aus der DB.
+    candidates: Ergebnis einer Vorschau (logic.discover_candidates), überspringt die Ermittlung.
     """
     import datetime as _dt
     import json as _json
@@ -190,6 +208,7 @@ def _run_scan_job(job_id: str, settings: dict):
         # bei jedem Log einmal cancel_requested checken
         _append_log(msg)
 
+    scan_profile = logic.new_scan_profile(settings)
     try:
         # Scan laufen lassen (wichtig: cancel_flag wird übergeben!)
         stats = logic.start_scan(
@@ -199,23 +218,80 @@ def _run_scan_job(job_id: str, settings: dict):
             cancel_flag=_cancel_check,
             source="manual",
             mark_run_date=False,
+            candidates=candidates,
+            scan_profile=scan_profile,
         )
 
-        if _cancel_check():
-            jobs.set_job_status(job_id, status="cancelled", stats=stats, error="cancelled")
+        if stats is None:
+            jobs.set_job_status(job_id, status="cancelled", stats=None, error="Scan bereits aktiv")
+            _append_log("⏭️ Job übersprungen (Scan läuft bereits).")
+        elif _cancel_check():
+            jobs.set_job_status(job_id, status="cancelled", stats=stats, error="cancelled",
+                                timings=scan_profile.to_dict())
             _append_log("🛑 Job beendet (cancelled).")
         else:
-            jobs.set_job_status(job_id, status="success", stats=stats, error=None)
+            jobs.set_job_status(job_id, status="success", stats=stats, error=None,
+                                timings=scan_profile.to_dict())
             _append_log("✅ Job erfolgreich beendet.")
 
     except Exception as e:
         try:
-            jobs.set_job_status(job_id, status="failed", stats=None, error=str(e))
+            jobs.set_job_status(job_id, status="failed", stats=None, error=str(e),
+                                timings=scan_profile.to_dict())
         except Exception:
             pass
         _append_log(f"❌ Job failed: {e}")
         _append_log(_tb.format_exc())
+
+
+PHASE_LABELS = {
+    "setup": "Start/Verbindung",
+    "phase1": "Phase 1: Sammeln",
+    "phase2": "Phase 2: Analyse",
+    "phase3": "Phase 3: Refresh",
+    "finish": "Abschluss",
+}
+
+
+def _render_job_profile(job: dict) -> None:
+    """Laufzeit-Aufschlüsselung eines Jobs (scan_runs.profile_json)."""
+    import pandas as pd
+
+    if not job.get("profile_json"):
+        return
+    try:
+        prof = json.loads(job["profile_json"])
+    except (TypeError, ValueError):
+        return
+    blocked = prof.get("blocked", {})
+    calls = prof.get("to_thread", {})
+    st.caption(
+        f"🧮 Wall {prof.get('wall_s', 0):.1f}s · CPU {prof.get('cpu_s', 0):.1f}s · "
+        f"Plex {blocked.get('plex_s', 0):.1f}s · SQLite {blocked.get('sqlite_s', 0):.2f}s · "
+        f"Warten {blocked.get('sleep_s', 0):.1f}s · to_thread {calls.get('calls', 0)}× ({calls.get('seconds', 0):.1f}s)"
+    )
+    rows = [
+        {
+            "Phase": PHASE_LABELS.get(name, name),
+            "Wall (s)": p.get("wall_s", 0),
+            "CPU (s)": p.get("cpu_s", 0),
+            "Plex (s)": p.get("plex_s", 0),
+            "SQLite (s)": p.get("sqlite_s", 0),
+            "Warten (s)": p.get("sleep_s", 0),
+            "to_thread": int(p.get("to_thread_calls", 0)),
+        }
+        for name, p in prof.get("phases", {}).items()
+    ]
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        st.caption("Plex/SQLite/Warten summiert über parallele Worker (kann die Wall-Zeit übersteigen).")
+    if prof.get("cprofile") and st.toggle("cProfile anzeigen", key=f"cprofile_{job['job_id']}"):
+        st.code(prof["cprofile"], language="text")
+
+
 def require_auth() -> None:
+    import streamlit_authenticator as stauth  # lazy wie pandas: Startup (DB, Scheduler) braucht es nicht
+
     config = ensure_auth_config()
     authenticator = stauth.Authenticate(
         config["credentials"],
@@ -261,6 +337,7 @@ def get_cached_library_names():
 
 def main():
     require_auth()
+    import pandas as pd  # lazy: Login-Seite und Startup brauchen kein pandas
 
     current_settings = logic.load_settings()
 
@@ -272,8 +349,10 @@ def main():
 
     if schedule_active:
         # Letzten Scan-Zeitpunkt aus run_state holen
-        last_run = logic.load_run_state().get("last_run_date", "Noch nie")
-        st.caption(f"⏰ Zeitplan aktiv: täglich um **{schedule_time}** Uhr · Letzter Lauf: **{last_run}**")
+        last_run = logic.load_run_state().get("last_run_date") or "Noch nie"
+        next_fire = scheduler.get_scheduler().next_fire
+        next_text = f" · Nächster Lauf: **{next_fire.strftime('%d.%m. %H:%M')}**" if next_fire else ""
+        st.caption(f"⏰ Zeitplan aktiv: täglich um **{schedule_time}** Uhr · Letzter Lauf: **{last_run}**{next_text}")
     else:
         st.caption("⏸️ Zeitplan deaktiviert · Nur manuelle Scans")
 
@@ -295,6 +374,14 @@ def main():
         st.session_state.scan_running = bool(running_now)
 
         
+        # Optional: Scan-Profil statt globaler Einstellungen
+        profile_names = [p["name"] for p in current_settings.get("profiles") or []]
+        selected_profile = None
+        if profile_names:
+            choice = col2.selectbox("Profil", ["Standard (Einstellungen)"] + profile_names, key="scan_profile")
+            if choice in profile_names:
+                selected_profile = choice
+
         confirm = col1.checkbox("Scan bestätigen", key="confirm_scan")
 
         # DB-Status VOR den Buttons bestimmen (wichtig für Safari/UI)
@@ -328,13 +415,54 @@ def main():
             if running:
                 st.warning(f"⚠️ Es läuft bereits ein Scan (Job {running['job_id']}).")
             else:
-                job = jobs.create_scan_job(source="manual")
+                scan_settings = logic.resolve_scan_settings(current_settings, selected_profile)
+                job = jobs.create_scan_job(source="manual", profile=selected_profile, settings=scan_settings)
                 st.session_state.active_job_id = job["job_id"]
-                t = threading.Thread(target=_run_scan_job, args=(job["job_id"], current_settings), daemon=True)
+                t = threading.Thread(target=_run_scan_job, args=(job["job_id"], scan_settings), daemon=True)
                 t.start()
                 st.success(f"✅ Scan im Hintergrund gestartet (Job {job['job_id']}).")
             st.rerun()
 
+        # Vorschau: Kandidaten ohne Seiteneffekte ermitteln und optional direkt fixen
+        with st.expander("🔍 Vorschau (ohne Änderungen)", expanded=False):
+            preview_settings = logic.resolve_scan_settings(current_settings, selected_profile)
+            if st.button("Kandidaten ermitteln", disabled=is_running):
+                with st.spinner("Ermittle Kandidaten..."):
+                    st.session_state.preview = (preview_settings, logic.discover_candidates(preview_settings))
+            preview = st.session_state.get("preview")
+            if preview and preview[0] == preview_settings and preview[1] is not None:
+                discovery = preview[1]
+                age_min = int((dt.datetime.now().timestamp() - discovery.created_at) // 60)
+                st.caption(
+                    f"{discovery.checked} geprüft · {len(discovery.candidates)} Kandidaten · vor {age_min} min"
+                    + (f" · aus Cache: {', '.join(discovery.cached_libraries)}" if discovery.cached_libraries else "")
+                )
+                if discovery.candidates:
+                    st.dataframe(
+                        pd.DataFrame([{
+                            "Titel": c.title,
+                            "Bibliothek": c.library,
+                            "Ebene": {"season": "Staffel", "episode": "Episode"}.get(c.level, "Titel"),
+                            "Fehlt": ", ".join(c.missing),
+                            "Hinzugefügt": dt.datetime.fromtimestamp(c.added_at).strftime("%d.%m.%Y") if c.added_at else "",
+                            "Quelle": c.source,
+                        } for c in discovery.candidates]),
+                        width="stretch",
+                        hide_index=True,
+                    )
+                    if st.button(f"▶️ Diese {len(discovery.candidates)} Items fixen", disabled=is_running):
+                        job = jobs.create_scan_job(source="manual", profile=selected_profile,
+                                                   settings=preview_settings)
+                        st.session_state.active_job_id = job["job_id"]
+                        t = threading.Thread(
+                            target=_run_scan_job, args=(job["job_id"], preview_settings, discovery), daemon=True
+                        )
+                        t.start()
+                        st.session_state.preview = None
+                        st.rerun()
+                else:
+                    st.success("✨ Nichts zu fixen")
+
         # --- METRIKEN MIT ERFOLGSRATE ---
         # --- Stats aus DB (letzter Job) laden, falls Session-Stats leer sind ---
         db_stats = None
@@ -380,6 +508,10 @@ def main():
                 c4, c5 = st.columns(2)
                 c4.metric("Fehler", failed)
                 c5.metric("Erfolgsrate", rate_text)
+                if stats_to_show.get("seasons_checked"):
+                    st.caption(f"📺 Zusätzlich {stats_to_show['seasons_checked']} Staffeln geprüft (nicht in „Geprüft“ enthalten)")
+                if stats_to_show.get("deferred"):
+                    st.caption(f"⏱️ Zeitbudget erreicht: {stats_to_show['deferred']} Items auf den nächsten Lauf verschoben")
         else:
             with stats_container:
                 # Reihe 1
@@ -425,7 +557,8 @@ def main():
             options = []
             for j in job_list:
                 started = (j.get("started_at") or "")[:19].replace("T", " ")
-                options.append(f"{started} | {j.get('status')} | {j.get('job_id')}")
+                profile_label = f" | {j['profile']}" if j.get("profile") else ""
+                options.append(f"{started} | {j.get('status')}{profile_label} | {j.get('job_id')}")
             selected = None
             if options:
                 default_idx = 0
@@ -463,6 +596,8 @@ def main():
                     start = job['started_at'][11:19] if len(job['started_at']) > 19 else job['started_at']
                     st.caption(f"⏱️ Gestartet: {start}")
 
+                _render_job_profile(job)
+
                 # Button volle Breite
                 if st.button("🔄 Log aktualisieren", use_container_width=True):
                     st.rerun()
@@ -501,6 +636,33 @@ def main():
             rate_emoji = "🔴"
         col4.metric("Gesamterfolgsrate", f"{rate_emoji} {total_rate:.1f}%")
         
+        # Aufschlüsselung je Bibliothek + Verlauf (aus den Summary-Tabellen, kein Full-Scan)
+        with st.expander("📚 Je Bibliothek & Verlauf (30 Tage)", expanded=False):
+            lib_stats = logic.get_library_statistics()
+            if lib_stats:
+                st.dataframe(
+                    pd.DataFrame(lib_stats).fillna(0),
+                    width="stretch",
+                    hide_index=True,
+                )
+            daily = logic.get_daily_statistics(days=30)
+            if daily:
+                trend = pd.DataFrame(daily).pivot_table(index="day", columns="state", values="cnt", fill_value=0)
+                st.bar_chart(trend)
+            if not lib_stats and not daily:
+                st.info("Noch keine Daten vorhanden.")
+
+        with st.expander("🔁 Status-Wechsel & Fix-Latenz (30 Tage)", expanded=False):
+            latency = logic.get_fix_latency_trend(days=30)
+            if latency:
+                st.line_chart(pd.DataFrame(latency).set_index("day")[["avg_latency_s", "max_latency_s"]])
+            flapping = logic.get_flapping_items(days=30)
+            if flapping:
+                st.caption("Items, die mehrfach zwischen gefixt und fehlgeschlagen gewechselt sind")
+                st.dataframe(pd.DataFrame(flapping), width="stretch", hide_index=True)
+            if not latency and not flapping:
+                st.info("Noch keine Historie vorhanden.")
+        
         st.divider()
         
         # --- HISTORIE MIT SUCHFUNKTION ---
@@ -511,7 +673,7 @@ def main():
         
         # Check if filters changed and reset page
         search_title = col1.text_input("🔍 Titel suchen", placeholder="Suche nach Titel...", key="search_title")
-        status_filter = col2.selectbox("Status Filter", ["Alle", "Fixed", "Failed", "Dry Run"], key="status_filter")
+        status_filter = col2.selectbox("Status Filter", ["Alle", "Fixed", "Failed", "Quarantäne", "Dry Run"], key="status_filter")
         
         # Reset page if filters changed
         if "last_search" not in st.session_state:
@@ -534,41 +696,34 @@ def main():
             get_cached_statistics.clear()
             st.rerun()
         
-        # Daten abrufen
-        rows = logic.get_last_report(limit=500, only_fixed=False)
+        # Daten abrufen (Filter + Pagination laufen in SQLite)
+        state_map = {"Fixed": "fixed", "Failed": "failed", "Quarantäne": "quarantined", "Dry Run": "dry_run"}
+        rows, total_rows = logic.query_history(
+            search=search_title,
+            state=state_map.get(status_filter),
+            limit=items_per_page,
+            offset=st.session_state.history_page * items_per_page,
+        )
         
-        if rows:
-            data = []
+        if total_rows:
+            page_data = []
             for r in rows:
-                # Filter anwenden
-                if search_title and search_title.lower() not in r['title'].lower():
-                    continue
-                    
-                if status_filter != "Alle":
-                    if status_filter.lower() != r['state']:
-                        continue
-                
-                symbol = "✅" if r['state'] == 'fixed' else "❌" if r['state'] == 'failed' else "🧪"
-                ts = r['updated_at']
+                symbol = {"fixed": "✅", "failed": "❌", "quarantined": "🚫"}.get(r['state'], "🧪")
+                ts = r['last_scan']
                 try:
-                    dt_obj = dt.datetime.fromisoformat(ts)
-                    ts = dt_obj.strftime("%d.%m. %H:%M")
+                    ts = dt.datetime.fromtimestamp(ts).strftime("%d.%m. %H:%M")
                 except: 
                     pass
                 
-                data.append({
+                page_data.append({
                     "S": symbol,
                     "Zeit": ts,
                     "Bibliothek": r['library'],
                     "Titel": r['title'],
+                    "Versuche": r['attempt_count'],
                     "Meldung": r['note']
                 })
             
-            # Pagination
-            start_idx = st.session_state.history_page * items_per_page
-            end_idx = start_idx + items_per_page
-            page_data = data[start_idx:end_idx]
-            
             if page_data:
                 st.dataframe(
                     pd.DataFrame(page_data), 
@@ -583,19 +738,30 @@ def main():
                 
                 # Pagination Controls
                 col1, col2, col3 = st.columns([1, 2, 1])
-                total_pages = (len(data) - 1) // items_per_page + 1
+                total_pages = (total_rows - 1) // items_per_page + 1
                 
                 if col1.button("⬅️ Vorherige", disabled=st.session_state.history_page == 0):
                     st.session_state.history_page -= 1
                     st.rerun()
                 
-                col2.write(f"Seite {st.session_state.history_page + 1} von {total_pages}")
+                col2.write(f"Seite {st.session_state.history_page + 1} von {total_pages} · {total_rows} Treffer")
                 
                 if col3.button("Nächste ➡️", disabled=st.session_state.history_page >= total_pages - 1):
                     st.session_state.history_page += 1
                     st.rerun()
+                
+                if status_filter == "Quarantäne":
+                    st.caption("Items in Quarantäne werden nicht mehr automatisch versucht.")
+                    if st.button(f"🔓 Alle {total_rows} freigeben"):
+                        released = logic.release_quarantine()
+                        get_cached_statistics.clear()
+                        st.success(f"✅ {released} Items freigegeben - sie landen beim nächsten Scan im Retry-Pool")
+                        st.rerun()
             else:
+                st.session_state.history_page = 0
                 st.info("Keine Ergebnisse für die gewählten Filter.")
+        elif search_title or status_filter != "Alle":
+            st.info("Keine Ergebnisse für die gewählten Filter.")
         else:
             st.info("Die Datenbank ist noch leer. Starte einen Scan!")
     
@@ -617,6 +783,82 @@ def main():
         s_days = col1.slider("📅 Zeit-Filter (Tage)", 1, 365, current_settings["days"])
         s_max = col2.slider("🔢 Mengen-Limit", 10, 500, current_settings["max_items"])
         s_dry = st.toggle("🧪 Simulation (Dry Run)", value=current_settings["dry_run"])
+        s_concurrency = st.slider("⚡ Parallele Refreshes", 1, 8, int(current_settings.get("fix_concurrency", 1)))
+        col1, col2 = st.columns(2)
+        s_episodes = col1.toggle(
+            "📺 Episoden prüfen (Serien)", value=bool(current_settings.get("episode_detection", True)),
+            help="Prüft die neuesten max_episodes Episoden je Serien-Bibliothek über das Episoden-Listing der Sektion.",
+        )
+        s_season_min = col2.number_input(
+            "Staffel-Refresh ab kaputten Episoden (0 = nie)", min_value=0, max_value=50,
+            value=int(current_settings.get("season_refresh_min_episodes", 3)),
+            help="Ab so vielen unvollständigen Episoden einer Staffel wird einmal die Staffel refresht statt jede Episode.",
+        )
+        col1, col2 = st.columns(2)
+        s_artwork = col1.toggle(
+            "🖼️ Poster prüfen", value=bool(current_settings.get("verify_artwork", False)),
+            help="Lädt Poster vollständiger Items in Minigröße über den Plex-Transcoder; 404, kein Bild oder "
+                 "leere Datei → Refresh. Unveränderte Poster kommen aus dem Fingerprint-Cache.",
+        )
+        s_artwork_concurrency = col2.number_input(
+            "Parallele Poster-Abrufe", min_value=1, max_value=16,
+            value=int(current_settings.get("artwork_concurrency", 4)),
+        )
+        col1, col2 = st.columns(2)
+        s_governor = col1.toggle(
+            "🎬 Bei Wiedergabe drosseln", value=bool(current_settings.get("governor_active", True)),
+            help="Fragt /status/sessions ab: ein paralleler Refresh weniger pro aktivem Stream, Pause ab so vielen Streams wie Parallelität.",
+        )
+        s_pause_transcodes = col2.number_input(
+            "Pause ab Transcodes (0 = nie)", min_value=0, max_value=20,
+            value=int(current_settings.get("governor_pause_transcodes", 1)),
+        )
+        s_quarantine = st.number_input(
+            "🚫 Quarantäne nach Fehlversuchen (0 = nie)", min_value=0, max_value=50,
+            value=int(current_settings.get("quarantine_after_failures", 5)),
+            help="Backoff zwischen Versuchen verdoppelt sich (mit Streuung) bis maximal failed_backoff_max_hours.",
+        )
+        pinned_text = st.text_input(
+            "📌 Angepinnte Items (ratingKeys)",
+            value=", ".join(str(k) for k in current_settings.get("pinned_rating_keys") or []),
+            help="Werden bei jedem Scan geprüft und zuerst gefixt, unabhängig von Zeit-Filter und Limit.",
+        )
+        col1, col2 = st.columns(2)
+        s_budget = col1.number_input(
+            "⏱️ Zeitbudget (Minuten, 0 = aus)", min_value=0, max_value=1440,
+            value=int(current_settings.get("time_budget_minutes") or 0),
+        )
+        s_finish_by = col2.text_input(
+            "🏁 Fertig bis (HH:MM, leer = aus)", value=current_settings.get("finish_by") or "",
+            help="Danach werden keine neuen Refreshes gestartet; offene Items holt der nächste Lauf nach.",
+        ).strip()
+        if s_finish_by:
+            try:
+                dt.datetime.strptime(s_finish_by, "%H:%M")
+            except ValueError:
+                st.error("❌ 'Fertig bis' muss im Format HH:MM sein")
+                s_finish_by = current_settings.get("finish_by") or ""
+        s_pinned = sorted({int(k) for k in pinned_text.replace(";", ",").split(",") if k.strip().isdigit()})
+        
+        # Scan-Profile (eigene Parameter + Zeitplan, laufen als eigene Jobs)
+        with st.expander("🗂️ Scan-Profile", expanded=False):
+            st.caption(
+                "Liste von Profilen als JSON. Felder: name, cron, enabled, libraries, days, "
+                "max_items, dry_run, fix_concurrency, failed_retry_pool_limit, failed_backoff_hours, "
+                "time_budget_minutes, finish_by. "
+                "Nicht gesetzte Felder erben die Werte oben."
+            )
+            profiles_text = st.text_area(
+                "Profile",
+                value=json.dumps(current_settings.get("profiles") or [], indent=2, ensure_ascii=False),
+                height=220,
+                placeholder='[{"name": "Neue Filme", "cron": "0 * * * *", "libraries": ["Filme"], "days": 2}]',
+            )
+            s_profiles = current_settings.get("profiles") or []
+            try:
+                s_profiles = logic.normalize_profiles(json.loads(profiles_text or "[]"))
+            except (ValueError, json.JSONDecodeError) as e:
+                st.error(f"❌ Profile nicht gespeichert: {e}")
         
         st.divider()
         
@@ -633,6 +875,73 @@ def main():
         if s_active:
             st.caption(f"✅ Täglich um {s_time.strftime('%H:%M')} Uhr.")
         
+        # Zusätzliche Cron-Zeitpläne: eine Zeile pro Eintrag, optional "| Bibliothek1, Bibliothek2"
+        cron_lines = []
+        for spec in current_settings.get("schedule_crons") or []:
+            if isinstance(spec, str):
+                cron_lines.append(spec)
+            elif spec.get("libraries"):
+                cron_lines.append(f"{spec.get('cron', '')} | {', '.join(spec['libraries'])}")
+            else:
+                cron_lines.append(spec.get("cron", ""))
+        cron_text = st.text_area(
+            "Weitere Zeitpläne (Cron)",
+            value="\n".join(cron_lines),
+            placeholder="0 */6 * * * | Filme\n30 2 * * 0",
+            help="Minute Stunde Tag Monat Wochentag, optional gefolgt von | und den Bibliotheken.",
+        )
+        s_crons = []
+        for line in cron_text.splitlines():
+            cron_expr, _, libs = line.partition("|")
+            cron_expr = cron_expr.strip()
+            if not cron_expr:
+                continue
+            try:
+                scheduler.CronExpression(cron_expr)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                continue
+            lib_list = [l.strip() for l in libs.split(",") if l.strip()]
+            s_crons.append({"cron": cron_expr, "libraries": lib_list} if lib_list else cron_expr)
+        
+        st.divider()
+        
+        # DB-Wartung
+        st.subheader("🧹 Datenbank-Wartung")
+        try:
+            saved_maint_time = dt.datetime.strptime(current_settings["maintenance_time"], "%H:%M").time()
+        except ValueError:
+            saved_maint_time = dt.time(3, 30)
+        col1, col2 = st.columns(2)
+        s_maint_time = col1.time_input("Wartungszeit", value=saved_maint_time)
+        s_maint_active = col2.checkbox("Täglich warten (Checkpoint, Vacuum, Analyze)", value=current_settings["maintenance_active"])
+        
+        run_state = logic.load_run_state()
+        maint_report = run_state.get("last_maintenance_report")
+        if maint_report:
+            st.caption(
+                f"Letzte Wartung: {run_state.get('last_maintenance_date')} · "
+                f"{maint_report.get('reclaimed_bytes', 0) / 1024 / 1024:.1f} MB freigegeben · "
+                f"Integrität: {maint_report.get('integrity')}"
+            )
+        if st.button("🧹 Wartung jetzt ausführen", disabled=bool(jobs.get_running_job())):
+            history_removed = logic.compact_state_history()
+            report = jobs.run_db_maintenance()
+            report["history_removed"] = history_removed
+            plan_check = logic.check_query_plans()
+            report["query_plans_ok"] = plan_check["ok"]
+            if not plan_check["ok"]:
+                st.warning("⚠️ Abfrageplan-Regression: " + ", ".join(f"{n}: {r}" for n, r in plan_check["reasons"].items()))
+            logic.update_run_state(last_maintenance_date=dt.date.today().isoformat(), last_maintenance_report=report)
+            st.success(
+                f"✅ Wartung abgeschlossen: {report['reclaimed_bytes'] / 1024 / 1024:.1f} MB freigegeben, "
+                f"{history_removed} History-Einträge kompaktiert, Integrität: {report['integrity']}"
+            )
+        s_cprofile = st.checkbox(
+            "🔬 cProfile bei Scans mitschneiden", value=bool(current_settings.get("profile_cprofile", False)),
+            help="Hängt die teuersten Funktionen (Event-Loop-Thread) an das Laufzeit-Profil des Jobs. Kostet spürbar Zeit.",
+        )
+        
         st.divider()
         
         # Telegram Einstellungen
@@ -649,12 +958,29 @@ def main():
         
         # Autosave
         new_settings = {
+            **current_settings,
             "libraries": sel_libs,
             "days": s_days,
             "max_items": s_max,
             "dry_run": s_dry,
+            "fix_concurrency": s_concurrency,
+            "episode_detection": s_episodes,
+            "season_refresh_min_episodes": s_season_min,
+            "verify_artwork": s_artwork,
+            "artwork_concurrency": s_artwork_concurrency,
+            "pinned_rating_keys": s_pinned,
+            "governor_active": s_governor,
+            "governor_pause_transcodes": s_pause_transcodes,
+            "quarantine_after_failures": s_quarantine,
+            "time_budget_minutes": s_budget,
+            "finish_by": s_finish_by,
+            "profiles": s_profiles,
             "schedule_active": s_active,
-            "schedule_time": s_time.strftime("%H:%M")
+            "schedule_time": s_time.strftime("%H:%M"),
+            "schedule_crons": s_crons,
+            "maintenance_active": s_maint_active,
+            "maintenance_time": s_maint_time.strftime("%H:%M"),
+            "profile_cprofile": s_cprofile,
         }
         if new_settings != current_settings:
             logic.save_settings(new_settings)
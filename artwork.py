@@ -0,0 +1,143 @@
+"""
+Prüfung von Postern über den Plex-Foto-Transcoder.
+
+needs_refresh sieht nur, ob ein thumb-Pfad gesetzt ist. Ob dahinter ein Bild liegt, zeigt
+erst der Abruf: /photo/:/transcode liefert das Poster in THUMB_SIZE Pixeln (wenige hundert
+Bytes); 404, kein image/*-Typ oder weniger als MIN_BYTES gelten als defekt.
+Das Ergebnis wird je (rating_key, thumb) in artwork_fingerprints gespeichert (Länge, Typ,
+SHA-1). Solange sich der thumb-Pfad nicht ändert (er enthält den Änderungszeitpunkt) und der
+Eintrag jünger als recheck_after ist, wird nichts erneut geladen.
+"""
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import metrics
+import profiling
+
+logger = logging.getLogger(__name__)
+
+THUMB_SIZE = 32
+MIN_BYTES = 64
+MAX_BYTES = 256 * 1024  # mehr wird nicht gelesen (Fingerprint über den Anfang reicht)
+
+ARTWORK_CHECKS = metrics.Counter("psr_artwork_checks_total", "Artwork-Prüfungen nach Ergebnis", ["result"])
+
+
+class ArtworkCheck(NamedTuple):
+    ok: bool
+    status: int
+    content_type: str
+    length: int
+    digest: Optional[str]
+    reason: str
+
+
+def init_table(conn) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS artwork_fingerprints(
+            rating_key INTEGER PRIMARY KEY,
+            thumb TEXT NOT NULL,
+            ok INTEGER NOT NULL,
+            content_type TEXT,
+            length INTEGER,
+            digest TEXT,
+            checked_at INTEGER NOT NULL
+        )
+    """)
+
+
+def check(plex, thumb: str, timeout: Optional[int] = None) -> ArtworkCheck:
+    """Lädt das Poster in Minigröße über den Transcoder (blockierend) und bewertet die Antwort."""
+    params = {"url": thumb, "width": THUMB_SIZE, "height": THUMB_SIZE, "minSize": 1, "upscale": 0}
+    try:
+        response = plex._session.get(plex.url("/photo/:/transcode"), headers=plex._headers(), params=params,
+                                     timeout=timeout or plex._timeout, stream=True)
+    except Exception as e:
+        return ArtworkCheck(False, 0, "", 0, None, f"Fehler: {e}")
+    try:
+        content_type = response.headers.get("Content-Type", "").split(";", 1)[0].strip().lower()
+        if response.status_code != 200:
+            return ArtworkCheck(False, response.status_code, content_type, 0, None, f"HTTP {response.status_code}")
+        data = response.raw.read(MAX_BYTES, decode_content=True)
+    finally:
+        response.close()
+    digest = hashlib.sha1(data).hexdigest() if data else None
+    if not content_type.startswith("image/"):
+        return ArtworkCheck(False, 200, content_type, len(data), digest, f"kein Bild ({content_type or '?'})")
+    if len(data) < MIN_BYTES:
+        return ArtworkCheck(False, 200, content_type, len(data), digest, f"zu klein ({len(data)} Bytes)")
+    return ArtworkCheck(True, 200, content_type, len(data), digest, "ok")
+
+
+def load_fingerprints(connect: Callable, rating_keys: Iterable[int]) -> Dict[int, dict]:
+    keys = [int(k) for k in rating_keys]
+    found: Dict[int, dict] = {}
+    with connect() as conn:
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f"""SELECT rating_key, thumb, ok, checked_at FROM artwork_fingerprints
+                    WHERE rating_key IN ({",".join("?" * len(chunk))})""", chunk).fetchall()
+            found.update({r["rating_key"]: dict(r) for r in rows})
+    return found
+
+
+def store_fingerprints(connect: Callable, results: Iterable[Tuple[int, str, ArtworkCheck, int]]) -> int:
+    """results: (rating_key, thumb, ArtworkCheck, checked_at)."""
+    rows = [(rk, thumb, int(res.ok), res.content_type, res.length, res.digest, checked_at)
+            for rk, thumb, res, checked_at in results]
+    if not rows:
+        return 0
+    with connect() as conn:
+        conn.executemany("""
+            INSERT INTO artwork_fingerprints(rating_key, thumb, ok, content_type, length, digest, checked_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(rating_key) DO UPDATE SET thumb = excluded.thumb, ok = excluded.ok,
+                content_type = excluded.content_type, length = excluded.length, digest = excluded.digest,
+                checked_at = excluded.checked_at
+        """, rows)
+        conn.commit()
+    return len(rows)
+
+
+async def verify(plex, targets: List[Tuple[int, str]], cached: Dict[int, dict], concurrency: int = 4,
+                 recheck_after: float = 30 * 86400, log_callback=None):
+    """
+    Prüft (rating_key, thumb)-Paare; gültige Cache-Einträge (gleicher thumb, jünger als
+    recheck_after) werden übernommen, der Rest mit höchstens `concurrency` parallelen Abrufen
+    geladen. Gibt (defekte rating_keys, neue Fingerprints für store_fingerprints) zurück.
+    """
+    now = int(time.time())
+    broken: List[int] = []
+    to_fetch: List[Tuple[int, str]] = []
+    for rk, thumb in targets:
+        row = cached.get(rk)
+        if row and row["thumb"] == thumb and now - row["checked_at"] < recheck_after:
+            ARTWORK_CHECKS.labels("cached").inc()
+            if not row["ok"]:
+                broken.append(rk)
+        else:
+            to_fetch.append((rk, thumb))
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def fetch(rk: int, thumb: str):
+        async with semaphore:
+            return rk, thumb, await profiling.to_thread(check, plex, thumb), int(time.time())
+
+    fingerprints = []
+    for rk, thumb, res, checked_at in await asyncio.gather(*(fetch(rk, thumb) for rk, thumb in to_fetch)):
+        if res.status in (0, 401, 403, 429) or res.status >= 500:
+            # Netzwerk-/Auth-/Server-Fehler sagt nichts über das Poster: nicht cachen, nächster Lauf prüft erneut
+            ARTWORK_CHECKS.labels("error").inc()
+            continue
+        ARTWORK_CHECKS.labels("ok" if res.ok else "broken").inc()
+        fingerprints.append((rk, thumb, res, checked_at))
+        if not res.ok:
+            broken.append(rk)
+            if log_callback:
+                log_callback(f"🖼️ Defektes Poster ({rk}): {res.reason}")
+    return broken, fingerprints
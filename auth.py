@@ -4,7 +4,6 @@ import stat
 
 import yaml
 from yaml.loader import SafeLoader
-import streamlit_authenticator as stauth
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -58,7 +57,9 @@ def ensure_auth_config() -> dict:
         },
     }
 
-    # pre-hash (damit nichts im Klartext gespeichert bleibt)
+    # pre-hash (damit nichts im Klartext gespeichert bleibt); lazy: nur beim ersten Start nötig
+    import streamlit_authenticator as stauth
+
     stauth.Hasher.hash_passwords(cfg["credentials"])
 
     with open(AUTH_CONFIG_PATH, "w", encoding="utf-8") as f:
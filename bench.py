@@ -0,0 +1,348 @@
+"""
+Benchmarks für den Plex Smart Refresher.
+
+  python bench.py listing [--items 50000 | --file aufgezeichnet.xml]
+  python bench.py engine  [--items 1000 10000 100000] [--listing aufgezeichnet.xml]
+  python bench.py startup [--modules cli jobs logic scheduler]
+
+listing: vergleicht das Parsen eines Bibliotheks-Listings mit plexapi (komplettes
+ElementTree + Video-Objekte, wie lib.all()) gegen den gestreamten Pfad aus
+plexlisting.py. Ohne --file wird ein synthetisches Listing erzeugt; eine echte
+Antwort lässt sich z.B. so aufzeichnen:
+
+  curl -H "X-Plex-Token: $PLEX_TOKEN" -H "X-Plex-Container-Size: 50000" \\
+       "$PLEX_URL/library/sections/1/all?type=1&sort=addedAt:desc&includeGuids=1" > listing.xml
+
+engine: kompletter Scan (start_scan) gegen fakeplex.py mit einstellbarer Latenz,
+Metadaten-Verzögerung und Fehlerquote. Jede Größe läuft in einem eigenen Prozess
+(Server ebenfalls separat), damit Peak-RSS nur die Engine misst. Gemeldet werden
+Items/s, p50/p95 der Refresh-Latenz pro Item, DB-Schreibzugriffe und Peak-RSS.
+Mit --listing bedient der Fake-Server eine aufgezeichnete Antwort statt synthetischer Daten.
+
+startup: Importkosten je Modul per `python -X importtime` (kalter Interpreter, temporäre
+DB - ein Import darf dort nichts anlegen) sowie die Startzeit von `python -m cli jobs`.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import quoteattr
+
+
+def synthetic_listing(items: int, broken_ratio: float = 0.05, seed: int = 42) -> bytes:
+    """Erzeugt ein Listing im Format von /library/sections/{key}/all?includeGuids=1."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n<MediaContainer size="{items}" totalSize="{items}" '
+             f'librarySectionID="1" librarySectionTitle="Filme">']
+    for i in range(items):
+        rk = 1_000_000 + i
+        added = now - i * 600
+        missing = rng.choice(("guid", "thumb", "summary")) if rng.random() < broken_ratio else None
+        attrs = (f'ratingKey="{rk}" key="/library/metadata/{rk}" guid="plex://movie/{rk:024x}" type="movie" '
+                 f'title={quoteattr(f"Film {i}")} studio="Studio {i % 50}" contentRating="de/12" '
+                 f'year="{1970 + i % 55}" duration="{5_400_000 + i}" addedAt="{added}" updatedAt="{added}" '
+                 f'originallyAvailableAt="2020-01-01" rating="7.{i % 10}" audienceRating="8.1"')
+        if missing != "thumb":
+            attrs += f' thumb="/library/metadata/{rk}/thumb/{added}" art="/library/metadata/{rk}/art/{added}"'
+        if missing != "summary":
+            attrs += f' summary={quoteattr(f"Beschreibung für Film {i}. " * 4)}'
+        children = (
+            f'<Media id="{rk}" duration="{5_400_000 + i}" bitrate="8000" width="1920" height="1080" '
+            f'videoCodec="h264" audioCodec="aac" container="mkv"><Part id="{rk}" key="/library/parts/{rk}/file.mkv" '
+            f'file="/media/filme/Film {i}.mkv" size="4000000000"/></Media>'
+            f'<Genre tag="Drama"/><Country tag="Germany"/><Director tag="Regie {i % 300}"/>'
+        )
+        if missing != "guid":
+            children += f'<Guid id="imdb://tt{rk:07d}"/><Guid id="tmdb://{rk}"/><Guid id="tvdb://{rk}"/>'
+        parts.append(f"<Video {attrs}>{children}</Video>")
+    parts.append("</MediaContainer>")
+    return "".join(parts).encode("utf-8")
+
+
+def _measure(fn):
+    """Laufzeit ohne Tracing, Peak-Speicher in einem zweiten Lauf mit tracemalloc."""
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def _parse_plexapi(data: bytes):
+    from plexapi.video import Movie, Show
+
+    classes = {"Video": Movie, "Directory": Show}
+    root = ET.fromstring(data)
+    broken = 0
+    objects = []
+    for elem in root:
+        obj = classes[elem.tag](None, elem, initpath="/library/sections/1/all")
+        obj._autoReload = False
+        objects.append(obj)
+        if not obj.guids or not obj.thumb or not obj.summary:
+            broken += 1
+    return len(objects), broken
+
+
+def _parse_lean(data: bytes):
+    import plexlisting
+
+    count = broken = 0
+    for entry in plexlisting.parse_listing(io.BytesIO(data)):
+        count += 1
+        if not (entry.has_guid and entry.has_thumb and entry.has_summary):
+            broken += 1
+    return count, broken
+
+
+def bench_listing(args) -> None:
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+        source = args.file
+    else:
+        data = synthetic_listing(args.items)
+        source = f"synthetisch, {args.items} Items"
+    print(f"Listing: {source}, {len(data) / 1024 / 1024:.1f} MB XML")
+
+    results = {}
+    for name, fn in (("plexapi", _parse_plexapi), ("lean", _parse_lean)):
+        (count, broken), elapsed, peak = _measure(lambda: fn(data))
+        results[name] = (elapsed, peak)
+        print(f"  {name:8s} {count:7d} Items, {broken:5d} kaputt | {elapsed:7.2f}s | "
+              f"{count / elapsed:9.0f} Items/s | Peak {peak / 1024 / 1024:7.1f} MB")
+    speedup = results["plexapi"][0] / results["lean"][0]
+    mem_ratio = results["plexapi"][1] / max(1, results["lean"][1])
+    print(f"  → lean {speedup:.1f}x schneller, {mem_ratio:.0f}x weniger Speicher (Peak, ohne Rohdaten)")
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _run_engine_once(args) -> None:
+    """Kindprozess: ein Scan gegen PLEX_URL, Ergebnis als JSON-Zeile auf stdout."""
+    import resource
+    from contextlib import contextmanager
+
+    import logic
+
+    refresh_latencies = []
+    db = {"writes": 0, "rows": 0}
+    original_refresh = logic.smart_refresh_item
+    original_connection = logic.get_db_connection
+
+    async def timed_refresh(*a, **kw):
+        t0 = time.perf_counter()
+        try:
+            return await original_refresh(*a, **kw)
+        finally:
+            refresh_latencies.append(time.perf_counter() - t0)
+
+    def count_statement(sql: str) -> None:
+        if sql.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE", "REPLAC"):
+            db["writes"] += 1
+
+    @contextmanager
+    def counted_connection():
+        with original_connection() as conn:
+            conn.set_trace_callback(count_statement)
+            try:
+                yield conn
+            finally:
+                db["rows"] += conn.total_changes
+
+    logic.smart_refresh_item = timed_refresh
+    logic.get_db_connection = counted_connection
+    logic.ensure_db()
+    setup_writes = db["writes"]
+
+    settings = logic.load_settings()
+    settings.update(
+        libraries=["Filme"], max_items=args.items, days=36500,
+        fix_concurrency=args.concurrency, dry_run=False,
+        refresh_wait_total_seconds=args.wait_total, refresh_wait_interval_seconds=1,
+        time_budget_minutes=0, finish_by="", lean_listing=not args.plexapi,
+    )
+    t0 = time.perf_counter()
+    stats = logic.start_scan(settings, log_callback=lambda msg: None, mark_run_date=False) or {}
+    elapsed = time.perf_counter() - t0
+
+    checked = stats.get("checked", 0)
+    print(json.dumps({
+        "items": args.items,
+        "checked": checked,
+        "fixed": stats.get("fixed", 0),
+        "failed": stats.get("failed", 0),
+        "seconds": elapsed,
+        "items_per_sec": checked / elapsed if elapsed else 0.0,
+        "refreshes": len(refresh_latencies),
+        "p50": _percentile(refresh_latencies, 50),
+        "p95": _percentile(refresh_latencies, 95),
+        "db_writes": db["writes"] - setup_writes,
+        "db_rows": db["rows"],
+        # Linux: ru_maxrss in KB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def _start_fake_server(args, items: int):
+    here = os.path.dirname(os.path.abspath(__file__))
+    cmd = [sys.executable, os.path.join(here, "fakeplex.py"), "--port", "0", "--items", str(items),
+           "--broken", str(args.broken), "--latency-ms", str(args.latency_ms),
+           "--fill-delay", str(args.fill_delay), "--fail-rate", str(args.fail_rate)]
+    if args.listing:
+        cmd += ["--listing", args.listing]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    if "http://" not in line:
+        proc.kill()
+        raise RuntimeError(f"fakeplex.py nicht gestartet: {line!r}")
+    return proc, line.split()[3]
+
+
+def bench_engine(args) -> None:
+    here = os.path.dirname(os.path.abspath(__file__))
+    sizes = [0] if args.listing else args.items
+    print(f"Engine-Benchmark: Latenz {args.latency_ms} ms, Fill-Delay {args.fill_delay}s, "
+          f"Fehlerquote {args.fail_rate}, kaputt {args.broken}, Parallelität {args.concurrency}, "
+          f"{'plexapi' if args.plexapi else 'lean'}-Listing")
+    print(f"  {'Items':>7s} {'geprüft':>8s} {'fixed':>6s} {'failed':>6s} {'Dauer':>8s} {'Items/s':>9s} "
+          f"{'p50':>7s} {'p95':>7s} {'DB-Writes':>10s} {'Peak RSS':>9s}")
+    for size in sizes:
+        server, url = _start_fake_server(args, size)
+        try:
+            with tempfile.TemporaryDirectory(prefix="psr-bench-") as tmp:
+                env = dict(os.environ, PLEX_URL=url, PLEX_TOKEN="bench",
+                           PSR_DB_PATH=os.path.join(tmp, "state.db"),
+                           PSR_SETTINGS_PATH=os.path.join(tmp, "settings.json"),
+                           PSR_STATE_PATH=os.path.join(tmp, "run_state.json"))
+                cmd = [sys.executable, os.path.join(here, "bench.py"), "engine-run",
+                       "--items", str(size or 10_000_000), "--concurrency", str(args.concurrency),
+                       "--wait-total", str(args.wait_total)]
+                if args.plexapi:
+                    cmd.append("--plexapi")
+                out = subprocess.run(cmd, env=env, cwd=tmp, capture_output=True, text=True)
+            if out.returncode != 0:
+                print(f"  {size:7d} Fehler:\n{out.stderr[-2000:]}")
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"  {size or r['checked']:7d} {r['checked']:8d} {r['fixed']:6d} {r['failed']:6d} "
+              f"{r['seconds']:7.1f}s {r['items_per_sec']:9.0f} {r['p50'] * 1000:5.0f}ms {r['p95'] * 1000:5.0f}ms "
+              f"{r['db_writes']:10d} {r['peak_rss_mb']:6.0f} MB")
+
+
+def _import_profile(module: str, env: dict, cwd: str):
+    """(kumulierte Importzeit in ms, Top-Level-Importe [(ms, name)]) aus -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         env=env, cwd=cwd, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    # Ausgabe ist post-order: direkte Importe (Tiefe 1) stehen vor ihrem Modul (Tiefe 0)
+    total_us = 0
+    children = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            pkg = name.strip().split(".")[0]
+            children[pkg] = children.get(pkg, 0) + int(cumulative)
+        elif depth == 0:
+            if name.strip() == module:
+                total_us = int(cumulative)
+                break
+            children = {}
+    return total_us / 1000, sorted(((us / 1000, pkg) for pkg, us in children.items()), reverse=True)
+
+
+def bench_startup(args) -> None:
+    here = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory(prefix="psr-startup-") as tmp:
+        db_path = os.path.join(tmp, "state.db")
+        env = dict(os.environ, PSR_DB_PATH=db_path,
+                   PSR_SETTINGS_PATH=os.path.join(tmp, "settings.json"),
+                   PSR_STATE_PATH=os.path.join(tmp, "run_state.json"))
+        print("Importzeit (kalter Interpreter, Median aus 3)")
+        for module in args.modules:
+            runs = [_import_profile(module, env, here) for _ in range(3)]
+            runs.sort(key=lambda r: r[0])
+            total, top = runs[1]
+            heaviest = ", ".join(f"{pkg} {ms:.0f}" for ms, pkg in top[:4])
+            side_effect = " | ⚠️ legt DB an" if os.path.exists(db_path) else ""
+            print(f"  {module:10s} {total:7.1f} ms | größte direkte Importe (ms): {heaviest}{side_effect}")
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+        cmd = [sys.executable, "-m", "cli", "jobs", "--limit", "1"]
+        walls = []
+        for _ in range(5):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, env=env, cwd=here, capture_output=True)
+            walls.append(time.perf_counter() - t0)
+        print(f"  python -m cli jobs: {_percentile(walls, 50) * 1000:.0f} ms (Median aus 5, inkl. Interpreterstart)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plex Smart Refresher Benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_listing = sub.add_parser("listing", help="plexapi vs. gestreamtes XML-Listing")
+    p_listing.add_argument("--items", type=int, default=50_000)
+    p_listing.add_argument("--file", help="aufgezeichnete Listing-Antwort (XML)")
+    p_listing.set_defaults(func=bench_listing)
+
+    p_engine = sub.add_parser("engine", help="kompletter Scan gegen fakeplex.py")
+    p_engine.add_argument("--items", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    p_engine.add_argument("--listing", help="aufgezeichnetes Listing statt synthetischer Filme")
+    p_engine.add_argument("--broken", type=float, default=0.05, help="Anteil kaputter Items")
+    p_engine.add_argument("--latency-ms", type=float, default=2.0)
+    p_engine.add_argument("--fill-delay", type=float, default=0.0)
+    p_engine.add_argument("--fail-rate", type=float, default=0.0)
+    p_engine.add_argument("--concurrency", type=int, default=4)
+    p_engine.add_argument("--wait-total", type=int, default=5, help="refresh_wait_total_seconds")
+    p_engine.add_argument("--plexapi", action="store_true", help="Listing über plexapi statt lean")
+    p_engine.set_defaults(func=bench_engine)
+
+    p_startup = sub.add_parser("startup", help="Importzeit und CLI-Startzeit")
+    p_startup.add_argument("--modules", nargs="+", default=["cli", "jobs", "logic", "scheduler"])
+    p_startup.set_defaults(func=bench_startup)
+
+    p_run = sub.add_parser("engine-run", help=argparse.SUPPRESS)
+    p_run.add_argument("--items", type=int, required=True)
+    p_run.add_argument("--concurrency", type=int, default=4)
+    p_run.add_argument("--wait-total", type=int, default=5)
+    p_run.add_argument("--plexapi", action="store_true")
+    p_run.set_defaults(func=_run_engine_once)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
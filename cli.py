@@ -0,0 +1,323 @@
+"""
+Kommandozeile für den Plex Smart Refresher (ohne Streamlit).
+
+  python -m cli scan     [--profile NAME] [--library L ...] [--days N] [--max-items N] [--concurrency N]
+  python -m cli dry-run  [gleiche Optionen]
+  python -m cli audit    [gleiche Optionen] [--json]
+  python -m cli resume   [JOB_ID]
+  python -m cli jobs     [--limit 20]
+  python -m cli tail     JOB_ID [-n 50] [-f]
+  python -m cli cancel   JOB_ID
+  python -m cli schedule
+  python -m cli locks
+
+scan/dry-run laufen als Job in scan_runs (sichtbar in der UI, Log unter logs/).
+SIGINT/SIGTERM brechen sauber ab (laufende Refreshes werden fertig, Job = cancelled).
+Module werden erst im jeweiligen Befehl importiert, damit z.B. `jobs`/`tail` ohne
+plexapi starten. Exit-Codes: 0 ok, 1 Fehler, 2 anderer Scan aktiv, 130 abgebrochen.
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_BUSY = 2
+EXIT_CANCELLED = 130
+
+
+def _load_env() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def _jobs():
+    """jobs.py mit angelegter scan_runs-Tabelle."""
+    import jobs
+
+    jobs.ensure_jobs_db()
+    return jobs
+
+
+def _echo(msg: str) -> None:
+    print(msg, flush=True)
+
+
+def _scan_settings(args, dry_run: bool) -> dict:
+    import logic
+
+    settings = logic.resolve_scan_settings(logic.load_settings(), args.profile)
+    if args.profile and settings.get("profile") != args.profile:
+        raise SystemExit(f"Unbekanntes Profil: {args.profile}")
+    if args.library:
+        settings["libraries"] = list(args.library)
+    if args.days is not None:
+        settings["days"] = args.days
+    if args.max_items is not None:
+        settings["max_items"] = args.max_items
+    if args.concurrency is not None:
+        settings["fix_concurrency"] = args.concurrency
+    if args.time_budget is not None:
+        settings["time_budget_minutes"] = args.time_budget
+    if dry_run:
+        settings["dry_run"] = True
+    if not settings.get("libraries"):
+        raise SystemExit("Keine Bibliotheken ausgewählt (Einstellungen oder --library)")
+    return settings
+
+
+def _run_job(settings: dict, quiet: bool) -> int:
+    """Scan als Job (wie der Scheduler): Log-Datei + stdout, Status/Profil in scan_runs."""
+    import logic
+
+    jobs = _jobs()
+    job = jobs.create_scan_job(source="cli", profile=settings.get("profile"), settings=settings)
+    job_id, log_path = job["job_id"], job["log_path"]
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        if stop.is_set():
+            raise KeyboardInterrupt
+        _echo("🛑 Abbruch angefordert - warte auf laufende Refreshes (nochmal = sofort)")
+        stop.set()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    def job_log(msg: str) -> None:
+        if not quiet:
+            _echo(msg)
+        try:
+            jobs.append_job_log_path(log_path, msg)
+        except Exception:
+            pass
+
+    def cancelled() -> bool:
+        return stop.is_set() or jobs.is_cancel_requested(job_id)
+
+    _echo(f"Job {job_id} (Log: {log_path})")
+    scan_profile = logic.new_scan_profile(settings)
+    try:
+        stats = logic.start_scan(settings, log_callback=job_log, cancel_flag=cancelled, source="cli",
+                                 mark_run_date=False, scan_profile=scan_profile)
+    except KeyboardInterrupt:
+        jobs.set_job_status(job_id, status="cancelled", error="cancelled (hart)", timings=scan_profile.to_dict())
+        return EXIT_CANCELLED
+    except logic.PlexConnectionError as e:
+        jobs.set_job_status(job_id, status="failed", error=f"Verbindungsfehler: {e}", timings=scan_profile.to_dict())
+        return EXIT_FAILED
+    except Exception as e:
+        jobs.set_job_status(job_id, status="failed", error=str(e), timings=scan_profile.to_dict())
+        raise
+
+    if stats is None:
+        # None nur bei belegter Scan-Sperre (lease.acquire fehlgeschlagen)
+        jobs.set_job_status(job_id, status="cancelled", error="Scan bereits aktiv")
+        return EXIT_BUSY
+    if cancelled():
+        jobs.set_job_status(job_id, status="cancelled", stats=stats, error="cancelled", timings=scan_profile.to_dict())
+        code = EXIT_CANCELLED
+    else:
+        jobs.set_job_status(job_id, status="success", stats=stats, timings=scan_profile.to_dict())
+        if not settings.get("dry_run"):
+            logic.update_last_run_date(time.strftime("%Y-%m-%d"))
+        code = EXIT_OK
+    _echo(json.dumps(stats, ensure_ascii=False))
+    return code
+
+
+# --- Befehle ---
+
+def cmd_scan(args) -> int:
+    return _run_job(_scan_settings(args, dry_run=False), args.quiet)
+
+
+def cmd_dry_run(args) -> int:
+    return _run_job(_scan_settings(args, dry_run=True), args.quiet)
+
+
+def cmd_audit(args) -> int:
+    """Kandidaten-Vorschau ohne DB-Schreibzugriffe."""
+    import logic
+
+    settings = _scan_settings(args, dry_run=True)
+    result = logic.discover_candidates(settings, log_callback=_echo if args.verbose else (lambda msg: None),
+                                       use_cache=False)
+    if result is None:
+        return EXIT_FAILED
+    rows = [{"rating_key": c.rating_key, "library": c.library, "title": c.title, "level": c.level,
+             "missing": list(c.missing), "source": c.source} for c in result.candidates]
+    if args.json:
+        print(json.dumps({"checked": result.checked, "candidates": rows}, ensure_ascii=False, indent=2))
+        return EXIT_OK
+    for r in rows:
+        print(f"{r['rating_key']}\t{r['library']}\t{r['level']}\t{','.join(r['missing'])}\t{r['source']}\t{r['title']}")
+    print(f"{len(rows)} von {result.checked} geprüften Items mit fehlenden Metadaten", file=sys.stderr)
+    return EXIT_OK
+
+
+def cmd_resume(args) -> int:
+    """
+    Setzt einen abgebrochenen/unterbrochenen Lauf fort: dieselben effektiven Einstellungen
+    (Profil samt --library/--days/... aus settings_json), die beim Abbruch oder Zeitbudget
+    zurückgestellten Kandidaten werden dabei zuerst abgearbeitet.
+    """
+    import logic
+
+    jobs = _jobs()
+    if args.job_id:
+        job = jobs.get_job(args.job_id)
+        if not job:
+            raise SystemExit(f"Job {args.job_id} nicht gefunden")
+    else:
+        job = next((j for j in jobs.list_jobs(limit=50) if j["status"] in ("interrupted", "cancelled")), None)
+        if not job:
+            _echo("Kein abgebrochener Job gefunden.")
+            return EXIT_OK
+    _echo(f"Setze Job {job['job_id']} fort ({job['status']}, Profil: {job.get('profile') or '-'})")
+    if job.get("settings_json"):
+        settings = json.loads(job["settings_json"])
+    else:
+        # Jobs von vor settings_json: nur das Profil ist bekannt
+        settings = logic.resolve_scan_settings(logic.load_settings(), job.get("profile"))
+    return _run_job(settings, args.quiet)
+
+
+def cmd_jobs(args) -> int:
+    jobs = _jobs()
+    for j in jobs.list_jobs(limit=args.limit):
+        started = (j.get("started_at") or "")[:19].replace("T", " ")
+        stats = json.loads(j["stats_json"]) if j.get("stats_json") else {}
+        summary = f"geprüft {stats.get('checked', 0)}, fixed {stats.get('fixed', 0)}, failed {stats.get('failed', 0)}" if stats else ""
+        print(f"{j['job_id']}  {started}  {j['status']:<11s} {j.get('source') or '':<9s} "
+              f"{j.get('profile') or '-':<12s} {summary}")
+    return EXIT_OK
+
+
+def cmd_tail(args) -> int:
+    jobs = _jobs()
+    job = jobs.get_job(args.job_id)
+    if not job:
+        raise SystemExit(f"Job {args.job_id} nicht gefunden")
+    text = jobs.tail_log_file(job["log_path"], n=args.lines) if job.get("log_path") else ""
+    if text:
+        print(text, flush=True)
+    if not args.follow:
+        return EXIT_OK
+
+    try:
+        with open(job["log_path"], "r", encoding="utf-8", errors="replace") as f:
+            f.seek(0, 2)
+            while True:
+                line = f.readline()
+                if line:
+                    print(line, end="", flush=True)
+                    continue
+                if (jobs.get_job(args.job_id) or {}).get("status") != "running":
+                    print(f.read(), end="", flush=True)
+                    return EXIT_OK
+                time.sleep(1)
+    except KeyboardInterrupt:
+        return EXIT_OK
+    except FileNotFoundError:
+        raise SystemExit("Logdatei nicht gefunden")
+
+
+def cmd_cancel(args) -> int:
+    jobs = _jobs()
+    jobs.request_cancel(args.job_id)
+    _echo(f"Abbruch für {args.job_id} angefordert")
+    return EXIT_OK
+
+
+def _fmt_ts(ts) -> str:
+    return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts)) if ts else "-"
+
+
+def cmd_schedule(args) -> int:
+    """Zeitplan-Slots aus der DB: letzter/nächster Lauf und letzter Erfolg je Eintrag."""
+    import logic
+
+    for entry_id, slot in sorted(logic.get_schedule_slots().items()):
+        print(f"{entry_id:<28s} letzter {_fmt_ts(slot['last_fire'])}  nächster {_fmt_ts(slot['next_fire'])}  "
+              f"Erfolg {_fmt_ts(slot['last_success'])}  {slot['last_status'] or '-':<9s} {slot['claimed_by'] or ''}")
+    return EXIT_OK
+
+
+def cmd_locks(args) -> int:
+    """Aktive Scan-Sperren (Leases) aller Prozesse."""
+    import logic
+    import scanlock
+
+    logic.ensure_db()
+    for lease in scanlock.active_leases(logic.get_db_connection):
+        print(f"{lease['resource']:<28s} {lease['owner']:<24s} seit {_fmt_ts(lease['acquired_at'])}  "
+              f"läuft ab in {lease['expires_at'] - time.time():.0f}s")
+    return EXIT_OK
+
+
+def _add_scan_options(p) -> None:
+    p.add_argument("--profile", help="Scan-Profil aus den Einstellungen")
+    p.add_argument("--library", action="append", help="Bibliothek (mehrfach möglich, überschreibt Einstellungen)")
+    p.add_argument("--days", type=int)
+    p.add_argument("--max-items", type=int)
+    p.add_argument("--concurrency", type=int)
+    p.add_argument("--time-budget", type=float, help="Zeitbudget in Minuten")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Plex Smart Refresher (Kommandozeile)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (("scan", cmd_scan, "Scan ausführen"),
+                                  ("dry-run", cmd_dry_run, "Scan simulieren (schreibt nichts)")):
+        p = sub.add_parser(name, help=help_text)
+        _add_scan_options(p)
+        p.add_argument("-q", "--quiet", action="store_true", help="Log nur in die Job-Datei")
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("audit", help="Items mit fehlenden Metadaten auflisten")
+    _add_scan_options(p)
+    p.add_argument("--json", action="store_true")
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=cmd_audit)
+
+    p = sub.add_parser("resume", help="abgebrochenen Lauf fortsetzen")
+    p.add_argument("job_id", nargs="?")
+    p.add_argument("-q", "--quiet", action="store_true")
+    p.set_defaults(func=cmd_resume)
+
+    p = sub.add_parser("jobs", help="letzte Jobs auflisten")
+    p.add_argument("--limit", type=int, default=20)
+    p.set_defaults(func=cmd_jobs)
+
+    p = sub.add_parser("tail", help="Job-Log anzeigen")
+    p.add_argument("job_id")
+    p.add_argument("-n", "--lines", type=int, default=50)
+    p.add_argument("-f", "--follow", action="store_true", help="folgen, bis der Job endet")
+    p.set_defaults(func=cmd_tail)
+
+    p = sub.add_parser("cancel", help="Abbruch eines laufenden Jobs anfordern")
+    p.add_argument("job_id")
+    p.set_defaults(func=cmd_cancel)
+
+    p = sub.add_parser("schedule", help="Zeitplan-Slots (letzter/nächster Lauf, letzter Erfolg)")
+    p.set_defaults(func=cmd_schedule)
+
+    p = sub.add_parser("locks", help="aktive Scan-Sperren je Bibliothek")
+    p.set_defaults(func=cmd_locks)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    _load_env()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
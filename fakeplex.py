@@ -0,0 +1,397 @@
+"""
+Lokaler Fake-Plex-Server für Tests und Benchmarks ohne echten Server/Netzwerk.
+
+Bedient die Endpunkte, die der Scan-Engine und plexapi reichen:
+  /, /identity, /library/sections, /library/sections/{id}/all (inkl. Meta/Sorts),
+  /library/sections/{id}/collections, /library/metadata/{keys}[/children],
+  PUT /library/metadata/{key}/refresh, /status/sessions, /photo/:/transcode
+
+Items werden synthetisch erzeugt (deterministisch per Seed) oder aus einem aufgezeichneten
+Listing übernommen (--listing, siehe bench.py). Ein Anteil ist "kaputt" (fehlende
+Guid/Thumb/Summary); ein Refresh repariert nach fill_delay Sekunden mit Wahrscheinlichkeit
+1 - fail_rate. Latenz pro Request ist konfigurierbar.
+
+Start:  python fakeplex.py --items 10000 --port 32499
+        python fakeplex.py --listing listing.xml --latency-ms 5 --fill-delay 2
+"""
+import argparse
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import quoteattr
+
+MACHINE_ID = "fakeplex0000000000000000000000000000"
+
+
+@dataclass
+class FakePlexConfig:
+    movies: int = 1000
+    shows: int = 0
+    seasons_per_show: int = 2
+    episodes_per_season: int = 10
+    broken_ratio: float = 0.05
+    bad_art_ratio: float = 0.0
+    latency_ms: float = 0.0
+    fill_delay: float = 0.0
+    fail_rate: float = 0.0
+    sessions: int = 0
+    transcodes: int = 0
+    seed: int = 42
+    listing_file: Optional[str] = None
+
+
+@dataclass
+class FakeItem:
+    rating_key: int
+    section_key: int
+    type: str
+    title: str
+    added_at: int
+    has_guid: bool = True
+    has_thumb: bool = True
+    has_summary: bool = True
+    bad_art: bool = False
+    parent_key: Optional[int] = None
+    grandparent_key: Optional[int] = None
+    index: int = 0
+    fix_at: Optional[float] = None
+    fix_ok: bool = True
+    children: list = field(default_factory=list)
+
+    @property
+    def broken(self) -> bool:
+        return not (self.has_guid and self.has_thumb and self.has_summary)
+
+
+class FakePlexLibrary:
+    """Synthetischer Datenbestand + Refresh-Simulation (thread-safe)."""
+
+    def __init__(self, config: FakePlexConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.items: dict[int, FakeItem] = {}
+        self.sections: list[dict] = []
+        self.request_counts: dict[str, int] = {}
+        self.refresh_count = 0
+        self.content_changed_at = 1
+        now = int(time.time())
+
+        if config.listing_file:
+            self._load_listing(config.listing_file)
+        elif config.movies:
+            self.sections.append({"key": 1, "type": "movie", "title": "Filme"})
+            for i in range(config.movies):
+                rk = 1_000_000 + i
+                self.items[rk] = self._make_item(rk, 1, "movie", f"Film {i}", now - i * 600)
+        if config.shows:
+            self.sections.append({"key": 2, "type": "show", "title": "Serien"})
+            rk = 2_000_000
+            for s in range(config.shows):
+                show = self._make_item(rk, 2, "show", f"Serie {s}", now - s * 3600, can_break=False)
+                self.items[rk] = show
+                rk += 1
+                for season_idx in range(1, config.seasons_per_show + 1):
+                    season = self._make_item(rk, 2, "season", f"Staffel {season_idx}", show.added_at, can_break=False)
+                    season.parent_key, season.index = show.rating_key, season_idx
+                    self.items[rk] = season
+                    show.children.append(rk)
+                    rk += 1
+                    for e in range(1, config.episodes_per_season + 1):
+                        ep = self._make_item(rk, 2, "episode", f"Episode {season_idx}x{e:02d}",
+                                             show.added_at - (season_idx * 100 + e) * 60)
+                        ep.parent_key, ep.grandparent_key, ep.index = season.rating_key, show.rating_key, e
+                        self.items[rk] = ep
+                        season.children.append(rk)
+                        rk += 1
+
+    def _load_listing(self, path: str) -> None:
+        """Übernimmt ein aufgezeichnetes Listing (/library/sections/{key}/all?includeGuids=1) als Filme."""
+        import plexlisting
+
+        self.sections.append({"key": 1, "type": "movie", "title": "Filme"})
+        with open(path, "rb") as f:
+            for entry in plexlisting.parse_listing(f):
+                self.items[entry.rating_key] = FakeItem(
+                    entry.rating_key, 1, "movie", entry.title, entry.added_at or 0,
+                    has_guid=entry.has_guid, has_thumb=entry.has_thumb, has_summary=entry.has_summary,
+                )
+
+    def _make_item(self, rk, section_key, libtype, title, added_at, can_break=True) -> FakeItem:
+        item = FakeItem(rk, section_key, libtype, title, added_at)
+        if can_break and self.rng.random() < self.config.broken_ratio:
+            missing = self.rng.choice(("guid", "thumb", "summary"))
+            item.has_guid = missing != "guid"
+            item.has_thumb = missing != "thumb"
+            item.has_summary = missing != "summary"
+        if self.rng.random() < self.config.bad_art_ratio:
+            item.bad_art = True
+        return item
+
+    def count(self, endpoint: str) -> None:
+        with self.lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def refresh(self, rk: int) -> bool:
+        """Wie Plex: ein Refresh von Serie/Staffel aktualisiert auch alle Kinder."""
+        with self.lock:
+            item = self.items.get(rk)
+            if item is None:
+                return False
+            self.refresh_count += 1
+            fix_at = time.time() + self.config.fill_delay
+            fix_ok = self.rng.random() >= self.config.fail_rate
+            stack = [item]
+            while stack:
+                node = stack.pop()
+                node.fix_at, node.fix_ok = fix_at, fix_ok
+                stack.extend(self.items[child] for child in node.children)
+            return True
+
+    def get(self, rk: int) -> Optional[FakeItem]:
+        with self.lock:
+            item = self.items.get(rk)
+            if item and item.fix_at is not None and time.time() >= item.fix_at:
+                if item.fix_ok:
+                    item.has_guid = item.has_thumb = item.has_summary = True
+                    item.bad_art = False
+                self.content_changed_at += 1
+                item.fix_at = None
+            return item
+
+    def section_items(self, section_key: int, type_code: Optional[str]) -> list[FakeItem]:
+        wanted = {"1": "movie", "2": "show", "3": "season", "4": "episode"}.get(type_code or "")
+        result = []
+        for rk in list(self.items):
+            item = self.get(rk)
+            if item.section_key != section_key:
+                continue
+            if wanted:
+                if item.type != wanted:
+                    continue
+            elif item.type not in ("movie", "show"):
+                continue
+            result.append(item)
+        result.sort(key=lambda it: it.added_at, reverse=True)
+        return result
+
+
+def _item_xml(item: FakeItem, section: dict, lib: "FakePlexLibrary") -> str:
+    tag = "Directory" if item.type in ("show", "season") else "Video"
+    attrs = {
+        "ratingKey": str(item.rating_key),
+        "key": f"/library/metadata/{item.rating_key}" + ("/children" if tag == "Directory" else ""),
+        "type": item.type,
+        "title": item.title,
+        "addedAt": str(item.added_at),
+        "updatedAt": str(item.added_at),
+        "librarySectionID": str(section["key"]),
+        "librarySectionTitle": section["title"],
+        "librarySectionKey": f"/library/sections/{section['key']}",
+        "index": str(item.index),
+    }
+    if item.has_thumb:
+        attrs["thumb"] = f"/library/metadata/{item.rating_key}/thumb/{item.added_at}"
+    if item.has_summary:
+        attrs["summary"] = f"Beschreibung für {item.title}"
+    if item.has_guid:
+        attrs["guid"] = f"plex://{item.type}/{item.rating_key:024x}"
+    if item.parent_key:
+        parent = lib.items[item.parent_key]
+        attrs.update({"parentRatingKey": str(parent.rating_key), "parentTitle": parent.title,
+                      "parentIndex": str(parent.index), "parentKey": f"/library/metadata/{parent.rating_key}"})
+    if item.grandparent_key:
+        grand = lib.items[item.grandparent_key]
+        attrs.update({"grandparentRatingKey": str(grand.rating_key), "grandparentTitle": grand.title,
+                      "grandparentKey": f"/library/metadata/{grand.rating_key}"})
+    attr_s = " ".join(f"{k}={quoteattr(v)}" for k, v in attrs.items())
+    guid = f'<Guid id="imdb://tt{item.rating_key:07d}"/>' if item.has_guid else ""
+    return f"<{tag} {attr_s}>{guid}</{tag}>"
+
+
+_META = """<Meta><Type key="/library/sections/{key}/all?type={code}" type="{type}" title="{type}" active="1">
+<Sort default="desc" defaultDirection="desc" descKey="addedAt:desc" key="addedAt" title="Date Added"/>
+<Sort defaultDirection="asc" descKey="titleSort:desc" key="titleSort" title="Title"/>
+</Type>{extra}</Meta>"""
+
+
+class FakePlexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    library: FakePlexLibrary = None  # per Server gesetzt
+
+    def log_message(self, format, *args):  # noqa: A002 - Signatur von BaseHTTPRequestHandler
+        pass
+
+    def _send(self, body: str, status: int = 200, content_type: str = "text/xml;charset=utf-8") -> None:
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def _delay(self) -> None:
+        latency = self.library.config.latency_ms
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+    def do_PUT(self):
+        self._delay()
+        path = urlparse(self.path).path
+        parts = path.strip("/").split("/")
+        if len(parts) == 4 and parts[:2] == ["library", "metadata"] and parts[3] == "refresh":
+            self.library.count("refresh")
+            ok = self.library.refresh(int(parts[2]))
+            return self._send("", 200 if ok else 404)
+        self._send("", 404)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        parts = url.path.strip("/").split("/") if url.path.strip("/") else []
+        lib = self.library
+
+        if not parts or parts == ["identity"]:
+            lib.count("root")
+            return self._send(f'<MediaContainer size="0" machineIdentifier="{MACHINE_ID}" '
+                              f'friendlyName="FakePlex" version="1.40.0.0" myPlex="0"/>')
+
+        if parts == ["library"]:
+            lib.count("library")
+            return self._send('<MediaContainer size="0" identifier="com.plexapp.plugins.library" title1="Plex Library"/>')
+
+        if parts == ["library", "sections"]:
+            lib.count("sections")
+            dirs = "".join(
+                f'<Directory key="{s["key"]}" type="{s["type"]}" title="{s["title"]}" agent="tv.plex.agents.{s["type"]}" '
+                f'scanner="Plex" language="de" uuid="fake-{s["key"]}" updatedAt="0" scannedAt="0" '
+                f'contentChangedAt="{lib.content_changed_at}"/>'
+                for s in lib.sections
+            )
+            return self._send(f'<MediaContainer size="{len(lib.sections)}">{dirs}</MediaContainer>')
+
+        if len(parts) == 4 and parts[:2] == ["library", "sections"] and parts[3] in ("all", "collections"):
+            section = next((s for s in lib.sections if str(s["key"]) == parts[2]), None)
+            if section is None:
+                return self._send("", 404)
+            if qs.get("includeMeta") == "1":
+                lib.count("section_meta")
+                code = "1" if section["type"] == "movie" else "2"
+                extra = ""
+                if section["type"] == "show":
+                    extra = _META.format(key=section["key"], code="4", type="episode", extra="")[6:-7]
+                meta = _META.format(key=section["key"], code=code, type=section["type"], extra=extra)
+                return self._send(f'<MediaContainer size="0" totalSize="0">{meta}</MediaContainer>')
+            if parts[3] == "collections":
+                return self._send('<MediaContainer size="0" totalSize="0"/>')
+            lib.count("section_all")
+            items = lib.section_items(section["key"], qs.get("type"))
+            if qs.get("limit"):
+                items = items[: int(qs["limit"])]
+            start = int(self.headers.get("X-Plex-Container-Start") or qs.get("X-Plex-Container-Start") or 0)
+            size_h = self.headers.get("X-Plex-Container-Size") or qs.get("X-Plex-Container-Size")
+            size = int(size_h) if size_h is not None else len(items)
+            page = items[start:start + size]
+            body = "".join(_item_xml(it, section, lib) for it in page)
+            return self._send(
+                f'<MediaContainer size="{len(page)}" totalSize="{len(items)}" offset="{start}" '
+                f'librarySectionID="{section["key"]}" librarySectionTitle="{section["title"]}">{body}</MediaContainer>'
+            )
+
+        if len(parts) >= 3 and parts[:2] == ["library", "metadata"]:
+            if len(parts) == 4 and parts[3] == "children":
+                lib.count("children")
+                parent = lib.get(int(parts[2]))
+                if parent is None:
+                    return self._send("", 404)
+                section = next(s for s in lib.sections if s["key"] == parent.section_key)
+                body = "".join(_item_xml(lib.get(rk), section, lib) for rk in parent.children)
+                return self._send(f'<MediaContainer size="{len(parent.children)}">{body}</MediaContainer>')
+            lib.count("metadata")
+            found = []
+            for key in parts[2].split(","):
+                item = lib.get(int(key)) if key.isdigit() else None
+                if item is not None:
+                    section = next(s for s in lib.sections if s["key"] == item.section_key)
+                    found.append(_item_xml(item, section, lib))
+            if not found:
+                return self._send("", 404)
+            return self._send(f'<MediaContainer size="{len(found)}">{"".join(found)}</MediaContainer>')
+
+        if parts == ["status", "sessions"]:
+            lib.count("sessions")
+            cfg = lib.config
+            videos = []
+            for i in range(cfg.sessions):
+                transcode = (f'<TranscodeSession key="/transcode/sessions/t{i}" videoDecision="transcode"/>'
+                             if i < cfg.transcodes else "")
+                videos.append(f'<Video ratingKey="{1_000_000 + i}" type="movie" title="Film {i}" sessionKey="{i}">'
+                              f'<Player state="playing"/>{transcode}</Video>')
+            return self._send(f'<MediaContainer size="{cfg.sessions}">{"".join(videos)}</MediaContainer>')
+
+        if parts[:3] == ["photo", ":", "transcode"]:
+            lib.count("photo")
+            thumb_url = qs.get("url", "")
+            try:
+                rk = int(thumb_url.split("/")[3])
+            except (IndexError, ValueError):
+                return self._send("", 404)
+            item = lib.get(rk)
+            if item is None or not item.has_thumb or item.bad_art:
+                return self._send("", 404, content_type="text/plain")
+            # Mini-"JPEG": Größe abhängig vom Key, damit Fingerprints unterscheidbar sind
+            data = b"\xff\xd8\xff\xe0" + rk.to_bytes(8, "big") * 16 + b"\xff\xd9"
+            return self._send(data, content_type="image/jpeg")
+
+        self._send("", 404)
+
+
+def start_fake_plex(config: Optional[FakePlexConfig] = None, host: str = "127.0.0.1", port: int = 0):
+    """Startet den Fake-Server in einem Daemon-Thread. Gibt (server, base_url, library) zurück."""
+    library = FakePlexLibrary(config or FakePlexConfig())
+    handler = type("BoundFakePlexHandler", (FakePlexHandler,), {"library": library})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", library
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Fake-Plex-Server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=32499)
+    parser.add_argument("--items", type=int, default=1000, help="Anzahl Filme")
+    parser.add_argument("--shows", type=int, default=0)
+    parser.add_argument("--broken", type=float, default=0.05, help="Anteil kaputter Items")
+    parser.add_argument("--bad-art", type=float, default=0.0, help="Anteil Items mit defektem Poster (Transcoder 404)")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--fill-delay", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--sessions", type=int, default=0)
+    parser.add_argument("--transcodes", type=int, default=0)
+    parser.add_argument("--listing", help="aufgezeichnetes Listing statt synthetischer Filme")
+    args = parser.parse_args()
+
+    config = FakePlexConfig(movies=args.items, shows=args.shows, broken_ratio=args.broken, bad_art_ratio=args.bad_art,
+                            latency_ms=args.latency_ms, fill_delay=args.fill_delay, fail_rate=args.fail_rate,
+                            sessions=args.sessions, transcodes=args.transcodes, listing_file=args.listing)
+    server, url, _ = start_fake_plex(config, args.host, args.port)
+    print(f"FakePlex läuft auf {url} (PLEX_TOKEN beliebig)", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
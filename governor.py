@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Optional, Tuple
+
+import profiling
+
+logger = logging.getLogger(__name__)
+
+# Wie lange ein wartender Worker maximal schläft, bevor er Abbruch/Deadline erneut prüft
+WAIT_POLL_SECONDS = 1.0
+
+
+class LoadGovernor:
+    """
+    Drosselt Phase 3 abhängig von der Plex-Auslastung.
+
+    Fragt periodisch /status/sessions ab (aktive Streams + TranscodeSessions) und
+    setzt daraus das erlaubte Refresh-Limit:
+      - Transcodes >= pause_transcodes  -> 0 (Pause, laufende Refreshes werden fertig)
+      - sonst max_concurrency - aktive Streams; ab max_concurrency Streams 0 (Pause),
+        bei fix_concurrency=1 also schon ab dem ersten Stream
+      - Server idle                     -> max_concurrency
+    Ist der Endpunkt nicht erreichbar (z.B. fehlende Rechte), bleibt das Limit auf Maximum.
+    """
+
+    def __init__(self, plex, max_concurrency: int, interval: float = 15.0,
+                 pause_transcodes: int = 1, log_callback: Optional[Callable[[str], None]] = None):
+        self.plex = plex
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.interval = max(1.0, float(interval))
+        self.pause_transcodes = max(0, int(pause_transcodes))
+        self.log = log_callback or (lambda msg: logger.info(msg))
+        self.limit = self.max_concurrency
+        self.active = 0
+        self.sessions = 0
+        self.transcodes = 0
+        self.paused_seconds = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sample_failed = False
+        self._pause_start: Optional[float] = None
+
+    @classmethod
+    def from_settings(cls, plex, settings, max_concurrency: int, log_callback=None) -> Optional["LoadGovernor"]:
+        if not settings.get("governor_active", True):
+            return None
+        try:
+            interval = float(settings.get("governor_interval_seconds", 15))
+            pause_transcodes = int(settings.get("governor_pause_transcodes", 1))
+        except (TypeError, ValueError):
+            interval, pause_transcodes = 15.0, 1
+        return cls(plex, max_concurrency, interval, pause_transcodes, log_callback)
+
+    # --- Messung ---
+
+    def sample(self) -> Tuple[int, int]:
+        """Liest (aktive Streams, Transcodes) von /status/sessions (blockierend)."""
+        root = self.plex.query("/status/sessions")
+        sessions = sum(1 for child in root if child.tag in ("Video", "Track", "Photo"))
+        transcodes = len(root.findall(".//TranscodeSession"))
+        return sessions, transcodes
+
+    def compute_limit(self, sessions: int, transcodes: int) -> int:
+        if self.pause_transcodes and transcodes >= self.pause_transcodes:
+            return 0
+        if sessions <= 0:
+            return self.max_concurrency
+        return max(0, self.max_concurrency - sessions)
+
+    async def refresh(self) -> int:
+        try:
+            sessions, transcodes = await profiling.to_thread(self.sample)
+        except Exception as e:
+            if not self._sample_failed:
+                logger.warning(f"Governor: /status/sessions nicht abrufbar ({e}) - keine Drosselung")
+                self._sample_failed = True
+            sessions, transcodes = 0, 0
+        else:
+            self._sample_failed = False
+        async with self._cond:
+            self._apply(sessions, transcodes)
+        return self.limit
+
+    def _apply(self, sessions: int, transcodes: int) -> None:
+        new_limit = self.compute_limit(sessions, transcodes)
+        if new_limit != self.limit:
+            if new_limit == 0:
+                self.log(f"🎬 {sessions} Stream(s), {transcodes} Transcode(s) → pausiere Refreshes")
+            elif new_limit == self.max_concurrency:
+                self.log(f"🟢 Server idle → Parallelität {new_limit}")
+            else:
+                self.log(f"🎬 {sessions} Stream(s) → Parallelität {new_limit}")
+        if new_limit == 0 and self._pause_start is None:
+            self._pause_start = time.monotonic()
+        elif new_limit > 0 and self._pause_start is not None:
+            self.paused_seconds += time.monotonic() - self._pause_start
+            self._pause_start = None
+        self.sessions, self.transcodes, self.limit = sessions, transcodes, new_limit
+        self._cond.notify_all()
+
+    async def _sample_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+    # --- Lebenszyklus (innerhalb des Event-Loops) ---
+
+    async def start(self) -> None:
+        self._cond = asyncio.Condition()
+        await self.refresh()
+        self._task = asyncio.create_task(self._sample_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pause_start is not None:
+            self.paused_seconds += time.monotonic() - self._pause_start
+            self._pause_start = None
+
+    # --- Slots ---
+
+    async def acquire(self, should_stop: Callable[[], bool]) -> bool:
+        """
+        Wartet auf einen freien Refresh-Slot. Gibt False zurück, wenn should_stop()
+        während des Wartens wahr wird (Abbruch oder Deadline).
+        """
+        async with self._cond:
+            t_wait = time.perf_counter()
+            try:
+                while self.active >= self.limit:
+                    if should_stop():
+                        return False
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=WAIT_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                self.active += 1
+                return True
+            finally:
+                profiling.record("sleep", time.perf_counter() - t_wait)
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.active = max(0, self.active - 1)
+            self._cond.notify_all()
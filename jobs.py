@@ -8,7 +8,7 @@ from pathlib import Path
 from typing import Any, Optional
 
 BASE_DIR = Path(__file__).resolve().parent
-DB_PATH = BASE_DIR / "refresh_state.db"
+DB_PATH = Path(os.getenv("PSR_DB_PATH", str(BASE_DIR / "refresh_state.db")))
 LOG_DIR = BASE_DIR / "logs"
 
 
@@ -40,6 +40,15 @@ def init_jobs_db():
                 cancel_requested INTEGER NOT NULL DEFAULT 0
             )
         """)
+        columns = {r["name"] for r in conn.execute("PRAGMA table_info(scan_runs)").fetchall()}
+        if "source" not in columns:
+            conn.execute("ALTER TABLE scan_runs ADD COLUMN source TEXT")
+        if "profile" not in columns:
+            conn.execute("ALTER TABLE scan_runs ADD COLUMN profile TEXT")
+        if "profile_json" not in columns:
+            conn.execute("ALTER TABLE scan_runs ADD COLUMN profile_json TEXT")
+        if "settings_json" not in columns:
+            conn.execute("ALTER TABLE scan_runs ADD COLUMN settings_json TEXT")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_status ON scan_runs(status)")
         conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_runs_started ON scan_runs(started_at)")
         conn.commit()
@@ -89,9 +98,12 @@ def mark_orphaned_jobs_interrupted(grace_minutes: int | None = None) -> int:
 
     return updated
 
-def create_scan_job(source: str = "manual") -> dict[str, Any]:
+def create_scan_job(source: str = "manual", profile: Optional[str] = None,
+                    settings: Optional[dict[str, Any]] = None) -> dict[str, Any]:
     """
     Legt einen neuen Job an und reserviert den Log-Pfad.
+    profile = Name des Scan-Profils (None = globale Einstellungen).
+    settings = effektive Scan-Einstellungen (inkl. Overrides) → settings_json, für "cli resume".
     """
     LOG_DIR.mkdir(parents=True, exist_ok=True)
     job_id = uuid.uuid4().hex
@@ -101,15 +113,19 @@ def create_scan_job(source: str = "manual") -> dict[str, Any]:
     with get_db_connection() as conn:
         conn.execute(
             """
-            INSERT INTO scan_runs(job_id, status, started_at, log_path, stats_json, error, cancel_requested)
-            VALUES (?, 'running', ?, ?, NULL, NULL, 0)
+            INSERT INTO scan_runs(job_id, status, started_at, log_path, stats_json, error, cancel_requested, source,
+                                  profile, settings_json)
+            VALUES (?, 'running', ?, ?, NULL, NULL, 0, ?, ?, ?)
             """,
-            (job_id, started_at, log_path),
+            (job_id, started_at, log_path, source, profile,
+             json.dumps(settings, ensure_ascii=False) if settings is not None else None),
         )
         conn.commit()
 
-    append_job_log_path(log_path, f"[JOB {job_id}] started (source={source})")
-    return {"job_id": job_id, "status": "running", "started_at": started_at, "log_path": log_path}
+    profile_info = f", profile={profile}" if profile else ""
+    append_job_log_path(log_path, f"[JOB {job_id}] started (source={source}{profile_info})")
+    return {"job_id": job_id, "status": "running", "started_at": started_at, "log_path": log_path,
+            "source": source, "profile": profile}
 
 
 def request_cancel(job_id: str) -> None:
@@ -131,10 +147,13 @@ def set_job_status(
     finished: bool = False,
     stats: Optional[dict[str, Any]] = None,
     error: Optional[str] = None,
+    timings: Optional[dict[str, Any]] = None,
 ) -> None:
+    """timings: Laufzeitprofil (profiling.ScanProfile.to_dict) → scan_runs.profile_json."""
     auto_finished = finished or (status != "running")
     finished_at = _utcnow_iso() if auto_finished else None
     stats_json = json.dumps(stats, ensure_ascii=False) if stats is not None else None
+    profile_json = json.dumps(timings, ensure_ascii=False) if timings is not None else None
 
     with get_db_connection() as conn:
         conn.execute(
@@ -143,10 +162,11 @@ def set_job_status(
                SET status=?,
                    finished_at=COALESCE(?, finished_at),
                    stats_json=COALESCE(?, stats_json),
-                   error=COALESCE(?, error)
+                   error=COALESCE(?, error),
+                   profile_json=COALESCE(?, profile_json)
              WHERE job_id=?
             """,
-            (status, finished_at, stats_json, error, job_id),
+            (status, finished_at, stats_json, error, profile_json, job_id),
         )
         conn.commit()
 
@@ -299,5 +319,77 @@ def cleanup_old_scan_runs(keep_last_n: int | None = None, keep_days: int | None
     return removed
 
 
-# --- Initialisierung beim Import ---
-init_jobs_db()
+def _db_file_sizes(db_path: Path) -> dict[str, int]:
+    sizes = {}
+    for suffix in ("", "-wal"):
+        p = Path(str(db_path) + suffix)
+        try:
+            sizes[suffix or "db"] = p.stat().st_size
+        except FileNotFoundError:
+            sizes[suffix or "db"] = 0
+    return {"db": sizes["db"], "wal": sizes["-wal"]}
+
+
+def run_db_maintenance(full_integrity_check: bool = False) -> dict[str, Any]:
+    """
+    SQLite-Wartung für refresh_state.db (für ruhige Zeiten gedacht):
+      - stellt einmalig auf auto_vacuum=INCREMENTAL um (einmaliges VACUUM)
+      - incremental_vacuum gibt freie Seiten (z.B. nach cleanup_old_scan_runs) zurück
+      - ANALYZE beim ersten Lauf, danach PRAGMA optimize
+      - quick_check (bzw. integrity_check bei full_integrity_check)
+      - wal_checkpoint(TRUNCATE) setzt das WAL auf 0 Bytes zurück
+    Gibt einen Report mit Größen vorher/nachher und freigegebenen Bytes zurück.
+    """
+    started = dt.datetime.now()
+    before = _db_file_sizes(DB_PATH)
+    report: dict[str, Any] = {"started_at": _utcnow_iso(), "before": before}
+
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    try:
+        conn.execute("PRAGMA busy_timeout=30000;")
+        report["freelist_pages_before"] = conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        report["full_vacuum"] = False
+        if auto_vacuum != 2:
+            # Umstellung greift erst nach einem vollständigen VACUUM
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            report["full_vacuum"] = True
+        else:
+            conn.execute("PRAGMA incremental_vacuum")
+
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        ).fetchone()
+        if has_stats:
+            conn.execute("PRAGMA analysis_limit=1000")
+            conn.execute("PRAGMA optimize")
+        else:
+            conn.execute("ANALYZE")
+
+        check_pragma = "integrity_check" if full_integrity_check else "quick_check"
+        problems = [r[0] for r in conn.execute(f"PRAGMA {check_pragma}").fetchall()]
+        report["integrity"] = "ok" if problems == ["ok"] else "; ".join(problems[:20])
+
+        busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        report["checkpoint"] = {"busy": busy, "wal_frames": wal_frames, "checkpointed": checkpointed}
+    finally:
+        conn.close()
+
+    after = _db_file_sizes(DB_PATH)
+    report["after"] = after
+    report["reclaimed_bytes"] = (before["db"] + before["wal"]) - (after["db"] + after["wal"])
+    report["duration_s"] = round((dt.datetime.now() - started).total_seconds(), 2)
+    return report
+
+
+_jobs_db_ready = False
+
+
+def ensure_jobs_db() -> None:
+    """init_jobs_db einmal pro Prozess (früher beim Import von jobs.py)."""
+    global _jobs_db_ready
+    if not _jobs_db_ready:
+        init_jobs_db()
+        _jobs_db_ready = True
@@ -1,17 +1,30 @@
 import os
 import asyncio
 import datetime as dt
+import heapq
 import sqlite3
 import time
 import json
 import logging
+import random
+import socket
+import sys
 import threading
-from typing import List, Optional, Tuple, Dict, Any
+from typing import Callable, List, Optional, Tuple, Dict, Any, Set
+from array import array
 from contextlib import contextmanager
+from dataclasses import dataclass, field
 
-from plexapi.server import PlexServer
 from dotenv import load_dotenv
 
+import artwork
+import governor
+import metrics
+import plexlisting
+import profiling
+import scanlock
+import settingsstore
+
 # Importiert notifications.py (Muss im selben Ordner liegen!)
 try:
     import notifications
@@ -39,15 +52,22 @@ except ValueError:
 
 DB_PATH = os.getenv("PSR_DB_PATH", os.path.join(BASE_DIR, "refresh_state.db"))
 SETTINGS_FILE = os.getenv("PSR_SETTINGS_PATH", os.path.join(BASE_DIR, "settings.json"))
+# Nur noch für die einmalige Migration nach run_state/schedule_slots
 STATE_FILE = os.getenv("PSR_STATE_PATH", os.path.join(BASE_DIR, "run_state.json"))
+# Besitzerkennung dieses Prozesses (Schedule-Slots, Scan-Leases)
+OWNER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
 
 
 # Connection Pooling - Singleton Pattern
 _plex_connection = None
 _plex_last_check = None
-_run_state = None
-_state_lock = threading.Lock()
-scan_lock = threading.Lock()
 
 def _is_cancel_requested(cancel_flag) -> bool:
     """cancel_flag kann dict (legacy) ODER callable (DB-check) sein."""
@@ -63,6 +83,10 @@ def _is_cancel_requested(cancel_flag) -> bool:
 _plex_lock = threading.Lock()
 
 
+class PlexConnectionError(ConnectionError):
+    """Scan konnte Plex nicht erreichen (anders als eine belegte Scan-Sperre, bei der start_scan None liefert)."""
+
+
 def get_plex_connection(force_reconnect=False):
     """
     Globale Plex-Verbindung als Singleton mit Auto-Reconnect.
@@ -96,7 +120,10 @@ def get_plex_connection(force_reconnect=False):
             
             # Neue Verbindung aufbauen
             try:
+                from plexapi.server import PlexServer  # lazy: plexapi/requests kosten ~100 ms Importzeit
+
                 _plex_connection = PlexServer(PLEX_URL, PLEX_TOKEN, timeout=PLEX_TIMEOUT)
+                metrics.instrument_session(_plex_connection._session)
                 _plex_last_check = now
                 logger.info("Plex-Verbindung hergestellt")
             except Exception as e:
@@ -114,103 +141,806 @@ def reset_plex_connection():
     _plex_last_check = None
 
 # --- SETTINGS ---
+DEFAULT_SETTINGS = {
+    "libraries": [],
+    "days": 30,
+    "max_items": 50,
+    "dry_run": False,
+    "schedule_active": False,
+    "schedule_time": "04:00",
+    "schedule_crons": [],
+    "profiles": [],
+    "pinned_rating_keys": [],
+    "time_budget_minutes": 0,
+    "finish_by": "",
+    "lean_listing": True,
+    "governor_active": True,
+    "governor_interval_seconds": 15,
+    "governor_pause_transcodes": 1,
+    "failed_backoff_hours": 24,
+    "failed_backoff_max_hours": 336,
+    "failed_retry_pool_limit": 50,
+    "quarantine_after_failures": 5,
+    "profile_cprofile": False,
+    "schedule_catchup_hours": 6,
+    "maintenance_active": True,
+    "maintenance_time": "03:30",
+    "fix_concurrency": 1,
+    "scan_lock_wait_seconds": 0,
+    "episode_detection": True,
+    "max_episodes": 500,
+    "season_refresh_min_episodes": 3,
+    "verify_artwork": False,
+    "artwork_concurrency": 4,
+    "artwork_recheck_days": 30,
+}
+
+# Typ und Grenzen je Schlüssel: (Typ, Minimum, Maximum). Ungültige Werte fallen auf den
+# Default zurück, Werte außerhalb der Grenzen werden begrenzt. Unbekannte Schlüssel bleiben.
+SETTINGS_SCHEMA = {
+    "libraries": (list, None, None),
+    "days": (int, 1, 36500),
+    "max_items": (int, 1, 10_000_000),
+    "dry_run": (bool, None, None),
+    "schedule_active": (bool, None, None),
+    "schedule_time": ("hhmm", None, None),
+    "schedule_crons": (list, None, None),
+    "profiles": (list, None, None),
+    "pinned_rating_keys": (list, None, None),
+    "time_budget_minutes": (float, 0, None),
+    "finish_by": ("hhmm?", None, None),
+    "lean_listing": (bool, None, None),
+    "governor_active": (bool, None, None),
+    "governor_interval_seconds": (float, 1, None),
+    "governor_pause_transcodes": (int, 0, None),
+    "failed_backoff_hours": (float, 0, None),
+    "failed_backoff_max_hours": (float, 0, None),
+    "failed_retry_pool_limit": (int, 0, None),
+    "quarantine_after_failures": (int, 0, None),
+    "profile_cprofile": (bool, None, None),
+    "schedule_catchup_hours": (float, 0, None),
+    "maintenance_active": (bool, None, None),
+    "maintenance_time": ("hhmm", None, None),
+    "fix_concurrency": (int, 1, 8),
+    "scan_lock_wait_seconds": (float, 0, None),
+    "episode_detection": (bool, None, None),
+    "max_episodes": (int, 1, 10_000_000),
+    "season_refresh_min_episodes": (int, 0, None),
+    "verify_artwork": (bool, None, None),
+    "artwork_concurrency": (int, 1, 16),
+    "artwork_recheck_days": (float, 0, None),
+}
+
+
+def _coerce_setting(kind, value):
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)) and value in (0, 1):
+            return bool(value)
+        raise ValueError("kein Boolean")
+    if kind is int:
+        if isinstance(value, bool):
+            raise ValueError("Boolean statt Zahl")
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError("keine Ganzzahl")
+        return int(value)
+    if kind is float:
+        if isinstance(value, bool):
+            raise ValueError("Boolean statt Zahl")
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    if kind is list:
+        if not isinstance(value, list):
+            raise ValueError("keine Liste")
+        return value
+    if kind in ("hhmm", "hhmm?"):
+        text = str(value or "").strip()
+        if kind == "hhmm?" and not text:
+            return ""
+        dt.datetime.strptime(text, "%H:%M")
+        return text
+    return value
+
+
+def validate_settings(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Prüft bekannte Schlüssel gegen SETTINGS_SCHEMA (Fallback auf DEFAULT_SETTINGS)."""
+    clean = dict(data)
+    for key, (kind, lo, hi) in SETTINGS_SCHEMA.items():
+        if key not in clean:
+            continue
+        try:
+            value = _coerce_setting(kind, clean[key])
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Ungültige Einstellung {key}={clean[key]!r} ({e}) - nutze Default {DEFAULT_SETTINGS.get(key)!r}")
+            clean[key] = DEFAULT_SETTINGS.get(key)
+            continue
+        if lo is not None and value < lo:
+            value = lo
+        if hi is not None and value > hi:
+            value = hi
+        clean[key] = value
+    return clean
+
+
+_settings_store = settingsstore.SettingsStore(SETTINGS_FILE, DEFAULT_SETTINGS, validate_settings)
+
+
 def load_settings():
-    default = {
-        "libraries": [],
-        "days": 30,
-        "max_items": 50,
-        "dry_run": False,
-        "schedule_active": False,
-        "schedule_time": "04:00"
-    }
-    if not os.path.exists(SETTINGS_FILE):
-        return default
-    try:
-        with open(SETTINGS_FILE, "r") as f:
-            data = json.load(f)
-            return {**default, **data}
-    except (json.JSONDecodeError, IOError) as e:
-        logger.error(f"Error loading settings: {e}")
-        return default
+    """Aktuelle Settings (Kopie). Gecacht, neu gelesen nur wenn settings.json sich geändert hat."""
+    return _settings_store.get()
+
 
 def save_settings(settings):
+    """Validiert und schreibt atomar; Subscriber (z.B. der Scheduler) werden sofort benachrichtigt."""
     try:
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump(settings, f, indent=4)
+        _settings_store.save(settings)
     except Exception as e:
         logger.error(f"Error saving settings: {e}")
 
 
-def _read_state_file():
-    if os.path.exists(STATE_FILE):
-        try:
-            with open(STATE_FILE, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError) as e:
-            logger.error(f"Error loading run state: {e}")
-    return {"last_run_date": None}
+def subscribe_settings(callback):
+    """callback(settings) nach jeder Änderung (save_settings oder geänderte Datei)."""
+    return _settings_store.subscribe(callback)
+
+
+def watch_settings():
+    """Startet den Datei-Watcher, damit Änderungen anderer Prozesse ohne Zugriff ankommen."""
+    _settings_store.watch()
+
+
+def settings_version() -> int:
+    """Zähler, der sich bei jeder übernommenen Änderung erhöht (prüft nur per stat)."""
+    return _settings_store.poll()
+
+
+# Scan-Profile: benannte Overrides der globalen Scan-Parameter mit eigenem Zeitplan
+PROFILE_KEYS = ("libraries", "days", "max_items", "dry_run", "fix_concurrency",
+                "failed_retry_pool_limit", "failed_backoff_hours", "time_budget_minutes", "finish_by")
 
 
-def load_run_state():
-    global _run_state
-    with _state_lock:
-        if _run_state is None:
-            _run_state = _read_state_file()
-        return dict(_run_state)
+def normalize_profiles(profiles) -> List[Dict[str, Any]]:
+    """
+    Validiert eine Profil-Liste (z.B. aus dem UI-Editor) und gibt sie bereinigt zurück.
+    Wirft ValueError mit einer lesbaren Meldung bei ungültigen Einträgen.
+    """
+    import scheduler  # Lazy import - kein Circular Import
+
+    if not isinstance(profiles, list):
+        raise ValueError("Profile müssen eine Liste sein")
+    result, names = [], set()
+    for idx, p in enumerate(profiles):
+        if not isinstance(p, dict):
+            raise ValueError(f"Profil #{idx + 1} ist kein Objekt")
+        name = str(p.get("name") or "").strip()
+        if not name:
+            raise ValueError(f"Profil #{idx + 1} hat keinen Namen")
+        if name in names:
+            raise ValueError(f"Profilname doppelt: {name}")
+        names.add(name)
+        profile: Dict[str, Any] = {"name": name, "enabled": bool(p.get("enabled", True))}
+        if p.get("cron"):
+            scheduler.CronExpression(p["cron"])  # wirft ValueError
+            profile["cron"] = str(p["cron"])
+        if "libraries" in p:
+            if not isinstance(p["libraries"], list):
+                raise ValueError(f"{name}: libraries muss eine Liste sein")
+            profile["libraries"] = [str(l) for l in p["libraries"]]
+        # Overrides nach denselben Regeln wie validate_settings (SETTINGS_SCHEMA), aber mit Fehler
+        # statt stillem Default/Begrenzen: der Editor soll den Tippfehler zeigen
+        for key in PROFILE_KEYS:
+            if key == "libraries" or p.get(key) is None:
+                continue
+            kind, lo, hi = SETTINGS_SCHEMA[key]
+            try:
+                value = _coerce_setting(kind, p[key])
+            except (TypeError, ValueError):
+                expected = {int: "eine Ganzzahl", float: "eine Zahl", bool: "ja/nein"}.get(kind, "HH:MM")
+                raise ValueError(f"{name}: {key} muss {expected} sein")
+            if (lo is not None and value < lo) or (hi is not None and value > hi):
+                bounds = f"zwischen {lo} und {hi}" if hi is not None else f"mindestens {lo}"
+                raise ValueError(f"{name}: {key} muss {bounds} sein")
+            profile[key] = value
+        result.append(profile)
+    return result
+
+
+def get_profile(settings, name: Optional[str]) -> Optional[Dict[str, Any]]:
+    for p in settings.get("profiles") or []:
+        if p.get("name") == name:
+            return p
+    return None
+
+
+def resolve_scan_settings(settings, profile_name: Optional[str] = None) -> Dict[str, Any]:
+    """Globale Settings + Overrides des Profils (unbekanntes/leeres Profil = globale Settings)."""
+    resolved = dict(settings)
+    profile = get_profile(settings, profile_name) if profile_name else None
+    if profile:
+        for key in PROFILE_KEYS:
+            if key in profile:
+                resolved[key] = profile[key]
+        resolved["profile"] = profile["name"]
+    return resolved
+
+
+def load_run_state() -> Dict[str, Any]:
+    """Globale Laufzustände (last_run_date, Wartung, ...) aus der run_state-Tabelle."""
+    ensure_db()
+    state: Dict[str, Any] = {"last_run_date": None}
+    with get_db_connection() as conn:
+        for row in conn.execute("SELECT key, value FROM run_state"):
+            try:
+                state[row["key"]] = json.loads(row["value"])
+            except (TypeError, ValueError):
+                logger.error(f"Error loading run state: Schlüssel {row['key']} ungültig")
+    return state
+
+
+def update_run_state(**values):
+    """Aktualisiert einzelne Schlüssel in run_state (eine Transaktion, prozessübergreifend atomar)."""
+    ensure_db()
+    now = int(time.time())
+    try:
+        with get_db_connection() as conn:
+            conn.executemany("""
+                INSERT INTO run_state(key, value, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """, [(key, json.dumps(value, ensure_ascii=False), now) for key, value in values.items()])
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Error saving run state: {e}")
 
 
 def update_last_run_date(date_str: str):
-    global _run_state
-    with _state_lock:
-        if _run_state is None:
-            _run_state = _read_state_file()
-        _run_state["last_run_date"] = date_str
-        try:
-            with open(STATE_FILE, "w") as f:
-                json.dump(_run_state, f, indent=4)
-        except Exception as e:
-            logger.error(f"Error saving run state: {e}")
+    update_run_state(last_run_date=date_str)
     return date_str
 
+
+# --- SCHEDULE-SLOTS ---
+# Je Zeitplan-Eintrag (scan:default, profile:<name>, maintenance, ...) eine Zeile. last_fire ist der
+# zuletzt beanspruchte planmäßige Zeitpunkt; ein Slot wird per Compare-and-Set beansprucht, sodass
+# bei mehreren Prozessen mit Scheduler genau einer auslöst.
+
+def get_schedule_slots() -> Dict[str, Dict[str, Any]]:
+    """entry_id -> {last_fire, next_fire, last_success, last_status, claimed_by, claimed_at}."""
+    ensure_db()
+    with get_db_connection() as conn:
+        return {row["entry_id"]: dict(row) for row in conn.execute("SELECT * FROM schedule_slots")}
+
+
+def seed_schedule_slots(first_fires: Dict[str, float]) -> None:
+    """Neue Einträge ab `ts` zählen (nichts rückwirkend); bestehende last_fire bleiben unverändert."""
+    if not first_fires:
+        return
+    with get_db_connection() as conn:
+        conn.executemany("""
+            INSERT INTO schedule_slots(entry_id, last_fire) VALUES (?, ?)
+            ON CONFLICT(entry_id) DO UPDATE SET last_fire = excluded.last_fire WHERE last_fire IS NULL
+        """, list(first_fires.items()))
+        conn.commit()
+
+
+def claim_schedule_slot(entry_id: str, slot_ts: float, owner: Optional[str] = None) -> bool:
+    """
+    Beansprucht den planmäßigen Zeitpunkt `slot_ts` eines Eintrags. Gelingt nur, wenn noch
+    kein Prozess diesen (oder einen späteren) Slot beansprucht hat - ein einzelnes UPDATE,
+    also atomar auch über Prozesse hinweg.
+    """
+    with get_db_connection() as conn:
+        cur = conn.execute("""
+            UPDATE schedule_slots SET last_fire = ?, claimed_by = ?, claimed_at = ?
+             WHERE entry_id = ? AND last_fire IS NOT NULL AND last_fire < ?
+        """, (slot_ts, owner or OWNER_ID, time.time(), entry_id, slot_ts))
+        conn.commit()
+        return cur.rowcount == 1
+
+
+def finish_schedule_slot(entry_id: str, status: str) -> None:
+    """Ergebnis des zuletzt beanspruchten Slots; last_success nur bei status == 'success'."""
+    now = time.time()
+    with get_db_connection() as conn:
+        conn.execute("""
+            UPDATE schedule_slots SET last_status = ?,
+                   last_success = CASE WHEN ? = 'success' THEN ? ELSE last_success END
+             WHERE entry_id = ?
+        """, (status, status, now, entry_id))
+        conn.commit()
+
+
+def record_schedule_next(next_fires: Dict[str, Optional[float]]) -> None:
+    """Nächste geplante Zeitpunkte (für UI/CLI anderer Prozesse sichtbar)."""
+    if not next_fires:
+        return
+    with get_db_connection() as conn:
+        conn.executemany("""
+            INSERT INTO schedule_slots(entry_id, next_fire) VALUES (?, ?)
+            ON CONFLICT(entry_id) DO UPDATE SET next_fire = excluded.next_fire
+        """, list(next_fires.items()))
+        conn.commit()
+
+
 # --- DATABASE ---
 
 @contextmanager
 def get_db_connection():
-    """Context Manager für saubere DB-Verbindungen."""
-    conn = sqlite3.connect(DB_PATH, timeout=30)
-    conn.execute("PRAGMA journal_mode=WAL;")
-    conn.execute("PRAGMA busy_timeout=30000;")
-    conn.row_factory = sqlite3.Row
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """
+    Context Manager für saubere DB-Verbindungen. Die Dauer zählt im Scan-Profil als sqlite,
+    auch innerhalb eines to_thread-Aufrufs (dort wird sie von "plex" abgezogen).
+    """
+    with profiling.block("sqlite"):
+        conn = sqlite3.connect(DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA busy_timeout=30000;")
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+# Kompakte Kodierung: Status als Integer, Bibliotheken interniert (libraries), Zeiten als Epoch-Sekunden
+STATE_CODES = {"fixed": 1, "failed": 2, "dry_run": 3, "quarantined": 4}
+STATE_NAMES = {v: k for k, v in STATE_CODES.items()}
+
+_library_ids: Dict[str, int] = {}
+_library_names: Dict[int, str] = {}
+_library_ids_lock = threading.Lock()
 
 
 def init_db():
     with get_db_connection() as conn:
         conn.execute("""
-            CREATE TABLE IF NOT EXISTS media_state(
-                rating_key TEXT PRIMARY KEY,
-                library TEXT,
+            CREATE TABLE IF NOT EXISTS libraries(
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_items(
+                rating_key INTEGER PRIMARY KEY,
+                library_id INTEGER,
+                state INTEGER NOT NULL,
+                last_scan INTEGER NOT NULL,
                 title TEXT,
-                updated_at TEXT,
-                state TEXT,
                 note TEXT,
-                last_scan TEXT
+                attempt_count INTEGER NOT NULL DEFAULT 0,
+                next_eligible_at INTEGER
             )
         """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_items_state ON media_items(state, last_scan)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_items_last_scan ON media_items(last_scan)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_media_items_library ON media_items(library_id, last_scan)")
+        _migrate_legacy_media_state(conn)
+        _init_compat_view(conn)
+        _init_title_fts(conn)
+        _init_summary_tables(conn)
+        _init_history_tables(conn)
+        _init_deferred_table(conn)
+        _init_backoff_columns(conn)
+        _init_run_state_tables(conn)
+        scanlock.init_table(conn)
+        artwork.init_table(conn)
+        _init_retry_index(conn)
         conn.commit()
 
 
-# Initialize database on module load
-init_db()
+def _init_retry_index(conn) -> None:
+    """
+    Partieller Index nur über failed-Items, sortiert wie die Retry-Pool-Abfrage (last_scan DESC):
+    LIMIT liest nur die ersten Einträge, Bibliothek und Backoff werden aus dem Index gefiltert.
+    Die erste Fassung (library_id, last_scan, ...) passte nicht zum ORDER BY und wurde nie genutzt.
+    """
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE type='index' AND name='idx_media_items_retry'").fetchone()
+    if row and "last_scan DESC" not in row["sql"]:
+        conn.execute("DROP INDEX idx_media_items_retry")
+    # Literal muss zur Query passen, sonst greift der partielle Index nicht
+    conn.execute(f"""CREATE INDEX IF NOT EXISTS idx_media_items_retry
+                     ON media_items(last_scan DESC, library_id, next_eligible_at)
+                     WHERE state = {STATE_CODES['failed']}""")
+
+
+def _iso_to_epoch(value) -> int:
+    try:
+        return int(dt.datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+def _migrate_legacy_media_state(conn):
+    """
+    Einmalige In-Place-Migration der alten TEXT-Tabelle media_state nach media_items.
+    Danach ersetzt ein gleichnamiger View die alte Tabelle (Kompatibilität für Ad-hoc-SQL).
+    """
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='media_state'"
+    ).fetchone()
+    if not legacy:
+        return
+
+    migrated = skipped = 0
+    failed, backoff_s = STATE_CODES["failed"], _legacy_backoff_seconds()
+    cur = conn.execute("SELECT rating_key, library, title, state, note, last_scan, updated_at FROM media_state")
+    while True:
+        batch = cur.fetchmany(5000)
+        if not batch:
+            break
+        rows = []
+        for r in batch:
+            try:
+                rk = int(r["rating_key"])
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            state = STATE_CODES.get(r["state"])
+            if state is None:
+                skipped += 1
+                continue
+            last_scan = _iso_to_epoch(r["last_scan"] or r["updated_at"])
+            # failed: ein Fehlversuch, Backoff ab dem letzten Scan (sonst wäre der ganze Rückstand sofort fällig)
+            attempts, next_eligible = (1, last_scan + backoff_s) if state == failed else (0, None)
+            rows.append((rk, _library_id(conn, r["library"]), state, last_scan, r["title"], r["note"],
+                         attempts, next_eligible))
+        conn.executemany("""
+            INSERT OR REPLACE INTO media_items(rating_key, library_id, state, last_scan, title, note,
+                                              attempt_count, next_eligible_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        migrated += len(rows)
+
+    # Abhängige Objekte der alten Tabelle (Trigger/Indizes fallen mit DROP TABLE weg)
+    conn.execute("DROP TABLE IF EXISTS media_state_fts")
+    conn.execute("DROP TABLE IF EXISTS media_state_summary")
+    conn.execute("DROP TABLE IF EXISTS media_state_daily")
+    conn.execute("DROP TABLE media_state")
+    logger.info(f"media_state migriert: {migrated} Items übernommen, {skipped} übersprungen")
+
+
+def _init_compat_view(conn):
+    """View im alten Format (TEXT-Keys, Library-Namen, Status-Strings, ISO-Zeiten)."""
+    conn.execute("DROP VIEW IF EXISTS media_state")
+    conn.execute("""
+        CREATE VIEW media_state AS
+        SELECT CAST(m.rating_key AS TEXT) AS rating_key,
+               l.name AS library,
+               m.title AS title,
+               strftime('%Y-%m-%dT%H:%M:%S', m.last_scan, 'unixepoch', 'localtime') AS updated_at,
+               CASE m.state WHEN 1 THEN 'fixed' WHEN 2 THEN 'failed' WHEN 3 THEN 'dry_run'
+                            WHEN 4 THEN 'quarantined' END AS state,
+               m.note AS note,
+               strftime('%Y-%m-%dT%H:%M:%S', m.last_scan, 'unixepoch', 'localtime') AS last_scan
+          FROM media_items m
+          LEFT JOIN libraries l ON l.id = m.library_id
+    """)
+
+
+def _init_summary_tables(conn):
+    """
+    Materialisierte Zähler für die Statistik, gepflegt per Trigger in derselben
+    Transaktion wie der Upsert in media_items:
+      - media_state_summary: aktueller Bestand je (library_id, state)
+      - media_state_daily:   geschriebene Ergebnisse je (Tag, library_id, state)
+    library_id 0 = ohne Bibliothek.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='media_state_summary'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_state_summary(
+            library_id INTEGER NOT NULL,
+            state INTEGER NOT NULL,
+            cnt INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(library_id, state)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_state_daily(
+            day TEXT NOT NULL,
+            library_id INTEGER NOT NULL,
+            state INTEGER NOT NULL,
+            cnt INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(day, library_id, state)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS media_items_summary_ai AFTER INSERT ON media_items BEGIN
+            INSERT INTO media_state_summary(library_id, state, cnt)
+                VALUES (COALESCE(new.library_id, 0), new.state, 1)
+                ON CONFLICT(library_id, state) DO UPDATE SET cnt = cnt + 1;
+            INSERT INTO media_state_daily(day, library_id, state, cnt)
+                VALUES (date(new.last_scan, 'unixepoch', 'localtime'), COALESCE(new.library_id, 0), new.state, 1)
+                ON CONFLICT(day, library_id, state) DO UPDATE SET cnt = cnt + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS media_items_summary_ad AFTER DELETE ON media_items BEGIN
+            UPDATE media_state_summary SET cnt = cnt - 1
+             WHERE library_id = COALESCE(old.library_id, 0) AND state = old.state;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS media_items_summary_au AFTER UPDATE ON media_items BEGIN
+            UPDATE media_state_summary SET cnt = cnt - 1
+             WHERE library_id = COALESCE(old.library_id, 0) AND state = old.state;
+            INSERT INTO media_state_summary(library_id, state, cnt)
+                VALUES (COALESCE(new.library_id, 0), new.state, 1)
+                ON CONFLICT(library_id, state) DO UPDATE SET cnt = cnt + 1;
+            INSERT INTO media_state_daily(day, library_id, state, cnt)
+                SELECT date(new.last_scan, 'unixepoch', 'localtime'), COALESCE(new.library_id, 0), new.state, 1
+                 WHERE new.last_scan IS NOT old.last_scan
+                ON CONFLICT(day, library_id, state) DO UPDATE SET cnt = cnt + 1;
+        END
+    """)
+    if not exists:
+        _rebuild_summary_tables(conn)
+
+
+def _rebuild_summary_tables(conn):
+    """Baut die Zähler aus media_items neu auf (Erststart / Migration / manuelle Reparatur)."""
+    conn.execute("DELETE FROM media_state_summary")
+    conn.execute("""
+        INSERT INTO media_state_summary(library_id, state, cnt)
+        SELECT COALESCE(library_id, 0), state, COUNT(*)
+          FROM media_items GROUP BY 1, 2
+    """)
+    conn.execute("DELETE FROM media_state_daily")
+    conn.execute("""
+        INSERT INTO media_state_daily(day, library_id, state, cnt)
+        SELECT date(last_scan, 'unixepoch', 'localtime'), COALESCE(library_id, 0), state, COUNT(*)
+          FROM media_items GROUP BY 1, 2, 3
+    """)
+
+
+def rebuild_statistics():
+    """Synchronisiert die Statistik-Tabellen neu mit media_items."""
+    with get_db_connection() as conn:
+        _rebuild_summary_tables(conn)
+        conn.commit()
 
 
-def save_result(rating_key, library, title, state, note):
+def _init_history_tables(conn):
+    """
+    Append-only Historie aller Zustandswechsel (media_items hält nur den letzten Stand).
+    Integer-Codes, Epoch-Sekunden und internierte Library-IDs halten die Zeilen klein.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS media_state_history(
+            rating_key INTEGER NOT NULL,
+            ts INTEGER NOT NULL,
+            library_id INTEGER,
+            state INTEGER NOT NULL,
+            latency_s INTEGER,
+            PRIMARY KEY(rating_key, ts)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_history_ts ON media_state_history(ts)")
+
+
+def _init_deferred_table(conn):
+    """Kandidaten, die wegen des Zeitbudgets nicht mehr gefixt wurden (nächster Lauf holt sie nach)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS deferred_candidates(
+            rating_key INTEGER PRIMARY KEY,
+            library_id INTEGER,
+            priority REAL NOT NULL DEFAULT 0,
+            deferred_at INTEGER NOT NULL
+        )
+    """)
+
+
+def _init_run_state_tables(conn):
+    """
+    Laufzustand (früher run_state.json) und Schedule-Slots. Eine vorhandene run_state.json
+    wird einmalig übernommen und danach in run_state.json.migrated umbenannt.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS run_state(
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_slots(
+            entry_id TEXT PRIMARY KEY,
+            last_fire REAL,
+            next_fire REAL,
+            last_success REAL,
+            last_status TEXT,
+            claimed_by TEXT,
+            claimed_at REAL
+        )
+    """)
+    if not os.path.exists(STATE_FILE):
+        return
+    try:
+        with open(STATE_FILE, "r") as f:
+            legacy = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.error(f"run_state.json nicht migriert: {e}")
+        return
+    if not isinstance(legacy, dict):
+        legacy = {}
+    last_fires = legacy.pop("schedule_last_fire", None) or {}
+    now = int(time.time())
+    # OR IGNORE: Werte, die ein anderer Prozess schon in die DB geschrieben hat, gewinnen
+    conn.executemany("INSERT OR IGNORE INTO run_state(key, value, updated_at) VALUES (?, ?, ?)",
+                     [(k, json.dumps(v, ensure_ascii=False), now) for k, v in legacy.items()])
+    conn.executemany("""
+        INSERT INTO schedule_slots(entry_id, last_fire) VALUES (?, ?)
+        ON CONFLICT(entry_id) DO UPDATE SET last_fire = MAX(COALESCE(last_fire, 0), excluded.last_fire)
+    """, [(k, float(v)) for k, v in last_fires.items() if isinstance(v, (int, float))])
+    conn.commit()
+    try:
+        os.replace(STATE_FILE, STATE_FILE + ".migrated")
+    except OSError:
+        pass
+    logger.info(f"run_state.json nach SQLite migriert ({len(legacy)} Schlüssel, {len(last_fires)} Zeitpläne)")
+
+
+def _legacy_backoff_seconds() -> int:
+    """Backoff für migrierte failed-Items ohne Versuchszähler: failed_backoff_hours (ohne Streuung)."""
+    try:
+        return int(float(load_settings().get("failed_backoff_hours", 24)) * 3600)
+    except Exception:
+        return 24 * 3600
+
+
+def _init_backoff_columns(conn):
+    """
+    attempt_count/next_eligible_at für bestehende Datenbanken nachrüsten.
+    Backfill: Fehlversuche seit dem letzten Fix aus der Historie, nächster Versuch
+    frühestens failed_backoff_hours nach dem letzten Scan (siehe _legacy_backoff_seconds).
+    """
+    cols = {r["name"] for r in conn.execute("PRAGMA table_info(media_items)")}
+    if "attempt_count" in cols:
+        return
+    conn.execute("ALTER TABLE media_items ADD COLUMN attempt_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("ALTER TABLE media_items ADD COLUMN next_eligible_at INTEGER")
+    conn.execute("""
+        UPDATE media_items SET
+            attempt_count = MAX(1, (
+                SELECT COUNT(*) FROM media_state_history h
+                 WHERE h.rating_key = media_items.rating_key AND h.state = ?
+                   AND h.ts > COALESCE((SELECT MAX(f.ts) FROM media_state_history f
+                                         WHERE f.rating_key = media_items.rating_key AND f.state = ?), 0)
+            )),
+            next_eligible_at = last_scan + ?
+        WHERE state = ?
+    """, (STATE_CODES["failed"], STATE_CODES["fixed"], _legacy_backoff_seconds(), STATE_CODES["failed"]))
+    logger.info("media_items: Spalten attempt_count/next_eligible_at ergänzt")
+
+
+def _library_id(conn, name: Optional[str]) -> Optional[int]:
+    """Interniert einen Library-Namen in der libraries-Tabelle (prozesslokal gecacht)."""
+    if not name:
+        return None
+    with _library_ids_lock:
+        lib_id = _library_ids.get(name)
+    if lib_id is not None:
+        return lib_id
+    conn.execute("INSERT OR IGNORE INTO libraries(name) VALUES (?)", (name,))
+    lib_id = conn.execute("SELECT id FROM libraries WHERE name=?", (name,)).fetchone()[0]
+    with _library_ids_lock:
+        _library_ids[name] = lib_id
+        _library_names[lib_id] = name
+    return lib_id
+
+
+def _library_ids_for(conn, names) -> List[int]:
+    """IDs bereits bekannter Bibliotheken (unbekannte Namen haben noch keine Zeilen)."""
+    names = [n for n in (names or []) if n]
+    if not names:
+        return []
+    placeholders = ",".join("?" * len(names))
+    rows = conn.execute(f"SELECT id FROM libraries WHERE name IN ({placeholders})", names).fetchall()
+    return [r[0] for r in rows]
+
+
+def _library_name(conn, lib_id: Optional[int]) -> Optional[str]:
+    if lib_id is None:
+        return None
+    with _library_ids_lock:
+        name = _library_names.get(lib_id)
+    if name is not None:
+        return name
+    row = conn.execute("SELECT name FROM libraries WHERE id=?", (lib_id,)).fetchone()
+    if not row:
+        return None
+    with _library_ids_lock:
+        _library_names[lib_id] = row[0]
+        _library_ids[row[0]] = lib_id
+    return row[0]
+
+
+# FTS5 (Trigram) für die Titelsuche; ohne FTS5 fällt die Suche auf LIKE zurück.
+HAS_TITLE_FTS = False
+
+
+def _init_title_fts(conn):
+    """Legt den FTS5-Index auf media_items.title an (external content + Trigger)."""
+    global HAS_TITLE_FTS
+    try:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='media_items_fts'"
+        ).fetchone()
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS media_items_fts USING fts5(
+                title, content='media_items', content_rowid='rating_key', tokenize='trigram'
+            )
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS media_items_fts_ai AFTER INSERT ON media_items BEGIN
+                INSERT INTO media_items_fts(rowid, title) VALUES (new.rating_key, new.title);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS media_items_fts_ad AFTER DELETE ON media_items BEGIN
+                INSERT INTO media_items_fts(media_items_fts, rowid, title) VALUES ('delete', old.rating_key, old.title);
+            END
+        """)
+        conn.execute("""
+            CREATE TRIGGER IF NOT EXISTS media_items_fts_au AFTER UPDATE OF title ON media_items BEGIN
+                INSERT INTO media_items_fts(media_items_fts, rowid, title) VALUES ('delete', old.rating_key, old.title);
+                INSERT INTO media_items_fts(rowid, title) VALUES (new.rating_key, new.title);
+            END
+        """)
+        if not exists:
+            # Bestehende Zeilen einmalig indexieren
+            conn.execute("INSERT INTO media_items_fts(media_items_fts) VALUES ('rebuild')")
+        HAS_TITLE_FTS = True
+    except sqlite3.OperationalError as e:
+        HAS_TITLE_FTS = False
+        logger.warning(f"FTS5 nicht verfügbar, Titelsuche nutzt LIKE: {e}")
+
+
+_db_ready = False
+_db_init_lock = threading.Lock()
+
+
+def ensure_db():
+    """Schema anlegen/migrieren, einmal pro Prozess (früher als Seiteneffekt beim Import)."""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_init_lock:
+        if not _db_ready:
+            init_db()
+            _db_ready = True
+
+
+def compute_backoff_seconds(attempt: int, settings=None) -> int:
+    """
+    Exponentieller Backoff nach dem n-ten Fehlversuch: failed_backoff_hours * 2^(n-1),
+    ±failed_backoff_jitter (Anteil, Default 0.2) gestreut, gedeckelt bei failed_backoff_max_hours.
+    """
+    settings = settings or {}
+    try:
+        base_h = float(settings.get("failed_backoff_hours", 24))
+        max_h = float(settings.get("failed_backoff_max_hours", 24 * 14))
+        jitter = float(settings.get("failed_backoff_jitter", 0.2))
+    except (TypeError, ValueError):
+        base_h, max_h, jitter = 24.0, 24.0 * 14, 0.2
+    delay_h = base_h * 2 ** max(0, min(attempt - 1, 30))
+    delay_h *= 1 + random.uniform(-jitter, jitter)
+    return int(max(0.0, min(delay_h, max_h)) * 3600)
+
+
+def _quarantine_after(settings) -> int:
+    try:
+        return int((settings or {}).get("quarantine_after_failures", 5))
+    except (TypeError, ValueError):
+        return 5
+
+
+def save_result(rating_key, library, title, state, note, latency: Optional[float] = None, settings=None):
     """
     Speichert das Ergebnis in die DB. 
     Enthält jetzt Error-Handling und Encoding-Schutz für kaputte Titel.
+    Echte Ergebnisse (fixed/failed) landen zusätzlich in media_state_history;
+    latency = Sekunden vom Refresh bis zum Ergebnis.
+    failed zählt attempt_count hoch und setzt next_eligible_at (exponentieller Backoff);
+    nach quarantine_after_failures Fehlversuchen (0 = nie) wird das Item "quarantined".
     """
     try:
         # FIX: Titel bereinigen, falls er kaputte Zeichen enthält (z.B. ? statt Umlaute)
@@ -222,27 +952,303 @@ def save_result(rating_key, library, title, state, note):
             except Exception:
                 safe_title = "Unknown Title (Encoding Error)"
 
+        rk = int(rating_key)
+        state_code = STATE_CODES[state]
+        t_write = time.perf_counter()
         with get_db_connection() as conn:
-            now = dt.datetime.now().isoformat(timespec="seconds")
+            now = int(time.time())
+            lib_id = _library_id(conn, library)
+            attempts, next_eligible = 0, None
+            if state == "failed":
+                prev = conn.execute("SELECT attempt_count FROM media_items WHERE rating_key=?", (rk,)).fetchone()
+                attempts = (prev["attempt_count"] if prev else 0) + 1
+                limit = _quarantine_after(settings)
+                if limit > 0 and attempts >= limit:
+                    state_code = STATE_CODES["quarantined"]
+                else:
+                    next_eligible = now + compute_backoff_seconds(attempts, settings)
             conn.execute("""
-                INSERT INTO media_state(rating_key, library, title, updated_at, state, note, last_scan)
-                VALUES(?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO media_items(rating_key, library_id, state, last_scan, title, note, attempt_count, next_eligible_at)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(rating_key) DO UPDATE SET
-                    library=excluded.library,
-                    title=excluded.title,
-                    updated_at=excluded.updated_at,
+                    library_id=excluded.library_id,
                     state=excluded.state,
+                    last_scan=excluded.last_scan,
+                    title=excluded.title,
                     note=excluded.note,
-                    last_scan=excluded.last_scan
-            """, (rating_key, library, safe_title, now, state, note, now))
+                    attempt_count=CASE WHEN ? THEN excluded.attempt_count ELSE media_items.attempt_count END,
+                    next_eligible_at=CASE WHEN ? THEN excluded.next_eligible_at ELSE media_items.next_eligible_at END
+            """, (rk, lib_id, state_code, now, safe_title, note, attempts, next_eligible,
+                  state != "dry_run", state != "dry_run"))
+            if state in ("fixed", "failed"):
+                conn.execute(
+                    "INSERT OR REPLACE INTO media_state_history(rating_key, ts, library_id, state, latency_s) VALUES (?, ?, ?, ?, ?)",
+                    (rk, now, lib_id, state_code,
+                     int(round(latency)) if latency is not None and state == "fixed" else None),
+                )
+                conn.execute("DELETE FROM deferred_candidates WHERE rating_key=?", (rk,))
             conn.commit()
-            
+        metrics.DB_WRITE_SECONDS.labels("save_result").observe(time.perf_counter() - t_write)
+
     except Exception as e:
         logger.error(f"DB-FEHLER beim Speichern von {rating_key}: {e}")
         # Wir crashen hier nicht mehr, damit der Loop weiterlaufen kann!
 
 
+def defer_candidates(entries) -> int:
+    """Merkt (rating_key, library, priority)-Tupel für den nächsten Lauf vor."""
+    entries = list(entries)
+    if not entries:
+        return 0
+    try:
+        t_write = time.perf_counter()
+        with get_db_connection() as conn:
+            now = int(time.time())
+            conn.executemany(
+                """INSERT INTO deferred_candidates(rating_key, library_id, priority, deferred_at)
+                   VALUES (?, ?, ?, ?)
+                   ON CONFLICT(rating_key) DO UPDATE SET
+                       library_id=excluded.library_id,
+                       priority=excluded.priority,
+                       deferred_at=excluded.deferred_at""",
+                [(int(rk), _library_id(conn, lib), float(prio), now) for rk, lib, prio in entries],
+            )
+            conn.commit()
+        metrics.DB_WRITE_SECONDS.labels("defer_candidates").observe(time.perf_counter() - t_write)
+        return len(entries)
+    except Exception as e:
+        logger.error(f"Fehler beim Speichern zurückgestellter Kandidaten: {e}")
+        return 0
+
+
+def load_deferred_candidates(libraries=None, limit: int = 500) -> List[Dict[str, Any]]:
+    """Zurückgestellte Kandidaten (höchste Priorität zuerst), optional auf Bibliotheken beschränkt."""
+    try:
+        with get_db_connection() as conn:
+            sql = """SELECT d.rating_key, l.name AS library, d.priority, d.deferred_at
+                     FROM deferred_candidates d
+                     LEFT JOIN libraries l ON l.id = d.library_id"""
+            params: List[Any] = []
+            if libraries:
+                lib_ids = _library_ids_for(conn, libraries)
+                if not lib_ids:
+                    return []
+                sql += f" WHERE d.library_id IN ({','.join('?' * len(lib_ids))})"
+                params.extend(lib_ids)
+            sql += " ORDER BY d.priority DESC LIMIT ?"
+            params.append(limit)
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+    except Exception as e:
+        logger.error(f"Fehler beim Lesen zurückgestellter Kandidaten: {e}")
+        return []
+
+
+def drop_deferred_candidates(rating_keys) -> None:
+    """Entfernt Keys, die kein Kandidat mehr sind (sonst würden sie jeden Lauf neu geladen)."""
+    keys = [(int(k),) for k in rating_keys]
+    if not keys:
+        return
+    try:
+        t_write = time.perf_counter()
+        with get_db_connection() as conn:
+            conn.executemany("DELETE FROM deferred_candidates WHERE rating_key=?", keys)
+            conn.commit()
+        metrics.DB_WRITE_SECONDS.labels("drop_deferred").observe(time.perf_counter() - t_write)
+    except Exception as e:
+        logger.error(f"Fehler beim Entfernen zurückgestellter Kandidaten: {e}")
+
+
+def _retry_pool_query(lib_ids: Optional[List[int]], limit: int, now: int,
+                      indexed: bool = True) -> Tuple[str, List[Any]]:
+    # state als Literal, sonst kann SQLite den partiellen Index idx_media_items_retry nicht nutzen.
+    # INDEXED BY: der Planer nimmt sonst idx_media_items_state (state=?) und liest alle failed-Zeilen
+    hint = " INDEXED BY idx_media_items_retry" if indexed else ""
+    sql = f"""SELECT m.rating_key, l.name AS library
+                FROM media_items m{hint}
+                LEFT JOIN libraries l ON l.id = m.library_id
+               WHERE m.state = {STATE_CODES['failed']}
+                 AND (m.next_eligible_at IS NULL OR m.next_eligible_at <= ?)"""
+    params: List[Any] = [now]
+    if lib_ids is not None:
+        sql += f" AND m.library_id IN ({','.join('?' * len(lib_ids))})"
+        params.extend(lib_ids)
+    sql += " ORDER BY m.last_scan DESC LIMIT ?"
+    params.append(limit)
+    return sql, params
+
+
+def select_retry_candidates(libraries=None, limit: int = 50, now: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Zuletzt fehlgeschlagene, wieder fällige Items (rating_key, library), neueste zuerst.
+    Bibliotheks- und Backoff-Filter laufen in SQL über idx_media_items_retry.
+    """
+    now = int(now if now is not None else time.time())
+    with get_db_connection() as conn:
+        lib_ids = None
+        if libraries:
+            lib_ids = _library_ids_for(conn, libraries)
+            if not lib_ids:
+                return []
+        sql, params = _retry_pool_query(lib_ids, limit, now)
+        try:
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+        except sqlite3.OperationalError as e:
+            if "no such index" not in str(e):
+                raise
+            # Index fehlt (z.B. manuell gelöscht): langsamer, aber korrekt; check_query_plans meldet es
+            logger.warning(f"idx_media_items_retry fehlt - Retry-Pool ohne Index ({e})")
+            sql, params = _retry_pool_query(lib_ids, limit, now, indexed=False)
+            return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+
+# Einziger erlaubter SCAN: der geordnete Durchlauf des partiellen Index. Er enthält nur
+# failed-Zeilen, liefert sie bereits in last_scan DESC und bricht nach LIMIT ab - gelesen werden
+# also höchstens LIMIT Einträge plus die im Backoff, nie die ganze Tabelle.
+RETRY_INDEX_PLAN = "SCAN m USING INDEX idx_media_items_retry"
+
+
+def _plan_regression(details: List[str]) -> Optional[str]:
+    """Grund, warum ein Retry-Pool-Plan nicht passt (None = in Ordnung)."""
+    if any("TEMP B-TREE" in d for d in details):
+        return "sortiert über temporären B-Tree statt über den Index"
+    for d in details:
+        if (d.startswith("SCAN m") or d.startswith("SCAN media_items")) and not d.startswith(RETRY_INDEX_PLAN):
+            return f"Full-Scan ({d})"
+    if not any("USING INDEX idx_media_items_retry" in d for d in details):
+        return "idx_media_items_retry nicht genutzt"
+    return None
+
+
+def check_query_plans() -> Dict[str, Any]:
+    """
+    EXPLAIN QUERY PLAN der Hot-Path-Abfragen; ein Full-Scan von media_items, ein temporärer
+    Sortier-B-Tree oder ein Plan ohne idx_media_items_retry wird als Regression gemeldet
+    (zum erlaubten geordneten Index-Scan siehe RETRY_INDEX_PLAN). Läuft mit der DB-Wartung.
+    """
+    plans: Dict[str, List[str]] = {}
+    with get_db_connection() as conn:
+        probes = {
+            "retry_pool": _retry_pool_query(None, 50, 0),
+            "retry_pool_libraries": _retry_pool_query([1, 2], 50, 0),
+        }
+        for name, (sql, params) in probes.items():
+            try:
+                plans[name] = [r["detail"] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+            except sqlite3.OperationalError as e:
+                plans[name] = [f"Fehler: {e}"]
+    reasons = {name: reason for name, details in plans.items() if (reason := _plan_regression(details))}
+    if reasons:
+        logger.warning("Query-Plan-Regression: " + ", ".join(f"{n}: {r}" for n, r in reasons.items()))
+    return {"ok": not reasons, "regressions": list(reasons), "reasons": reasons, "plans": plans}
+
+
+def release_quarantine(rating_keys=None) -> int:
+    """
+    Gibt Items aus der Quarantäne frei (None = alle): zurück auf failed, Zähler auf 0,
+    sofort wieder im Retry-Pool.
+    """
+    sql = "UPDATE media_items SET state=?, attempt_count=0, next_eligible_at=NULL WHERE state=?"
+    params: List[Any] = [STATE_CODES["failed"], STATE_CODES["quarantined"]]
+    keys = [int(k) for k in rating_keys] if rating_keys is not None else None
+    if keys is not None:
+        if not keys:
+            return 0
+        sql += f" AND rating_key IN ({','.join('?' * len(keys))})"
+        params.extend(keys)
+    with get_db_connection() as conn:
+        released = conn.execute(sql, params).rowcount
+        conn.commit()
+    if released:
+        logger.info(f"{released} Items aus der Quarantäne freigegeben")
+    return released
+
+
+def compact_state_history(keep_days: Optional[int] = None, dedupe_after_days: Optional[int] = None) -> int:
+    """
+    Retention/Kompaktierung für media_state_history:
+      - löscht Einträge älter als keep_days (Default 365 / Env PSR_HISTORY_RETENTION_DAYS)
+      - entfernt Wiederholungen desselben Status (z.B. failed→failed) älter als
+        dedupe_after_days (Default 30 / Env PSR_HISTORY_DEDUPE_DAYS); Wechsel bleiben erhalten
+    Gibt die Anzahl entfernter Zeilen zurück.
+    """
+    if keep_days is None:
+        keep_days = _env_int("PSR_HISTORY_RETENTION_DAYS", 365)
+    if dedupe_after_days is None:
+        dedupe_after_days = _env_int("PSR_HISTORY_DEDUPE_DAYS", 30)
+
+    now = int(time.time())
+    removed = 0
+    try:
+        with get_db_connection() as conn:
+            cur = conn.execute("DELETE FROM media_state_history WHERE ts < ?", (now - keep_days * 86400,))
+            removed += cur.rowcount or 0
+            cur = conn.execute("""
+                DELETE FROM media_state_history
+                 WHERE (rating_key, ts) IN (
+                    SELECT rating_key, ts FROM (
+                        SELECT rating_key, ts, state, latency_s,
+                               LAG(state) OVER (PARTITION BY rating_key ORDER BY ts) AS prev_state
+                          FROM media_state_history
+                    )
+                    WHERE prev_state = state AND latency_s IS NULL AND ts < ?
+                 )
+            """, (now - dedupe_after_days * 86400,))
+            removed += cur.rowcount or 0
+            conn.commit()
+    except Exception as e:
+        logger.error(f"Fehler bei der History-Kompaktierung: {e}")
+    return removed
+
+
+def get_flapping_items(days: int = 30, min_flips: int = 2, limit: int = 50) -> List[Dict[str, Any]]:
+    """Items, die im Zeitraum mindestens min_flips-mal zwischen fixed und failed gewechselt sind."""
+    since = int(time.time()) - days * 86400
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT h.rating_key, l.name AS library, m.title, h.flips, h.failures
+              FROM (
+                SELECT rating_key, MAX(library_id) AS library_id,
+                       SUM(prev_state IS NOT NULL AND prev_state != state) AS flips,
+                       SUM(state = ?) AS failures
+                  FROM (
+                    SELECT rating_key, library_id, state,
+                           LAG(state) OVER (PARTITION BY rating_key ORDER BY ts) AS prev_state
+                      FROM media_state_history
+                     WHERE ts >= ?
+                  )
+                 GROUP BY rating_key
+              ) h
+              LEFT JOIN libraries l ON l.id = h.library_id
+              LEFT JOIN media_items m ON m.rating_key = h.rating_key
+             WHERE h.flips >= ?
+             ORDER BY h.flips DESC, h.failures DESC
+             LIMIT ?
+        """, (STATE_CODES["failed"], since, min_flips, limit)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def get_fix_latency_trend(days: int = 30, library: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Fix-Latenz pro Tag (Anzahl, Durchschnitt, Maximum in Sekunden)."""
+    since = int(time.time()) - days * 86400
+    query = """
+        SELECT date(h.ts, 'unixepoch', 'localtime') AS day,
+               COUNT(*) AS fixed,
+               AVG(h.latency_s) AS avg_latency_s,
+               MAX(h.latency_s) AS max_latency_s
+          FROM media_state_history h
+    """
+    params: List[Any] = [STATE_CODES["fixed"], since]
+    if library:
+        query += " JOIN libraries l ON l.id = h.library_id AND l.name = ?"
+        params.insert(0, library)
+    query += " WHERE h.state = ? AND h.ts >= ? AND h.latency_s IS NOT NULL GROUP BY day ORDER BY day"
+    with get_db_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    return [dict(r) for r in rows]
+
+
 def get_last_report(limit=100, only_fixed=False):
+    """Legacy-Report im alten Zeilenformat (über den Kompatibilitäts-View media_state)."""
     with get_db_connection() as conn:
         query = "SELECT * FROM media_state"
         if only_fixed:
@@ -252,15 +1258,69 @@ def get_last_report(limit=100, only_fixed=False):
         return rows
 
 
+def query_history(search: Optional[str] = None, state: Optional[str] = None,
+                  library: Optional[str] = None, limit: int = 20, offset: int = 0):
+    """
+    Durchsucht media_items komplett in SQLite (Filter, Zählung, LIMIT/OFFSET).
+    Gibt (rows, total) zurück; total = Anzahl aller Treffer ohne Pagination.
+    rows sind dicts mit Library-Namen, Status-String und last_scan als Epoch-Sekunden.
+    """
+    where = []
+    params: List[Any] = []
+
+    search = (search or "").strip()
+    if search:
+        if HAS_TITLE_FTS and len(search) >= 3:
+            # Trigram-FTS: Phrase quoten, damit Sonderzeichen keine FTS-Syntax sind
+            phrase = '"' + search.replace('"', '""') + '"'
+            where.append("m.rating_key IN (SELECT rowid FROM media_items_fts WHERE media_items_fts MATCH ?)")
+            params.append(phrase)
+        else:
+            escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("m.title LIKE ? ESCAPE '\\'")
+            params.append(f"%{escaped}%")
+    if state:
+        where.append("m.state=?")
+        params.append(STATE_CODES.get(state, -1))
+
+    with get_db_connection() as conn:
+        if library:
+            lib_ids = _library_ids_for(conn, [library])
+            where.append("m.library_id=?")
+            params.append(lib_ids[0] if lib_ids else -1)
+
+        where_sql = (" WHERE " + " AND ".join(where)) if where else ""
+        total = conn.execute(f"SELECT COUNT(*) FROM media_items m{where_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT m.rating_key, m.library_id, m.title, m.state, m.note, m.last_scan, m.attempt_count
+                  FROM media_items m{where_sql}
+                 ORDER BY m.last_scan DESC LIMIT ? OFFSET ?""",
+            params + [max(0, int(limit)), max(0, int(offset))],
+        ).fetchall()
+        result = [{
+            "rating_key": r["rating_key"],
+            "library": _library_name(conn, r["library_id"]),
+            "title": r["title"],
+            "state": STATE_NAMES.get(r["state"], "unknown"),
+            "note": r["note"],
+            "last_scan": r["last_scan"],
+            "attempt_count": r["attempt_count"],
+        } for r in rows]
+    return result, total
+
+
 def get_total_statistics():
     """
-    Berechnet Gesamtstatistiken aus der Datenbank.
+    Gesamtstatistiken aus der materialisierten Zusammenfassung (O(Libraries × States)).
     """
     with get_db_connection() as conn:
-        c = conn.cursor()
-        total_checked = c.execute("SELECT COUNT(*) FROM media_state").fetchone()[0]
-        total_fixed = c.execute("SELECT COUNT(*) FROM media_state WHERE state='fixed'").fetchone()[0]
-        total_failed = c.execute("SELECT COUNT(*) FROM media_state WHERE state='failed'").fetchone()[0]
+        row = conn.execute("""
+            SELECT COALESCE(SUM(cnt), 0),
+                   COALESCE(SUM(CASE WHEN state=? THEN cnt END), 0),
+                   COALESCE(SUM(CASE WHEN state IN (?, ?) THEN cnt END), 0)
+              FROM media_state_summary
+        """, (STATE_CODES["fixed"], STATE_CODES["failed"], STATE_CODES["quarantined"])).fetchone()
+    total_checked, total_fixed, total_failed = row[0], row[1], row[2]
     
     success_rate = (total_fixed / (total_fixed + total_failed) * 100) if (total_fixed + total_failed) > 0 else 0
     
@@ -272,27 +1332,135 @@ def get_total_statistics():
     }
 
 
-def get_media_state_row(rating_key: str):
-    """Liest den letzten gespeicherten Zustand für ein Item (media_state)."""
+def get_library_statistics() -> List[Dict[str, Any]]:
+    """Aktueller Bestand je Bibliothek, aufgeschlüsselt nach Status."""
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT COALESCE(l.name, '') AS library, s.state, s.cnt
+              FROM media_state_summary s
+              LEFT JOIN libraries l ON l.id = s.library_id
+             WHERE s.cnt > 0
+             ORDER BY library
+        """).fetchall()
+    per_lib: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        entry = per_lib.setdefault(r["library"], {"library": r["library"], "total": 0})
+        entry[STATE_NAMES.get(r["state"], "unknown")] = r["cnt"]
+        entry["total"] += r["cnt"]
+    return list(per_lib.values())
+
+
+def get_daily_statistics(days: int = 30, library: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Geschriebene Ergebnisse pro Tag und Status (Trend der letzten `days` Tage)."""
+    since = (dt.date.today() - dt.timedelta(days=max(0, days - 1))).isoformat()
+    query = "SELECT day, state, SUM(cnt) AS cnt FROM media_state_daily WHERE day >= ?"
+    params: List[Any] = [since]
+    with get_db_connection() as conn:
+        if library:
+            lib_ids = _library_ids_for(conn, [library])
+            query += " AND library_id=?"
+            params.append(lib_ids[0] if lib_ids else -1)
+        query += " GROUP BY day, state ORDER BY day"
+        rows = conn.execute(query, params).fetchall()
+    return [{"day": r["day"], "state": STATE_NAMES.get(r["state"], "unknown"), "cnt": r["cnt"]} for r in rows]
+
+
+def get_media_state_row(rating_key):
+    """Liest den letzten gespeicherten Zustand für ein Item (state als String, Zeiten als Epoch)."""
     try:
         with get_db_connection() as conn:
-            return conn.execute(
-                "SELECT state, last_scan, note FROM media_state WHERE rating_key=?",
-                (rating_key,),
+            row = conn.execute(
+                "SELECT state, last_scan, note, attempt_count, next_eligible_at FROM media_items WHERE rating_key=?",
+                (int(rating_key),),
             ).fetchone()
+        if not row:
+            return None
+        return {"state": STATE_NAMES.get(row["state"]), "last_scan": row["last_scan"], "note": row["note"],
+                "attempt_count": row["attempt_count"], "next_eligible_at": row["next_eligible_at"]}
     except Exception as e:
-        logger.error(f"Fehler beim Lesen von media_state({rating_key}): {e}")
+        logger.error(f"Fehler beim Lesen von media_items({rating_key}): {e}")
         return None
 
 
 # --- PLEX LOGIC ---
+# Gewichtung fehlender Felder: ohne Guid ist das Item nicht zugeordnet,
+# ohne Poster sichtbar kaputt, ohne Beschreibung nur kosmetisch.
+FIELD_SEVERITY = {"guid": 30, "thumb": 20, "summary": 10}
+PIN_PRIORITY = 1000.0
+RECENCY_WEIGHT = 30.0
+RECENCY_HALF_LIFE_DAYS = 7
+FAILURE_PENALTY = 5.0
+MAX_FAILURE_PENALTY_COUNT = 5
+
+
+def missing_fields(item) -> List[str]:
+    missing = []
+    if not item.guids: missing.append("guid")
+    if not item.thumb: missing.append("thumb")
+    if not item.summary: missing.append("summary")
+    return missing
+
 def needs_refresh(item) -> bool:
-    if not item.guids: return True
-    if not item.thumb: return True
-    if not item.summary: return True
-    return False
+    return bool(missing_fields(item))
+
+
+def fix_priority(candidate, failures: int = 0, pinned: bool = False, now: Optional[float] = None) -> float:
+    """
+    Priorität für die Fix-Queue (höher = früher). Kombiniert Schwere der fehlenden
+    Felder, Aktualität von addedAt (Halbwertszeit RECENCY_HALF_LIFE_DAYS),
+    bisherige Fehlversuche (Abzug) und vom Nutzer angepinnte Items.
+    """
+    now = now if now is not None else time.time()
+    score = float(sum(FIELD_SEVERITY[f] for f in candidate.missing))
+
+    if candidate.added_at is not None:
+        age_days = max(0.0, (now - candidate.added_at) / 86400)
+        score += RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
 
-async def smart_refresh_item(item, status_callback=None, settings=None, cancel_flag=None) -> Tuple[bool, str]:
+    score -= FAILURE_PENALTY * min(max(failures, 0), MAX_FAILURE_PENALTY_COUNT)
+    if pinned:
+        score += PIN_PRIORITY
+    return score
+
+
+def get_pinned_keys(settings) -> set:
+    keys = set()
+    for value in settings.get("pinned_rating_keys") or []:
+        try:
+            keys.add(int(value))
+        except (TypeError, ValueError):
+            continue
+    return keys
+
+
+def get_failure_counts(rating_keys) -> Dict[int, int]:
+    """Fehlversuche seit dem letzten Fix je Item (media_items.attempt_count)."""
+    keys = [int(k) for k in rating_keys]
+    counts: Dict[int, int] = {}
+    if not keys:
+        return counts
+    try:
+        with get_db_connection() as conn:
+            # In Blöcken, um das SQLite-Limit für Parameter nicht zu reißen
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = conn.execute(
+                    f"""SELECT rating_key, attempt_count FROM media_items
+                        WHERE attempt_count > 0 AND rating_key IN ({",".join("?" * len(chunk))})""",
+                    chunk,
+                ).fetchall()
+                counts.update({r["rating_key"]: r["attempt_count"] for r in rows})
+    except Exception as e:
+        logger.error(f"Fehler beim Lesen der Fehlversuche: {e}")
+    return counts
+
+async def smart_refresh_item(item, status_callback=None, settings=None, cancel_flag=None,
+                             verify: Optional[Callable[[], bool]] = None) -> Tuple[bool, str]:
+    """
+    Refresht ein Item und wartet, bis die Metadaten vollständig sind. verify (blockierend,
+    läuft in to_thread) ersetzt die Standard-Prüfung reload + needs_refresh, z.B. für
+    Staffeln, bei denen die Episoden zählen.
+    """
     settings_from_args = settings if settings is not None else {}
 
     if settings is None:
@@ -318,24 +1486,34 @@ async def smart_refresh_item(item, status_callback=None, settings=None, cancel_f
 
     if _is_cancel_requested(cancel_flag):
         return False, "Abbruch angefordert"
+    metrics.REFRESHES_IN_FLIGHT.inc()
     try:
-        await asyncio.to_thread(item.refresh)
-    except Exception as e:
-        return False, f"API Fehler: {str(e)}"
-
-    max_attempts = max(1, (wait_total + wait_interval - 1) // wait_interval)
-    for attempt in range(1, max_attempts + 1):
-        if _is_cancel_requested(cancel_flag):
-            return False, "Abbruch angefordert"
+        t_refresh = time.monotonic()
         try:
-            await asyncio.to_thread(item.reload)
-            if not needs_refresh(item):
-                return True, f"Gefixt nach {min(wait_total, attempt * wait_interval)}s"
-        except Exception:
-            pass
-        if attempt < max_attempts:
-            await asyncio.sleep(wait_interval)
-    return False, f"Timeout ({wait_total}s)"
+            await profiling.to_thread(item.refresh)
+        except Exception as e:
+            return False, f"API Fehler: {str(e)}"
+
+        max_attempts = max(1, (wait_total + wait_interval - 1) // wait_interval)
+        for attempt in range(1, max_attempts + 1):
+            if _is_cancel_requested(cancel_flag):
+                return False, "Abbruch angefordert"
+            try:
+                if verify is not None:
+                    fixed = await profiling.to_thread(verify)
+                else:
+                    await profiling.to_thread(item.reload)
+                    fixed = not needs_refresh(item)
+                if fixed:
+                    metrics.REFRESH_TO_FIXED_SECONDS.observe(time.monotonic() - t_refresh)
+                    return True, f"Gefixt nach {min(wait_total, attempt * wait_interval)}s"
+            except Exception:
+                pass
+            if attempt < max_attempts:
+                await profiling.sleep(wait_interval)
+        return False, f"Timeout ({wait_total}s)"
+    finally:
+        metrics.REFRESHES_IN_FLIGHT.dec()
 
 
 def get_library_names():
@@ -346,226 +1524,826 @@ def get_library_names():
         return []
 
 # --- SCAN ENGINE ---
-async def run_scan_engine(progress_bar, log_callback, settings, cancel_flag=None):
-    init_db()
-    log_callback("Starte Scan...")
-    
+def _get_fix_concurrency(settings) -> int:
     try:
-        plex = get_plex_connection()
-    except Exception as e:
-        log_callback(f"Verbindungsfehler: {e}")
+        return max(1, min(8, int(settings.get("fix_concurrency", 1))))
+    except (TypeError, ValueError):
+        return 1
+
+
+def compute_deadline(settings, start: Optional[float] = None) -> Optional[float]:
+    """
+    Deadline (Epoch) aus time_budget_minutes (relativ zum Start) und/oder
+    finish_by ("HH:MM", nächstes Auftreten nach dem Start). Die frühere gewinnt.
+    """
+    start = start if start is not None else time.time()
+    deadlines = []
+    try:
+        budget = float(settings.get("time_budget_minutes") or 0)
+    except (TypeError, ValueError):
+        budget = 0
+    if budget > 0:
+        deadlines.append(start + budget * 60)
+
+    finish_by = (settings.get("finish_by") or "").strip()
+    if finish_by:
+        try:
+            finish_time = dt.datetime.strptime(finish_by, "%H:%M").time()
+        except ValueError:
+            logger.warning(f"Ungültiges finish_by '{finish_by}' ignoriert")
+        else:
+            start_dt = dt.datetime.fromtimestamp(start)
+            target = dt.datetime.combine(start_dt.date(), finish_time)
+            if target <= start_dt:
+                target += dt.timedelta(days=1)
+            deadlines.append(target.timestamp())
+
+    return min(deadlines) if deadlines else None
+
+
+async def _fetch_items_by_key(plex, entries, seen_keys, target_libs, cancel_flag=None):
+    """
+    Lädt einzelne Items per ratingKey nach (entries = [(rating_key, library|None)]), überspringt
+    bereits gesehene Keys. Gibt ([(rating_key, library, item)], nicht gefundene Keys) zurück.
+    """
+    fetched, missing = [], []
+    for rk, lib in entries:
+        if _is_cancel_requested(cancel_flag):
+            break
+        if rk in seen_keys:
+            continue
+        try:
+            item = await profiling.to_thread(plex.fetchItem, rk)
+        except Exception:
+            missing.append(rk)
+            continue
+        lib_name = lib or getattr(item, "librarySectionTitle", None) or "Unbekannt"
+        if target_libs and lib_name not in target_libs:
+            continue
+        seen_keys.add(rk)
+        fetched.append((rk, lib_name, item))
+    return fetched, missing
+
+
+# --- KANDIDATEN-ERMITTLUNG (Phase 1+2, ohne DB-Schreibzugriffe) ---
+HAS_GUID, HAS_THUMB, HAS_SUMMARY = 1, 2, 4
+ALL_FIELDS = HAS_GUID | HAS_THUMB | HAS_SUMMARY
+_FIELD_FLAGS = (("guid", HAS_GUID), ("thumb", HAS_THUMB), ("summary", HAS_SUMMARY))
+
+# Seitengröße beim Aufzählen: nie mehr als so viele plexapi-Objekte gleichzeitig im Speicher
+ENUM_PAGE_SIZE = 1000
+
+
+@dataclass(slots=True)
+class ItemSnapshot:
+    """
+    Kompakter Zustand eines Plex-Items für Phase 1-3 (ca. 100 Bytes statt eines plexapi-Objekts
+    mit XML-Element und Server-Referenz). Das plexapi-Objekt holt Phase 3 erst für den Refresh.
+    library ist per sys.intern für alle Items einer Bibliothek dasselbe Objekt.
+    """
+    rating_key: int
+    library: str
+    title: str
+    added_at: Optional[int]              # Epoch
+    flags: int                           # HAS_GUID | HAS_THUMB | HAS_SUMMARY
+    source: str = "recent"               # recent | retry | pinned | deferred
+    level: str = "item"                  # item (Film/Serie) | episode | season
+    episodes: Tuple[int, ...] = ()       # level=season: kaputte Episoden, die der Staffel-Refresh fixen soll
+    show_key: Optional[int] = None       # level=episode/season: Serie (ihr Refresh deckt beides ab)
+
+    @property
+    def missing(self) -> Tuple[str, ...]:
+        return tuple(name for name, bit in _FIELD_FLAGS if not self.flags & bit)
+
+    @property
+    def needs_refresh(self) -> bool:
+        return self.flags != ALL_FIELDS
+
+    @classmethod
+    def from_item(cls, item, library: str, source: str = "recent") -> "ItemSnapshot":
+        # Kein Auto-Reload: fehlende Felder sollen nicht pro Item einen weiteren Request auslösen
+        item._autoReload = False
+        flags = ((HAS_GUID if item.guids else 0) | (HAS_THUMB if item.thumb else 0)
+                 | (HAS_SUMMARY if item.summary else 0))
+        added_at = getattr(item, "addedAt", None) or getattr(item, "updatedAt", None)
+        title, level, show_key = item.title, "item", None
+        if getattr(item, "TYPE", None) == "episode":
+            title = _episode_title(item.grandparentTitle, item.parentIndex, item.index, item.title)
+            level = "episode"
+            show_key = int(item.grandparentRatingKey) if item.grandparentRatingKey else None
+        return cls(int(item.ratingKey), sys.intern(library), title, _to_epoch(added_at), flags, source, level,
+                   show_key=show_key)
+
+
+def _episode_title(show: Optional[str], season: Optional[int], episode: Optional[int], title: str) -> str:
+    if season is not None and episode is not None:
+        return f"{show or '?'} S{season:02d}E{episode:02d} – {title}"
+    return f"{show or '?'} – {title}"
+
+
+def _entry_flags(entry: plexlisting.ListingEntry) -> int:
+    return ((HAS_GUID if entry.has_guid else 0) | (HAS_THUMB if entry.has_thumb else 0)
+            | (HAS_SUMMARY if entry.has_summary else 0))
+
+
+@dataclass
+class DiscoveryResult:
+    candidates: List[ItemSnapshot]
+    checked: int = 0
+    # Staffeln (Retry/Pins/Zurückgestellt, Staffel-Refreshes): eigene Zahl, ihre Episoden stecken schon in checked
+    seasons_checked: int = 0
+    skipped_backoff: int = 0
+    skipped_quarantine: int = 0
+    cached_libraries: List[str] = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    # Neue Artwork-Fingerprints; gespeichert erst vom Scan (die Vorschau schreibt nichts)
+    fingerprints: List[Tuple[int, str, artwork.ArtworkCheck, int]] = field(default_factory=list)
+    # Zurückgestellte Keys, die kein Kandidat mehr sind (gelöscht, inzwischen ok, Backoff/Quarantäne);
+    # der Scan entfernt sie aus deferred_candidates
+    stale_deferred: List[int] = field(default_factory=list)
+
+
+@dataclass
+class _LibraryListing:
+    """Neueste Items einer Bibliothek: Keys/addedAt aller Items als Arrays, Snapshots nur für Kandidaten."""
+    keys: array = field(default_factory=lambda: array("q"))
+    added: array = field(default_factory=lambda: array("q"))
+    candidates: List[ItemSnapshot] = field(default_factory=list)
+    # Nur mit verify_artwork: vollständige Items mit Poster (rating_key, thumb, Titel, addedAt)
+    posters: List[Tuple[int, str, str, int]] = field(default_factory=list)
+    library: str = ""
+    # Staffel-Keys in keys (für seen_keys); zählen nicht als geprüfte Items
+    season_keys: Set[int] = field(default_factory=set)
+
+
+# (Bibliothek, High-Water-Mark, max_items, Episoden-Optionen, verify_artwork) -> _LibraryListing.
+# Der Zeit-Filter wird erst beim Lesen angewendet, damit der Eintrag über den Tag gültig bleibt.
+_candidate_cache: Dict[Tuple[str, Any, int, Any, bool], _LibraryListing] = {}
+_candidate_cache_lock = threading.Lock()
+
+
+def _to_epoch(value) -> Optional[int]:
+    if isinstance(value, dt.datetime):
+        return int(value.timestamp())
+    return None
+
+
+def library_high_water_marks(plex) -> Dict[str, Any]:
+    """
+    Änderungsstand aller Bibliotheken mit einem Request (contentChangedAt, Fallback updatedAt/scannedAt).
+    Ändert sich der Stand, ist der gecachte Kandidatensatz der Bibliothek ungültig.
+    """
+    marks = {}
+    for elem in plex.query("/library/sections"):
+        attrs = elem.attrib
+        marks[attrs.get("title")] = (attrs.get("contentChangedAt"), attrs.get("updatedAt"), attrs.get("scannedAt"))
+    return marks
+
+
+def invalidate_candidate_cache(rating_keys=None) -> None:
+    """Entfernt bearbeitete Items aus dem Cache (None = kompletter Cache)."""
+    with _candidate_cache_lock:
+        if rating_keys is None:
+            _candidate_cache.clear()
+            return
+        keys = set(rating_keys)
+        for listing in _candidate_cache.values():
+            listing.candidates = [c for c in listing.candidates if c.rating_key not in keys]
+
+
+def _episode_options(settings) -> Optional[Tuple[int, int]]:
+    """(max_episodes, season_refresh_min_episodes) oder None, wenn Episoden nicht geprüft werden."""
+    if not settings.get("episode_detection", True):
         return None
+    try:
+        return int(settings.get("max_episodes", 500)), int(settings.get("season_refresh_min_episodes", 3))
+    except (TypeError, ValueError):
+        return 500, 3
 
-    stats = {"checked": 0, "fixed": 0,
-        "would_fix": 0, "failed": 0}
+
+def _list_recent(plex, lib, lib_name: str, max_items: int, log_callback, lean: bool = True,
+                 episodes: Optional[Tuple[int, int]] = None, posters: bool = False) -> _LibraryListing:
+    """
+    Neueste max_items Items einer Bibliothek. Standard ist das gestreamte XML-Listing
+    (plexlisting), bei Fehlern fällt es auf plexapi zurück (seitenweise, nur Snapshots behalten).
+    Serien-Bibliotheken: mit `episodes` zusätzlich die neuesten Episoden (siehe _add_recent_episodes).
+    posters: thumb-Pfade vollständiger Items für die Artwork-Prüfung mitnehmen.
+    """
+    listing = None
+    if lean:
+        try:
+            listing = _list_recent_lean(plex, lib, lib_name, max_items, log_callback, posters)
+        except Exception as e:
+            logger.warning(f"Schlanke Aufzählung von {lib_name} fehlgeschlagen ({e}) - Fallback auf plexapi")
+    if listing is None:
+        listing = _list_recent_plexapi(lib, lib_name, max_items, log_callback, posters)
+    listing.library = sys.intern(lib_name)
+    if episodes and lib.TYPE == "show":
+        _add_recent_episodes(plex, lib, lib_name, listing, *episodes, log_callback=log_callback, lean=lean)
+    return listing
+
+
+def _list_recent_plexapi(lib, lib_name: str, max_items: int, log_callback, posters: bool = False) -> _LibraryListing:
+    listing = _LibraryListing()
+    start = 0
+    while start < max_items:
+        size = min(ENUM_PAGE_SIZE, max_items - start)
+        page = lib.search(sort="addedAt:desc", container_start=start, container_size=size, maxresults=size)
+        for item in page:
+            snap = ItemSnapshot.from_item(item, lib_name)
+            if snap.added_at is None:
+                log_callback(f"⚠️ {snap.title}: addedAt/updatedAt fehlt → übersprungen")
+                continue
+            listing.keys.append(snap.rating_key)
+            listing.added.append(snap.added_at)
+            if snap.needs_refresh:
+                listing.candidates.append(snap)
+            elif posters:
+                listing.posters.append((snap.rating_key, item.thumb, snap.title, snap.added_at))
+        if len(page) < size:
+            break
+        start += size
+    return listing
+
+
+def _list_recent_lean(plex, lib, lib_name: str, max_items: int, log_callback, posters: bool = False) -> _LibraryListing:
+    listing = _LibraryListing()
+    library = sys.intern(lib_name)
+    for entry in plexlisting.iter_section(plex, lib.key, lib.TYPE, max_items):
+        if entry.added_at is None:
+            log_callback(f"⚠️ {entry.title}: addedAt/updatedAt fehlt → übersprungen")
+            continue
+        listing.keys.append(entry.rating_key)
+        listing.added.append(entry.added_at)
+        flags = _entry_flags(entry)
+        if flags != ALL_FIELDS:
+            listing.candidates.append(ItemSnapshot(entry.rating_key, library, entry.title, entry.added_at, flags))
+        elif posters:
+            listing.posters.append((entry.rating_key, entry.thumb, entry.title, entry.added_at))
+    return listing
+
+
+def _iter_episodes_plexapi(lib, limit: int):
+    """Fallback ohne plexlisting: Episoden-Suche der Sektion, als ListingEntry."""
+    for ep in lib.searchEpisodes(sort="addedAt:desc", maxresults=limit):
+        ep._autoReload = False
+        yield plexlisting.ListingEntry(
+            int(ep.ratingKey), ep.title, _to_epoch(ep.addedAt or ep.updatedAt), bool(ep.guids), bool(ep.thumb),
+            bool(ep.summary), ep.parentRatingKey, ep.grandparentRatingKey, ep.grandparentTitle, ep.parentIndex, ep.index,
+        )
+
+
+def _collect_episodes(entries, log_callback):
+    """Keys/addedAt aller Episoden und die kaputten gruppiert nach Staffel."""
+    keys, added = array("q"), array("q")
+    broken: Dict[Optional[int], List[plexlisting.ListingEntry]] = {}
+    for entry in entries:
+        if entry.added_at is None:
+            log_callback(f"⚠️ {entry.title}: addedAt/updatedAt fehlt → übersprungen")
+            continue
+        keys.append(entry.rating_key)
+        added.append(entry.added_at)
+        if _entry_flags(entry) != ALL_FIELDS:
+            broken.setdefault(entry.parent_key, []).append(entry)
+    return keys, added, broken
+
+
+def _add_recent_episodes(plex, lib, lib_name: str, listing: _LibraryListing, max_episodes: int, min_season: int,
+                         log_callback, lean: bool = True) -> None:
+    """
+    Neueste max_episodes Episoden einer Serien-Bibliothek über das Episoden-Listing der Sektion
+    (type=4, ein gestreamter Request) statt Serie für Serie. Kaputte Episoden werden je Staffel
+    gruppiert: ab min_season kaputten Episoden wird die Staffel einmal refresht (0 = nie),
+    sonst die einzelne Episode. Ob ein Serien-Refresh sie abdeckt, entscheidet erst Phase 2
+    (_drop_covered), nach Zeit-Filter und Backoff.
+    """
+    collected = None
+    if lean:
+        try:
+            collected = _collect_episodes(plexlisting.iter_section(plex, lib.key, "episode", max_episodes), log_callback)
+        except Exception as e:
+            logger.warning(f"Schlanke Episoden-Aufzählung von {lib_name} fehlgeschlagen ({e}) - Fallback auf plexapi")
+    if collected is None:
+        collected = _collect_episodes(_iter_episodes_plexapi(lib, max_episodes), log_callback)
+    keys, added, broken = collected
+
+    library = sys.intern(lib_name)
+    listing.keys.extend(keys)
+    listing.added.extend(added)
+    n_seasons = n_episodes = 0
+    for season_key, entries in broken.items():
+        first = entries[0]
+        if season_key is not None and min_season > 0 and len(entries) >= min_season:
+            flags = ALL_FIELDS
+            for entry in entries:
+                flags &= _entry_flags(entry)
+            newest = max(entry.added_at for entry in entries)
+            listing.keys.append(season_key)
+            listing.added.append(newest)
+            listing.season_keys.add(season_key)
+            listing.candidates.append(ItemSnapshot(
+                season_key, library, f"{first.grandparent_title or '?'} – Staffel {first.parent_index} "
+                                     f"({len(entries)} Episoden)",
+                newest, flags, level="season", episodes=tuple(entry.rating_key for entry in entries),
+                show_key=first.grandparent_key))
+            n_seasons += 1
+            continue
+        for entry in entries:
+            listing.candidates.append(ItemSnapshot(
+                entry.rating_key, library,
+                _episode_title(entry.grandparent_title, entry.parent_index, entry.index, entry.title),
+                entry.added_at, _entry_flags(entry), level="episode", show_key=entry.grandparent_key))
+            n_episodes += 1
+    if broken:
+        log_callback(f"📺 {lib_name}: {len(keys)} Episoden geprüft, {sum(len(e) for e in broken.values())} unvollständig "
+                     f"→ {n_seasons} Staffel-, {n_episodes} Episoden-Refreshes")
+
+
+def _season_snapshot(plex, season, library: str, source: str) -> Optional[ItemSnapshot]:
+    """Staffel aus Retry-Pool/Pins: Kandidat, solange eine ihrer Episoden Felder vermisst."""
+    flags, broken, newest = ALL_FIELDS, [], None
+    for entry in plexlisting.iter_children(plex, season.ratingKey):
+        entry_flags = _entry_flags(entry)
+        if entry_flags != ALL_FIELDS:
+            flags &= entry_flags
+            broken.append(entry.rating_key)
+            newest = max(newest or 0, entry.added_at or 0)
+    if not broken:
+        return None
+    title = f"{getattr(season, 'parentTitle', None) or '?'} – Staffel {season.index} ({len(broken)} Episoden)"
+    show_key = getattr(season, "parentRatingKey", None)
+    return ItemSnapshot(int(season.ratingKey), sys.intern(library), title, newest or None, flags, source,
+                        level="season", episodes=tuple(broken), show_key=int(show_key) if show_key else None)
+
+
+def _drop_covered(candidates: List[ItemSnapshot]) -> Tuple[List[ItemSnapshot], int]:
+    """
+    Entfernt Episoden/Staffeln, deren Serie, und Episoden, deren Staffel selbst eingeplant ist.
+    Erst nach Zeit-Filter und Backoff/Quarantäne aufrufen: eine alte oder gesperrte Serie
+    darf ihre neuen kaputten Episoden nicht verdrängen.
+    """
+    shows = {c.rating_key for c in candidates if c.level == "item"}
+    in_seasons = {ep for c in candidates if c.level == "season" for ep in c.episodes}
+    kept = [c for c in candidates
+            if not (c.level != "item" and c.show_key in shows) and c.rating_key not in in_seasons]
+    return kept, len(candidates) - len(kept)
+
+
+def _season_fixed(plex, season_key: int, episode_keys) -> bool:
+    """Staffel-Refresh erfolgreich, sobald keine der gemeldeten Episoden mehr Felder vermisst."""
+    wanted = set(episode_keys)
+    return not any(entry.rating_key in wanted and _entry_flags(entry) != ALL_FIELDS
+                   for entry in plexlisting.iter_children(plex, season_key))
+
+
+def _count_fetched(result: DiscoveryResult, fetched) -> None:
+    """Nachgeladene Items zählen: Staffeln getrennt, damit checked nur Filme/Episoden/Serien zählt."""
+    seasons = sum(1 for _, _, item in fetched if getattr(item, "TYPE", None) == "season")
+    result.seasons_checked += seasons
+    result.checked += len(fetched) - seasons
+
+
+def _snapshot_candidates(plex, fetched, source: str) -> List[ItemSnapshot]:
+    """Snapshots nachgeladener Items (blockierend: Staffeln fragen ihre Episoden ab)."""
+    snaps = []
+    for _, lib_name, item in fetched:
+        if getattr(item, "TYPE", None) == "season":
+            snap = _season_snapshot(plex, item, lib_name, source)
+        else:
+            snap = ItemSnapshot.from_item(item, lib_name, source)
+        if snap is not None and snap.needs_refresh:
+            snaps.append(snap)
+    return snaps
+
+
+def _load_item_states(rating_keys) -> Dict[int, Dict[str, Any]]:
+    """Status/Backoff für viele Items mit einer Abfrage je 500 Keys."""
+    keys = [int(k) for k in rating_keys]
+    states: Dict[int, Dict[str, Any]] = {}
+    with get_db_connection() as conn:
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = conn.execute(
+                f"""SELECT rating_key, state, attempt_count, next_eligible_at FROM media_items
+                    WHERE rating_key IN ({",".join("?" * len(chunk))})""",
+                chunk,
+            ).fetchall()
+            for r in rows:
+                states[r["rating_key"]] = {"state": STATE_NAMES.get(r["state"]),
+                                           "attempt_count": r["attempt_count"],
+                                           "next_eligible_at": r["next_eligible_at"]}
+    return states
+
+
+async def _discover(plex, settings, log_callback, cancel_flag=None, progress_bar=None,
+                    use_cache: bool = True) -> DiscoveryResult:
+    """
+    Phase 1+2: neueste Items je Bibliothek, Retry-Pool, angepinnte und zurückgestellte Items
+    sammeln und auf fehlende Metadaten prüfen. Liest die DB (Backoff, Quarantäne), schreibt nie.
+    """
     days = settings.get("days", 30)
     max_items = settings.get("max_items", 50)
     target_libs = settings.get("libraries", [])
-    dry_run = settings.get("dry_run", False)
-    
-    cutoff = dt.datetime.now() - dt.timedelta(days=days)
-    
-    # Phase 1: Alle Items sammeln
+    episodes = _episode_options(settings)
+    verify_posters = bool(settings.get("verify_artwork", False))
+    cutoff = int((dt.datetime.now() - dt.timedelta(days=days)).timestamp())
+    result = DiscoveryResult(candidates=[])
+
+    # Phase 1: neueste Items (bei unverändertem High-Water-Mark aus dem Cache)
+    profiling.enter_phase("phase1")
     log_callback("Phase 1: Sammle Items...")
-    all_items = []
-    items_to_refresh = []
-    retry_keys = set()
-    
-    for lib_name in target_libs:
+    marks: Dict[str, Any] = {}
+    if use_cache:
+        try:
+            marks = await profiling.to_thread(library_high_water_marks, plex)
+        except Exception as e:
+            logger.warning(f"High-Water-Marks nicht abrufbar, Cache wird umgangen: {e}")
+
+    recent: List[_LibraryListing] = []
+    for idx, lib_name in enumerate(target_libs):
         if _is_cancel_requested(cancel_flag):
             break
+        mark = marks.get(lib_name)
+        # Ohne jeden Änderungsstempel (Tupel aus None) ließe sich ein Cache-Eintrag nie invalidieren
+        cacheable = mark is not None and any(mark)
+        cache_key = (lib_name, mark, max_items, episodes, verify_posters)
+        with _candidate_cache_lock:
+            cached = _candidate_cache.get(cache_key) if cacheable else None
+        if cached:
+            recent.append(cached)
+            result.cached_libraries.append(lib_name)
+            log_callback(f"♻️ {lib_name}: unverändert seit letzter Ermittlung → Cache ({len(cached.candidates)} Kandidaten)")
+            continue
         try:
             lib = plex.library.section(lib_name)
-            recent = lib.all(sort="addedAt:desc", limit=max_items)
-            all_items.append((lib_name, recent))
+            listing = await profiling.to_thread(_list_recent, plex, lib, lib_name, max_items, log_callback,
+                                                bool(settings.get("lean_listing", True)), episodes, verify_posters)
         except Exception as e:
             log_callback(f"Fehler beim Laden von {lib_name}: {e}")
+            continue
+
+        recent.append(listing)
+        if cacheable:
+            with _candidate_cache_lock:
+                for key in [k for k in _candidate_cache if k[0] == lib_name]:
+                    del _candidate_cache[key]
+                _candidate_cache[cache_key] = listing
 
+        if progress_bar:
+            try:
+                progress_bar.progress((idx + 1) / max(1, len(target_libs)) * 0.3, text=f"Analysiere: {lib_name}")
+            except:
+                pass
+
+    seen_keys = {rk for listing in recent for rk in listing.keys}
+    extra: List[ItemSnapshot] = []
 
     # Retry-Pool: zuletzt fehlgeschlagene Items aus der DB zusätzlich prüfen (auch wenn alt)
     try:
         retry_limit = int(settings.get("failed_retry_pool_limit", 50))
     except Exception:
         retry_limit = 50
-
-    if retry_limit > 0:
+    if retry_limit > 0 and not _is_cancel_requested(cancel_flag):
         try:
-            # all_items -> dict, damit wir einfach Items hinzufügen können
-            items_by_lib = {ln: list(itms) for ln, itms in all_items}
-            existing_keys = set()
-            for ln, itms in items_by_lib.items():
-                for it in itms:
-                    rk = getattr(it, "ratingKey", None)
-                    if rk is not None:
-                        existing_keys.add(str(rk))
-
-            with get_db_connection() as conn:
-                rows = conn.execute(
-                    """SELECT rating_key, library, last_scan
-                        FROM media_state
-                        WHERE state='failed'
-                        ORDER BY last_scan DESC
-                        LIMIT ?""",
-                    (retry_limit,),
-                ).fetchall()
-
-            added = 0
-            for r in rows:
-                rk = r["rating_key"]
-                lib = r["library"]
-                if rk is None:
-                    continue
-                rk_s = str(rk)
+            rows = select_retry_candidates(target_libs, retry_limit)
+            fetched, _ = await _fetch_items_by_key(
+                plex, [(r["rating_key"], r["library"]) for r in rows], seen_keys, target_libs, cancel_flag)
+            _count_fetched(result, fetched)
+            extra.extend(await profiling.to_thread(_snapshot_candidates, plex, fetched, "retry"))
+            if fetched:
+                log_callback(f"🔁 Retry-Pool: +{len(fetched)} failed Items aus DB hinzugefügt (Limit={retry_limit})")
+        except Exception as e:
+            logger.error(f"Retry-Pool Fehler: {e}")
 
-                # nur innerhalb der aktuell ausgewählten Libraries
-                if target_libs and lib and lib not in target_libs:
-                    continue
+    # Angepinnte und wegen Zeitbudget zurückgestellte Items: unabhängig von Limit und Zeit-Filter
+    pinned_keys = get_pinned_keys(settings)
+    deferred = load_deferred_candidates(target_libs)
+    deferred_keys = {d["rating_key"] for d in deferred}
+    deferred_loaded = not deferred
+    bypass_cutoff = pinned_keys | deferred_keys
+    try:
+        if pinned_keys:
+            fetched, missing = await _fetch_items_by_key(
+                plex, [(rk, None) for rk in sorted(pinned_keys)], seen_keys, target_libs, cancel_flag)
+            for rk in missing:
+                log_callback(f"⚠️ Angepinntes Item {rk} nicht gefunden")
+            _count_fetched(result, fetched)
+            extra.extend(await profiling.to_thread(_snapshot_candidates, plex, fetched, "pinned"))
+            if fetched:
+                log_callback(f"📌 Angepinnt: +{len(fetched)} Items hinzugefügt")
+        if deferred:
+            fetched, missing = await _fetch_items_by_key(
+                plex, [(d["rating_key"], d["library"]) for d in deferred], seen_keys, target_libs, cancel_flag)
+            _count_fetched(result, fetched)
+            extra.extend(await profiling.to_thread(_snapshot_candidates, plex, fetched, "deferred"))
+            log_callback(f"⏭️ Zurückgestellt aus letztem Lauf: {len(deferred)} Items (+{len(fetched)} nachgeladen"
+                         + (f", {len(missing)} nicht mehr vorhanden)" if missing else ")"))
+            deferred_loaded = True
+    except Exception as e:
+        logger.error(f"Fehler beim Nachladen angepinnter/zurückgestellter Items: {e}")
 
-                # nicht doppelt, wenn schon in den "neuesten" Items enthalten
-                if rk_s in existing_keys:
-                    continue
+    # Phase 2: Zeit-Filter (gilt nicht für angepinnte/zurückgestellte) und Backoff/Quarantäne
+    profiling.enter_phase("phase2")
+    log_callback("Phase 2: Analysiere Items...")
+    candidates: List[ItemSnapshot] = []
+    for listing in recent:
+        for rk, added_at in zip(listing.keys, listing.added):
+            if added_at >= cutoff or rk in bypass_cutoff:
+                if rk in listing.season_keys:
+                    result.seasons_checked += 1
+                else:
+                    result.checked += 1
+        candidates.extend(c for c in listing.candidates if c.added_at >= cutoff or c.rating_key in bypass_cutoff)
+    candidates.extend(extra)
 
-                try:
-                    item = await asyncio.to_thread(plex.fetchItem, int(rk))
-                except Exception:
-                    continue
+    if verify_posters and not _is_cancel_requested(cancel_flag):
+        try:
+            candidates.extend(await _verify_posters(plex, settings, recent, cutoff, result, log_callback))
+        except Exception as e:
+            logger.error(f"Artwork-Prüfung fehlgeschlagen: {e}")
 
-                # Library bestimmen (DB-Wert bevorzugen)
-                lib_name = lib or getattr(item, "librarySectionTitle", None) or "Unbekannt"
-                if target_libs and lib_name not in target_libs:
-                    continue
+    try:
+        states = _load_item_states(c.rating_key for c in candidates if c.rating_key not in pinned_keys)
+    except Exception as e:
+        logger.error(f"Fehler beim Lesen der Item-Zustände: {e}")
+        states = {}
+    now = int(time.time())
+    for c in candidates:
+        row = states.get(c.rating_key)
+        if row and row["state"] == "quarantined":
+            log_callback(f"🚫 Quarantäne: {c.title} ({row['attempt_count']} Fehlversuche) → übersprungen")
+            result.skipped_quarantine += 1
+            continue
+        if row and row["state"] == "failed" and row["next_eligible_at"]:
+            wait_s = row["next_eligible_at"] - now
+            if wait_s > 0:
+                log_callback(f"⏳ Backoff: {c.title} (Versuch {row['attempt_count']}) → überspringe noch ~{wait_s // 60} min")
+                result.skipped_backoff += 1
+                continue
+        result.candidates.append(c)
+    # Episoden/Staffeln, die ein eingeplanter Serien- oder Staffel-Refresh ohnehin abdeckt, nicht doppelt refreshen
+    result.candidates, covered = _drop_covered(result.candidates)
+    if covered:
+        log_callback(f"📺 {covered} Episoden-/Staffel-Refreshes über Serien- bzw. Staffel-Refresh abgedeckt")
+    # Nur bei vollständigem Lauf: ein Abbruch lässt Keys ungeprüft, die nicht verloren gehen dürfen
+    if deferred_loaded and deferred_keys and not _is_cancel_requested(cancel_flag):
+        result.stale_deferred = sorted(deferred_keys - {c.rating_key for c in result.candidates})
+    return result
+
+
+async def _verify_posters(plex, settings, recent: List[_LibraryListing], cutoff: int, result: DiscoveryResult,
+                          log_callback) -> List[ItemSnapshot]:
+    """
+    Artwork-Stufe: Poster vollständiger Items (im Zeit-Filter) über den Transcoder prüfen,
+    unveränderte aus dem Fingerprint-Cache. Defekte werden Kandidaten mit fehlendem thumb
+    (source="artwork"); neue Fingerprints landen in result.fingerprints.
+    """
+    posters = {rk: (thumb, title, added, listing.library)
+               for listing in recent for rk, thumb, title, added in listing.posters if added >= cutoff}
+    if not posters:
+        return []
+    cached = artwork.load_fingerprints(get_db_connection, posters)
+    broken, result.fingerprints = await artwork.verify(
+        plex, [(rk, p[0]) for rk, p in posters.items()], cached,
+        concurrency=int(settings.get("artwork_concurrency", 4)),
+        recheck_after=float(settings.get("artwork_recheck_days", 30)) * 86400,
+        log_callback=log_callback,
+    )
+    log_callback(f"🖼️ Artwork: {len(posters)} Poster geprüft ({len(posters) - len(result.fingerprints)} aus Cache), "
+                 f"{len(broken)} defekt")
+    return [ItemSnapshot(rk, posters[rk][3], posters[rk][1], posters[rk][2], ALL_FIELDS & ~HAS_THUMB, "artwork")
+            for rk in broken]
 
-                items_by_lib.setdefault(lib_name, []).append(item)
-                retry_keys.add(rk_s)
-                existing_keys.add(rk_s)
-                added += 1
 
-            if added > 0:
-                log_callback(f"🔁 Retry-Pool: +{added} failed Items aus DB hinzugefügt (Limit={retry_limit})")
+def _artwork_fixed(plex, item) -> bool:
+    """Poster-Refresh erfolgreich, sobald der Transcoder ein gültiges Bild liefert (aktualisiert den Fingerprint)."""
+    item.reload()
+    if needs_refresh(item):
+        return False
+    res = artwork.check(plex, item.thumb)
+    if res.ok:
+        artwork.store_fingerprints(get_db_connection, [(int(item.ratingKey), item.thumb, res, int(time.time()))])
+    return res.ok
 
-            # zurück zu all_items in stabiler Reihenfolge
-            all_items = [(ln, items_by_lib.get(ln, [])) for ln in target_libs if ln in items_by_lib]
-        except Exception as e:
-            logger.error(f"Retry-Pool Fehler: {e}")
 
-    # Phase 2: Items analysieren
-    log_callback("Phase 2: Analysiere Items...")
-    total_items = sum(len(items) for _, items in all_items)
-    items_processed = 0
-    
-    for lib_name, items in all_items:
-        if _is_cancel_requested(cancel_flag):
-            log_callback("⚠️ Scan abgebrochen!")
-            break
-            
-        log_callback(f"Analysiere: {lib_name}")
-        
-        for item in items:
-            if _is_cancel_requested(cancel_flag):
-                break
-                
-            items_processed += 1
-            
-            if progress_bar:
-                try:
-                    progress_bar.progress(
-                        items_processed / total_items * 0.3,
-                        text=f"Analysiere: {item.title} ({items_processed}/{total_items})"
-                    )
-                except:
-                    pass
-            
-            added_at = getattr(item, "addedAt", None) or getattr(item, "updatedAt", None)
-            if added_at is None:
-                log_callback(f"⚠️ {item.title}: addedAt/updatedAt fehlt → übersprungen")
-                continue
+def discover_candidates(settings, log_callback=None, cancel_flag=None, use_cache: bool = True) -> Optional[DiscoveryResult]:
+    """
+    Vorschau: welche Items würde ein Scan mit diesen Einstellungen fixen?
+    Keine DB-Schreibzugriffe; das Ergebnis kann direkt an start_scan(candidates=...) gehen.
+    """
+    log = log_callback or (lambda msg: logger.info(msg))
+    ensure_db()
+    try:
+        plex = get_plex_connection()
+    except Exception as e:
+        log(f"Verbindungsfehler: {e}")
+        return None
+    return asyncio.run(_discover(plex, settings, log, cancel_flag, use_cache=use_cache))
 
-            
-            rk_s = str(getattr(item, "ratingKey", ""))
 
-            # Cutoff (days) gilt NICHT für Retry-Pool Items
-            if rk_s not in retry_keys:
-                if isinstance(added_at, dt.datetime) and added_at < cutoff:
-                    continue
-            
-            stats["checked"] += 1
-            
-            if needs_refresh(item):
-                if dry_run:
-                    log_callback(f"-> [SIM] Würde fixen: {item.title}")
-                    save_result(item.ratingKey, lib_name, item.title, "dry_run", "Simulation")
-                    stats["would_fix"] += 1
-                else:
-                    # Backoff: failed Items nicht innerhalb von 24h erneut versuchen
-                    backoff_hours = 24
-                    try:
-                        backoff_hours = int(settings.get("failed_backoff_hours", 24))
-                    except Exception:
-                        backoff_hours = 24
+async def run_scan_engine(progress_bar, log_callback, settings, cancel_flag=None,
+                          candidates: Optional[DiscoveryResult] = None):
+    profiling.enter_phase("setup")
+    ensure_db()
+    log_callback("Starte Scan...")
+    
+    try:
+        plex = get_plex_connection()
+    except Exception as e:
+        log_callback(f"Verbindungsfehler: {e}")
+        raise PlexConnectionError(str(e)) from e
 
-                    row = get_media_state_row(str(item.ratingKey))
-                    if row and row["state"] == "failed" and row["last_scan"]:
-                        try:
-                            last = dt.datetime.fromisoformat(row["last_scan"])
-                            now = dt.datetime.now(last.tzinfo) if getattr(last, "tzinfo", None) else dt.datetime.now()
-                            age = now - last
-                            backoff = dt.timedelta(hours=backoff_hours)
-                            if age < backoff:
-                                remaining = backoff - age
-                                mins = int(remaining.total_seconds() // 60)
-                                log_callback(f"⏳ Backoff: {item.title} (failed vor {int(age.total_seconds()//60)} min) → überspringe noch ~{mins} min")
-                                continue
-                        except Exception:
-                            # Wenn Parsing fehlschlägt, kein Backoff anwenden
-                            pass
+    stats = {"checked": 0, "fixed": 0,
+        "would_fix": 0, "failed": 0, "deferred": 0}
+    dry_run = settings.get("dry_run", False)
+    pinned_keys = get_pinned_keys(settings)
+    
+    deadline = compute_deadline(settings)
+    if deadline is not None:
+        log_callback(f"⏱️ Zeitbudget: keine neuen Refreshes nach {dt.datetime.fromtimestamp(deadline).strftime('%d.%m. %H:%M')}")
+    
+    # Phase 1+2: Kandidaten ermitteln (oder aus einer Vorschau übernehmen)
+    if candidates is None:
+        candidates = await _discover(plex, settings, log_callback, cancel_flag, progress_bar)
+    else:
+        log_callback(f"Phase 1+2 übersprungen: {len(candidates.candidates)} Kandidaten aus der Vorschau")
+    stats["checked"] = candidates.checked
+    if candidates.seasons_checked:
+        stats["seasons_checked"] = candidates.seasons_checked
+    metrics.ITEMS_CHECKED.inc(candidates.checked)
+    if candidates.fingerprints and not dry_run:
+        try:
+            t_write = time.perf_counter()
+            artwork.store_fingerprints(get_db_connection, candidates.fingerprints)
+            metrics.DB_WRITE_SECONDS.labels("artwork_fingerprints").observe(time.perf_counter() - t_write)
+        except Exception as e:
+            logger.error(f"Artwork-Fingerprints nicht gespeichert: {e}")
+    if candidates.stale_deferred and not dry_run:
+        drop_deferred_candidates(candidates.stale_deferred)
+        log_callback(f"🧹 {len(candidates.stale_deferred)} zurückgestellte Items ohne Refresh-Bedarf entfernt")
+    artwork_broken = sum(1 for c in candidates.candidates if c.source == "artwork")
+    if artwork_broken:
+        stats["artwork_broken"] = artwork_broken
+    if candidates.skipped_backoff:
+        metrics.ITEMS_BACKOFF_SKIPPED.labels("backoff").inc(candidates.skipped_backoff)
+    if candidates.skipped_quarantine:
+        metrics.ITEMS_BACKOFF_SKIPPED.labels("quarantine").inc(candidates.skipped_quarantine)
+    if _is_cancel_requested(cancel_flag):
+        log_callback("⚠️ Scan abgebrochen!")
 
-                    items_to_refresh.append((item, lib_name))
+    items_to_refresh = []
+    for c in candidates.candidates:
+        if dry_run:
+            # Simulation schreibt nichts: bestehende fixed/failed-Zustände bleiben erhalten
+            log_callback(f"-> [SIM] Würde fixen: {c.title} (fehlt: {', '.join(c.missing)})")
+            stats["would_fix"] += 1
+        else:
+            items_to_refresh.append(c)
     
-    # Phase 3: Sequentielle Verarbeitung
+    # Phase 3: Verarbeitung mit fix_concurrency parallelen Workern (Default 1 = sequentiell).
+    # Die Queue ist ein Heap nach fix_priority: bei Abbruch wird das Sichtbarste zuerst gefixt.
+    profiling.enter_phase("phase3")
     if items_to_refresh and not dry_run:
         total_to_fix = len(items_to_refresh)
-        log_callback(f"Phase 3: Fixe {total_to_fix} Items...")
-        
-        for idx, (item, lib_name) in enumerate(items_to_refresh):
+        concurrency = _get_fix_concurrency(settings)
+        log_callback(f"Phase 3: Fixe {total_to_fix} Items (Parallelität {concurrency})...")
+
+        failure_counts = get_failure_counts(c.rating_key for c in items_to_refresh)
+        now_ts = time.time()
+        heap = []
+        for seq, c in enumerate(items_to_refresh):
+            prio = fix_priority(c, failure_counts.get(c.rating_key, 0), c.rating_key in pinned_keys, now_ts)
+            heap.append((-prio, seq, c))
+        heapq.heapify(heap)
+        metrics.FIX_QUEUE_DEPTH.set(len(heap))
+        started = 0
+        # Gerade bearbeitete Items (rating_key -> (Prio, Snapshot)): bei hartem Abbruch mit zurückstellen
+        in_flight: Dict[int, Tuple[float, ItemSnapshot]] = {}
+
+        # Zeitbudget: geschätzte Dauer pro Item (EWMA), Start mit der maximalen Wartezeit
+        try:
+            item_estimate = float(settings.get("refresh_wait_total_seconds", 20))
+        except (TypeError, ValueError):
+            item_estimate = 20.0
+        budget_exhausted = False
+
+        # Lastabhängige Drosselung: weniger/keine Refreshes, solange gestreamt wird
+        load_governor = governor.LoadGovernor.from_settings(plex, settings, concurrency, log_callback)
+        if load_governor:
+            await load_governor.start()
+
+        def must_stop() -> bool:
+            nonlocal budget_exhausted
             if _is_cancel_requested(cancel_flag):
-                log_callback("⚠️ Scan abgebrochen!")
-                break
-            
-            # FIX: Einzelnes Try/Except pro Item, damit der ganze Prozess nicht stirbt
-            try:
-                log_callback(f"-> Fixe ({idx+1}/{total_to_fix}): {item.title}...")
+                return True
+            if deadline is not None and time.time() + item_estimate > deadline:
+                budget_exhausted = True
+                return True
+            return False
+
+        async def fix_worker():
+            nonlocal started, item_estimate
+            while heap:
+                if must_stop():
+                    return
+                if load_governor and not await load_governor.acquire(must_stop):
+                    return
+                if not heap:
+                    # Ein anderer Worker hat den Rest geholt, während wir auf den Governor gewartet haben
+                    if load_governor:
+                        await load_governor.release()
+                    return
+                neg_prio, _, snap = heapq.heappop(heap)
+                metrics.FIX_QUEUE_DEPTH.set(len(heap))
+                in_flight[snap.rating_key] = (-neg_prio, snap)
+                lib_name = snap.library
+                started += 1
+
+                # FIX: Einzelnes Try/Except pro Item, damit der ganze Prozess nicht stirbt
+                try:
+                    log_callback(f"-> Fixe ({started}/{total_to_fix}, Prio {-neg_prio:.0f}): {snap.title}...")
+                    
+                    if progress_bar:
+                        try:
+                            progress_bar.progress(
+                                0.3 + (started / total_to_fix * 0.7),
+                                text=f"Fixe {started}/{total_to_fix}: {snap.title}"
+                            )
+                        except:
+                            pass
+                    
+                    # plexapi-Objekt erst jetzt holen (Snapshots halten keine Server-Objekte)
+                    item = await profiling.to_thread(plex.fetchItem, snap.rating_key)
+                    verify = None
+                    if snap.source == "artwork":
+                        verify = lambda item=item: _artwork_fixed(plex, item)
+                    elif snap.level == "season":
+                        # Ein Refresh für die ganze Staffel; gefixt, wenn die gemeldeten Episoden vollständig sind
+                        verify = lambda key=snap.rating_key, eps=snap.episodes: _season_fixed(plex, key, eps)
+                        stats["season_refreshes"] = stats.get("season_refreshes", 0) + 1
+                    t_start = time.monotonic()
+                    ok, msg = await smart_refresh_item(item, settings=settings, cancel_flag=cancel_flag, verify=verify)
+                    latency = time.monotonic() - t_start
+                    item_estimate = 0.7 * item_estimate + 0.3 * latency
+                    if ok:
+                        log_callback(f"✅ {snap.title}: {msg}")
+                        save_result(snap.rating_key, lib_name, snap.title, "fixed", msg, latency=latency)
+                        stats["fixed"] += 1
+                        metrics.ITEMS_FIXED.inc()
+                    else:
+                        log_callback(f"❌ {snap.title}: {msg}")
+                        # Auch Failed muss gespeichert werden, sonst Endlosschleife!
+                        save_result(snap.rating_key, lib_name, snap.title, "failed", msg, latency=latency, settings=settings)
+                        stats["failed"] += 1
+                        metrics.ITEMS_FAILED.inc()
                 
-                if progress_bar:
+                except Exception as e:
+                    # Fataler Fehler bei einem Item (z.B. Encoding Crash)
+                    logger.error(f"CRASH bei Item {snap.title or 'Unknown'}: {e}")
+                    log_callback(f"⚠️ Überspringe defektes Item: {e}")
+                    # Wir versuchen es als Failed zu speichern, damit es nicht wiederkommt
                     try:
-                        progress_bar.progress(
-                            0.3 + ((idx + 1) / total_to_fix * 0.7),
-                            text=f"Fixe {idx+1}/{total_to_fix}: {item.title}"
-                        )
+                        save_result(snap.rating_key, lib_name, "ERROR_ITEM", "failed", str(e), settings=settings)
                     except:
                         pass
-                
-                ok, msg = await smart_refresh_item(item, settings=settings, cancel_flag=cancel_flag)
-                if ok:
-                    log_callback(f"✅ {item.title}: {msg}")
-                    save_result(item.ratingKey, lib_name, item.title, "fixed", msg)
-                    stats["fixed"] += 1
-                else:
-                    log_callback(f"❌ {item.title}: {msg}")
-                    # Auch Failed muss gespeichert werden, sonst Endlosschleife!
-                    save_result(item.ratingKey, lib_name, item.title, "failed", msg)
                     stats["failed"] += 1
-            
-            except Exception as e:
-                # Fataler Fehler bei einem Item (z.B. Encoding Crash)
-                logger.error(f"CRASH bei Item {item.title if hasattr(item, 'title') else 'Unknown'}: {e}")
-                log_callback(f"⚠️ Überspringe defektes Item: {e}")
-                # Wir versuchen es als Failed zu speichern, damit es nicht wiederkommt
-                try:
-                    save_result(item.ratingKey, lib_name, "ERROR_ITEM", "failed", str(e))
-                except:
-                    pass
-                stats["failed"] += 1
+                    metrics.ITEMS_FAILED.inc()
+                finally:
+                    if load_governor:
+                        await load_governor.release()
+                # Nicht im finally: bei CancelledError/KeyboardInterrupt bleibt das Item "in Arbeit"
+                in_flight.pop(snap.rating_key, None)
+
+        try:
+            await asyncio.gather(*(fix_worker() for _ in range(min(concurrency, total_to_fix))))
+        except BaseException:
+            # Harter Abbruch (zweites Ctrl+C, Task-Cancel): Queue und unterbrochene Items für resume sichern
+            remaining = [(snap.rating_key, snap.library, -neg_prio) for neg_prio, _, snap in heap]
+            remaining += [(snap.rating_key, snap.library, prio) for prio, snap in in_flight.values()]
+            if remaining:
+                defer_candidates(remaining)
+            raise
+        finally:
+            metrics.FIX_QUEUE_DEPTH.set(0)
+            if load_governor:
+                await load_governor.stop()
+        # Bearbeitete Items aus dem Kandidaten-Cache nehmen (zurückgestellte bleiben drin)
+        invalidate_candidate_cache({c.rating_key for c in items_to_refresh} - {e[2].rating_key for e in heap})
+        if load_governor and load_governor.paused_seconds >= 1:
+            stats["paused_seconds"] = int(load_governor.paused_seconds)
+            log_callback(f"🎬 Wegen Wiedergabe pausiert: {stats['paused_seconds']}s")
+        cancelled = _is_cancel_requested(cancel_flag)
+        if heap and (budget_exhausted or cancelled):
+            # Rest der Queue für den nächsten Lauf bzw. "cli resume" (deferred_candidates kommen dort zuerst)
+            stats["deferred"] = defer_candidates(
+                (snap.rating_key, snap.library, -neg_prio) for neg_prio, _, snap in heap
+            )
+            reason = "⏱️ Zeitbudget erreicht" if budget_exhausted and not cancelled else "🛑 Abbruch"
+            log_callback(f"{reason}: {len(heap)} Items für den nächsten Lauf zurückgestellt")
+        if cancelled:
+            log_callback("⚠️ Scan abgebrochen!")
 
+    profiling.enter_phase("finish")
     if progress_bar:
         try:
             progress_bar.progress(1.0, text="Fertig!")
@@ -585,96 +2363,73 @@ async def run_scan_engine(progress_bar, log_callback, settings, cancel_flag=None
     return stats
 
 
-def start_scan(settings, progress_bar=None, log_callback=None, cancel_flag=None, source="manual", mark_run_date=True):
-    """Synchroner Einstiegspunkt für manuelle und geplante Scans mit globaler Sperre."""
+def start_scan(settings, progress_bar=None, log_callback=None, cancel_flag=None, source="manual", mark_run_date=True,
+               candidates: Optional[DiscoveryResult] = None, scan_profile: Optional[profiling.ScanProfile] = None):
+    """
+    Synchroner Einstiegspunkt für manuelle und geplante Scans mit Sperre je Bibliothek
+    (prozessübergreifend, siehe scan_lease). Scans disjunkter Bibliotheken laufen parallel;
+    ist eine Bibliothek belegt, wird bis scan_lock_wait_seconds gewartet, sonst None.
+    Ist Plex nicht erreichbar, wirft der Scan PlexConnectionError.
+    candidates: Ergebnis von discover_candidates (überspringt Phase 1+2).
+    scan_profile: wird während des Laufs befüllt (Phasen, blockierte Zeit, to_thread),
+    siehe new_scan_profile; der Aufrufer speichert es z.B. am Job.
+    """
     log = log_callback or (lambda msg: logger.info(msg))
 
-    if not scan_lock.acquire(blocking=False):
-        log("⚠️ Ein anderer Scan läuft bereits. Überspringe.")
+    ensure_db()
+    libraries = list(settings.get("libraries") or [])
+    if candidates is not None:
+        libraries += [c.library for c in candidates.candidates]
+    lease = scan_lease(libraries)
+    waiting = lambda blocked: log(f"⏳ Warte auf Scan-Sperre ({', '.join(f'{r} → {o}' for r, o in blocked.items())})")
+    if not lease.acquire(timeout=float(settings.get("scan_lock_wait_seconds") or 0),
+                         cancel=lambda: _is_cancel_requested(cancel_flag), on_wait=waiting):
+        log("⚠️ Ein anderer Scan läuft bereits für diese Bibliotheken. Überspringe.")
         return None
 
+    def cancelled():
+        # Lease verloren (z.B. Prozess hing länger als die TTL): sauber beenden statt doppelt zu scannen
+        return lease.lost or _is_cancel_requested(cancel_flag)
+
     try:
         if mark_run_date:
             today_str = dt.datetime.now().strftime("%Y-%m-%d")
             update_last_run_date(today_str)
-        return asyncio.run(run_scan_engine(progress_bar, log, settings, cancel_flag))
+        token = profiling.activate(scan_profile)
+        try:
+            if scan_profile:
+                scan_profile.start_cprofile()
+            return asyncio.run(run_scan_engine(progress_bar, log, settings, cancelled, candidates))
+        finally:
+            if scan_profile:
+                scan_profile.finish()
+            profiling.deactivate(token)
     finally:
-        scan_lock.release()
+        lease.release()
+
+
+def scan_lease(libraries, ttl: float = scanlock.DEFAULT_TTL) -> scanlock.LeaseLock:
+    """Lease über die angegebenen Bibliotheken (leer = alle, d.h. eine globale Sperre)."""
+    return scanlock.LeaseLock(get_db_connection, scanlock.library_resources(libraries), owner=OWNER_ID, ttl=ttl)
+
+
+def scan_active() -> bool:
+    """Läuft irgendwo (in irgendeinem Prozess) ein Scan?"""
+    ensure_db()
+    return bool(scanlock.active_leases(get_db_connection))
+
+
+def new_scan_profile(settings) -> profiling.ScanProfile:
+    """Profil für einen Scan-Lauf; profile_cprofile schaltet zusätzlich cProfile ein."""
+    return profiling.ScanProfile(cprofile=bool(settings.get("profile_cprofile", False)))
 
 # --- SCHEDULER ---
 def run_scheduler_thread():
     """
-    Hintergrund-Scheduler mit robusterem Zeitfenster-Check.
-    Prüft alle 30 Sekunden und verwendet ein 2-Minuten-Fenster.
-    Nutzt das Job-System für Logging und UI-Sichtbarkeit.
+    Hintergrund-Scheduler (siehe scheduler.py): schläft bis zum nächsten
+    Cron-Zeitpunkt statt zu pollen, holt verpasste Läufe nach und
+    reagiert sofort auf Settings-Änderungen.
     """
-    import jobs  # Lazy import - kein Circular Import
-
-    logger.info("⏰ Hintergrund-Scheduler gestartet.")
-
-    while True:
-        try:
-            settings = load_settings()
-            if settings.get("schedule_active"):
-                target_time_str = settings.get("schedule_time", "04:00")
-                now = dt.datetime.now()
-                current_date_str = now.strftime("%Y-%m-%d")
-                last_run_date = load_run_state().get("last_run_date")
-
-                # Parse target time
-                try:
-                    target_hour, target_minute = map(int, target_time_str.split(":"))
-                    target_time = now.replace(hour=target_hour, minute=target_minute, second=0, microsecond=0)
-                except ValueError:
-                    logger.error(f"Ungültiges Zeitformat: {target_time_str}")
-                    time.sleep(60)
-                    continue
-
-                # Zeitfenster-Check: 2 Minuten Toleranz
-                time_diff = abs((now - target_time).total_seconds())
-                in_window = time_diff <= 120  # 2 Minuten Fenster
-
-                if in_window and last_run_date != current_date_str:
-                    logger.info(f"⏰ ZEITPLAN AUSLÖSUNG: {now.strftime('%H:%M:%S')}")
-
-                    # Job erstellen (erscheint in UI)
-                    job = jobs.create_scan_job(source="scheduler")
-                    job_id = job["job_id"]
-                    log_path = job.get("log_path")
-
-                    def job_log(msg):
-                        """Schreibt ins Job-Log-File und an Logger."""
-                        logger.info(f"[AUTO-SCAN] {msg}")
-                        if log_path:
-                            try:
-                                ts = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                                with open(log_path, "a", encoding="utf-8") as f:
-                                    f.write(f"{ts} {msg}\n")
-                            except Exception:
-                                pass
-
-                    try:
-                        result = start_scan(
-                            settings,
-                            progress_bar=None,
-                            log_callback=job_log,
-                            cancel_flag=None,
-                            source="scheduler",
-                            mark_run_date=False,
-                        )
-                        if result is not None:
-                            jobs.set_job_status(job_id, status="success", stats=result)
-                            update_last_run_date(current_date_str)
-                            logger.info("⏰ Geplanter Scan abgeschlossen.")
-                        else:
-                            jobs.set_job_status(job_id, status="cancelled", stats=None, error="Scan bereits aktiv")
-                            logger.info("⏭️ Geplanter Scan übersprungen (Scan läuft bereits).")
-                    except Exception as scan_error:
-                        jobs.set_job_status(job_id, status="failed", stats=None, error=str(scan_error))
-                        logger.error(f"Fehler beim geplanten Scan: {scan_error}")
-
-            time.sleep(30)  # Alle 30 Sekunden prüfen statt 59
-        except Exception as e:
-            logger.error(f"Scheduler Fehler: {e}")
-            time.sleep(60)
+    import scheduler  # Lazy import - kein Circular Import
 
+    scheduler.get_scheduler().run()
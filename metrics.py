@@ -0,0 +1,318 @@
+"""
+Metriken der Scan-Engine im Prometheus-Textformat.
+
+Kleine, abhängigkeitsfreie Registry (Counter/Gauge/Histogram mit Labels) plus ein
+lokaler HTTP-Endpunkt /metrics. Gefüttert aus run_scan_engine, smart_refresh_item,
+save_result, dem Scheduler und einem Response-Hook auf der requests-Session von
+plexapi. Aktualisieren kostet pro Aufruf ein Lock + Dict-Lookup.
+
+Env:
+  PSR_METRICS_PORT  Port für /metrics (Default 9464, 0 = aus)
+  PSR_METRICS_HOST  Bind-Adresse (Default 127.0.0.1)
+"""
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+REFRESH_BUCKETS = (1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0, 300.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Kind-Metrik für eine Label-Kombination (wird beim ersten Zugriff angelegt)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: erwartet Labels {self.labelnames}, erhalten {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabeled(self):
+        return self._children[()]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_format_value(child.get())}"]
+
+
+class _ValueChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    def get(self) -> float:
+        return self._value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if amount < 0:
+            raise ValueError("Counter können nur steigen")
+        self._unlabeled().inc(amount)
+
+    def get(self) -> float:
+        return self._unlabeled().get()
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabeled().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabeled().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabeled().set(value)
+
+    def get(self) -> float:
+        return self._unlabeled().get()
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # letzter Eintrag: +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[idx] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabeled().observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        counts, total = child.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+        labels = _label_str(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metrik {metric.name} ist bereits registriert")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# --- Instrumente ---
+
+ITEMS_CHECKED = Counter("psr_items_checked_total", "Geprüfte Items (Phase 1+2)")
+ITEMS_FIXED = Counter("psr_items_fixed_total", "Erfolgreich reparierte Items")
+ITEMS_FAILED = Counter("psr_items_failed_total", "Fehlgeschlagene Refreshes")
+ITEMS_BACKOFF_SKIPPED = Counter("psr_items_backoff_skipped_total",
+                                "Kandidaten, die wegen Backoff oder Quarantäne übersprungen wurden", ["reason"])
+
+PLEX_REQUEST_SECONDS = Histogram("psr_plex_request_seconds",
+                                 "Plex-Antwortzeit bis zu den Headern je Endpunkt", ["method", "endpoint"],
+                                 buckets=LATENCY_BUCKETS)
+REFRESH_TO_FIXED_SECONDS = Histogram("psr_refresh_to_fixed_seconds",
+                                     "Dauer vom Refresh bis zu vollständigen Metadaten", buckets=REFRESH_BUCKETS)
+DB_WRITE_SECONDS = Histogram("psr_db_write_seconds", "Dauer von DB-Schreibvorgängen", ["operation"],
+                             buckets=DB_BUCKETS)
+
+REFRESHES_IN_FLIGHT = Gauge("psr_refreshes_in_flight", "Laufende Refreshes")
+FIX_QUEUE_DEPTH = Gauge("psr_fix_queue_depth", "Noch offene Items in der Fix-Queue (Phase 3)")
+SCHEDULER_NEXT_FIRE = Gauge("psr_scheduler_next_fire_timestamp_seconds",
+                            "Nächster geplanter Lauf (Unix-Zeit, 0 = keiner)")
+
+# --- Plex-Request-Latenz ---
+
+_ID_SEGMENT = re.compile(r"/\d+(?:,\d+)*(?=/|$)")
+
+
+def endpoint_label(path: str) -> str:
+    """/library/metadata/123,456/refresh -> /library/metadata/{id}/refresh (begrenzte Label-Kardinalität)."""
+    return _ID_SEGMENT.sub("/{id}", path.split("?", 1)[0]) or "/"
+
+
+def _observe_response(response, *args, **kwargs):
+    try:
+        path = response.request.path_url if response.request is not None else response.url
+        PLEX_REQUEST_SECONDS.labels(response.request.method, endpoint_label(path)).observe(
+            response.elapsed.total_seconds())
+    except Exception:
+        pass
+    return response
+
+
+def instrument_session(session) -> None:
+    """Hängt den Latenz-Hook an eine requests.Session (idempotent)."""
+    hooks = session.hooks.setdefault("response", [])
+    if _observe_response not in hooks:
+        hooks.append(_observe_response)
+
+
+# --- HTTP-Endpunkt ---
+
+def _make_handler(registry: Registry):
+    # http.server erst hier importieren (~10 ms), die Instrumente selbst brauchen es nicht
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port: Optional[int] = None, host: Optional[str] = None):
+    """
+    Startet /metrics in einem Daemon-Thread (einmal pro Prozess). Port/Host aus den
+    Argumenten oder PSR_METRICS_PORT/PSR_METRICS_HOST; Port 0 deaktiviert den Endpunkt.
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        try:
+            port = int(port if port is not None else os.getenv("PSR_METRICS_PORT", "9464"))
+        except ValueError:
+            logger.warning("Ungültiger PSR_METRICS_PORT - Metrik-Endpunkt deaktiviert")
+            return None
+        if port <= 0:
+            return None
+        host = host or os.getenv("PSR_METRICS_HOST", "127.0.0.1")
+        from http.server import ThreadingHTTPServer
+
+        try:
+            _server = ThreadingHTTPServer((host, port), _make_handler(REGISTRY))
+        except OSError as e:
+            logger.warning(f"Metrik-Endpunkt auf {host}:{port} nicht verfügbar: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        logger.info(f"📈 Metriken unter http://{host}:{_server.server_address[1]}/metrics")
+        return _server
@@ -1,6 +1,5 @@
 import os
 import logging
-import requests
 from typing import Dict
 from dotenv import load_dotenv
 
@@ -25,6 +24,8 @@ def send_telegram_message(message: str) -> bool:
         logger.debug("Telegram nicht konfiguriert (Platzhalter-Token)")
         return False
 
+    import requests  # lazy: nur wenn Telegram konfiguriert ist
+
     url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": TELEGRAM_CHAT_ID,
@@ -52,6 +53,7 @@ def send_scan_completion_notification(stats: Dict[str, int]) -> bool:
     checked = stats.get('checked', 0)
     fixed = stats.get('fixed', 0)
     failed = stats.get('failed', 0)
+    deferred = stats.get('deferred', 0)
 
     # Erfolgsrate berechnen
     problems_found = fixed + failed
@@ -71,6 +73,8 @@ def send_scan_completion_notification(stats: Dict[str, int]) -> bool:
 • Fehler: {failed} ❌
 • Ergebnis: {rate_text}
 """
+    if deferred:
+        message += f"• Zurückgestellt (Zeitbudget): {deferred} ⏱️\n"
 
     return send_telegram_message(message.strip())
 
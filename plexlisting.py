@@ -0,0 +1,116 @@
+"""
+Schlanke Aufzählung von Bibliotheks-Listings ohne plexapi-Objekte.
+
+Fragt /library/sections/{key}/all?includeGuids=1 direkt ab und liest die Antwort
+gestreamt mit iterparse: pro Item werden nur ratingKey, Titel, addedAt und die
+Flags für Guid/Poster/Beschreibung übernommen (bei Episoden zusätzlich Staffel/Serie),
+das Element danach freigegeben.
+Speicherbedarf bleibt damit unabhängig von der Größe der Bibliothek konstant.
+"""
+import xml.etree.ElementTree as ET
+from typing import IO, Iterator, NamedTuple, Optional
+
+# Plex-Typcodes für den type-Parameter (siehe plexapi.utils.SEARCHTYPES)
+SEARCH_TYPES = {"movie": 1, "show": 2, "season": 3, "episode": 4}
+ITEM_TAGS = ("Video", "Directory")
+
+
+class ListingEntry(NamedTuple):
+    rating_key: int
+    title: str
+    added_at: Optional[int]
+    has_guid: bool
+    has_thumb: bool
+    has_summary: bool
+    # Nur bei Episoden/Staffeln gesetzt (Hierarchie für Staffel-Refreshes)
+    parent_key: Optional[int] = None
+    grandparent_key: Optional[int] = None
+    grandparent_title: Optional[str] = None
+    parent_index: Optional[int] = None
+    index: Optional[int] = None
+    thumb: Optional[str] = None
+
+
+def _opt_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_listing(stream: IO[bytes]) -> Iterator[ListingEntry]:
+    """Liest ein MediaContainer-XML inkrementell und liefert je Item einen ListingEntry."""
+    depth = 0
+    root = None
+    current = None
+    has_guid = False
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            if depth == 1:
+                root = elem
+            elif depth == 2 and elem.tag in ITEM_TAGS:
+                current = elem.attrib
+                has_guid = False
+            elif depth == 3 and current is not None and elem.tag == "Guid":
+                has_guid = True
+            continue
+
+        depth -= 1
+        if depth == 1 and current is not None:
+            added = current.get("addedAt") or current.get("updatedAt")
+            yield ListingEntry(
+                int(current["ratingKey"]),
+                current.get("title", ""),
+                int(added) if added else None,
+                has_guid,
+                bool(current.get("thumb")),
+                bool(current.get("summary")),
+                _opt_int(current.get("parentRatingKey")),
+                _opt_int(current.get("grandparentRatingKey")),
+                current.get("grandparentTitle"),
+                _opt_int(current.get("parentIndex")),
+                _opt_int(current.get("index")),
+                current.get("thumb"),
+            )
+            current = None
+            # Element samt Kindern freigeben, sonst wächst der Baum unter root mit
+            elem.clear()
+            root.clear()
+
+
+def iter_section(plex, section_key, libtype: str, limit: int, sort: str = "addedAt:desc",
+                 timeout: Optional[int] = None) -> Iterator[ListingEntry]:
+    """
+    Streamt die neuesten `limit` Items einer Bibliothek über die Session des PlexServer-Objekts
+    (gleicher Token, gleiche Header wie plexapi).
+    """
+    key = f"/library/sections/{section_key}/all"
+    params = {
+        "type": SEARCH_TYPES.get(libtype, libtype),
+        "sort": sort,
+        "includeGuids": 1,
+        "X-Plex-Container-Start": 0,
+        "X-Plex-Container-Size": int(limit),
+    }
+    headers = plex._headers(**{"X-Plex-Container-Start": "0", "X-Plex-Container-Size": str(int(limit))})
+    response = plex._session.get(plex.url(key), headers=headers, params=params,
+                                 timeout=timeout or plex._timeout, stream=True)
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield from parse_listing(response.raw)
+    finally:
+        response.close()
+
+
+def iter_children(plex, rating_key, timeout: Optional[int] = None) -> Iterator[ListingEntry]:
+    """Streamt /library/metadata/{key}/children (z.B. Episoden einer Staffel) inkl. Guids."""
+    response = plex._session.get(plex.url(f"/library/metadata/{int(rating_key)}/children"), headers=plex._headers(),
+                                 params={"includeGuids": 1}, timeout=timeout or plex._timeout, stream=True)
+    try:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        yield from parse_listing(response.raw)
+    finally:
+        response.close()
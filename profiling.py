@@ -0,0 +1,194 @@
+"""
+Leichtgewichtiges Laufzeitprofil eines Scans.
+
+Ein ScanProfile wird per ContextVar an den laufenden Scan gebunden (start_scan) und
+von dort in alle Tasks und to_thread-Aufrufe vererbt. Erfasst werden:
+  - Wall-/CPU-Zeit je Phase (setup, phase1, phase2, phase3, finish)
+  - blockierte Zeit je Art: plex (to_thread-Aufrufe), sqlite (DB-Verbindungen), sleep
+    (Refresh-Wartezeit, Governor-Pause) - kumuliert über parallele Worker. Verschachtelte
+    Blöcke (DB-Zugriff innerhalb eines to_thread-Aufrufs) zählen nur bei der inneren Art,
+    der äußere Block bekommt die Differenz: pro Thread summiert sich nichts doppelt
+  - Anzahl und Gesamtdauer der to_thread-Aufrufe
+Optional (profile_cprofile) zusätzlich ein cProfile des Event-Loop-Threads.
+Ohne aktives Profil sind alle Funktionen No-ops (ein ContextVar-Lookup).
+"""
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+BLOCK_KINDS = ("plex", "sqlite", "sleep")
+CPROFILE_TOP = 30
+
+_current: contextvars.ContextVar[Optional["ScanProfile"]] = contextvars.ContextVar("scan_profile", default=None)
+# Offener Block: Zelle mit der Dauer darin verschachtelter Blöcke (wird vom äußeren abgezogen).
+# to_thread kopiert den Kontext, die Zelle reicht also bis in den Worker-Thread.
+_open_block: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("profile_block", default=None)
+
+
+class ScanProfile:
+    def __init__(self, cprofile: bool = False):
+        self._lock = threading.Lock()
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._phase: Optional[str] = None
+        self._phase_wall = 0.0
+        self._phase_cpu = 0.0
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._cprofile_text: Optional[str] = None
+
+    def _bucket(self, name: str) -> Dict[str, float]:
+        bucket = self.phases.get(name)
+        if bucket is None:
+            bucket = self.phases[name] = {"wall_s": 0.0, "cpu_s": 0.0, "to_thread_calls": 0, "to_thread_s": 0.0,
+                                          **{f"{kind}_s": 0.0 for kind in BLOCK_KINDS}}
+        return bucket
+
+    # --- Phasen ---
+
+    def enter_phase(self, name: str) -> None:
+        """Beendet die laufende Phase und startet `name`."""
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        with self._lock:
+            self._close_phase(now_wall, now_cpu)
+            self._phase, self._phase_wall, self._phase_cpu = name, now_wall, now_cpu
+            self._bucket(name)
+
+    def _close_phase(self, now_wall: float, now_cpu: float) -> None:
+        if self._phase is not None:
+            bucket = self._bucket(self._phase)
+            bucket["wall_s"] += now_wall - self._phase_wall
+            bucket["cpu_s"] += now_cpu - self._phase_cpu
+            self._phase = None
+
+    def record(self, kind: str, seconds: float, to_thread_s: Optional[float] = None) -> None:
+        """to_thread_s: Gesamtdauer des to_thread-Aufrufs (seconds ist ohne verschachtelte Blöcke)."""
+        with self._lock:
+            bucket = self._bucket(self._phase or "setup")
+            bucket[f"{kind}_s"] += seconds
+            if to_thread_s is not None:
+                bucket["to_thread_calls"] += 1
+                bucket["to_thread_s"] += to_thread_s
+
+    # --- Lebenszyklus ---
+
+    def start_cprofile(self) -> None:
+        if self._cprofile:
+            self._cprofile.enable()
+
+    def finish(self) -> None:
+        now_wall, now_cpu = time.perf_counter(), time.process_time()
+        if self._cprofile:
+            self._cprofile.disable()
+            out = io.StringIO()
+            pstats.Stats(self._cprofile, stream=out).sort_stats("cumulative").print_stats(CPROFILE_TOP)
+            self._cprofile_text = out.getvalue()
+            self._cprofile = None
+        with self._lock:
+            self._close_phase(now_wall, now_cpu)
+            self.wall_s = now_wall - self._start_wall
+            self.cpu_s = now_cpu - self._start_cpu
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            phases = {name: {k: round(v, 4) for k, v in bucket.items()} for name, bucket in self.phases.items()}
+        totals = {f"{kind}_s": round(sum(p[f"{kind}_s"] for p in phases.values()), 4) for kind in BLOCK_KINDS}
+        data: Dict[str, Any] = {
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "blocked": totals,
+            "to_thread": {
+                "calls": sum(int(p["to_thread_calls"]) for p in phases.values()),
+                "seconds": round(sum(p["to_thread_s"] for p in phases.values()), 4),
+            },
+            "phases": phases,
+        }
+        if self._cprofile_text:
+            data["cprofile"] = self._cprofile_text
+        return data
+
+
+# --- Zugriff aus dem Scan-Code ---
+
+def activate(profile: Optional[ScanProfile]) -> contextvars.Token:
+    return _current.set(profile)
+
+
+def deactivate(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+def current() -> Optional[ScanProfile]:
+    return _current.get()
+
+
+def enter_phase(name: str) -> None:
+    profile = _current.get()
+    if profile is not None:
+        profile.enter_phase(name)
+
+
+def record(kind: str, seconds: float) -> None:
+    """Zeit ohne eigenen Block (z.B. Warten im Event-Loop); zählt auch im umgebenden Block als verschachtelt."""
+    profile = _current.get()
+    if profile is not None:
+        profile.record(kind, seconds)
+        outer = _open_block.get()
+        if outer is not None:
+            outer[0] += seconds
+
+
+def _close_block(profile: ScanProfile, kind: str, elapsed: float, nested: List[float], token,
+                 to_thread_s: Optional[float] = None) -> None:
+    _open_block.reset(token)
+    profile.record(kind, max(0.0, elapsed - nested[0]), to_thread_s)
+    outer = _open_block.get()
+    if outer is not None:
+        outer[0] += elapsed
+
+
+@contextlib.contextmanager
+def block(kind: str):
+    """Synchroner Block, der als blockiert auf `kind` zählt (ohne darin verschachtelte Blöcke)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    nested = [0.0]
+    token = _open_block.set(nested)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        _close_block(profile, kind, time.perf_counter() - t0, nested, token)
+
+
+async def to_thread(func, *args, kind: str = "plex", **kwargs):
+    """asyncio.to_thread mit Zählung; die Dauer gilt als blockiert auf `kind` (abzüglich z.B. DB-Zeit darin)."""
+    profile = _current.get()
+    if profile is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    nested = [0.0]
+    token = _open_block.set(nested)
+    t0 = time.perf_counter()
+    try:
+        return await asyncio.to_thread(func, *args, **kwargs)
+    finally:
+        elapsed = time.perf_counter() - t0
+        _close_block(profile, kind, elapsed, nested, token, to_thread_s=elapsed)
+
+
+async def sleep(seconds: float) -> None:
+    profile = _current.get()
+    t0 = time.perf_counter()
+    await asyncio.sleep(seconds)
+    if profile is not None:
+        profile.record("sleep", time.perf_counter() - t0)
@@ -0,0 +1,183 @@
+"""
+Prozessübergreifende Scan-Sperre je Bibliothek (Lease in SQLite).
+
+Ein Lease gehört einem Besitzer (Host:PID + Zufalls-Token) und läuft nach `ttl` Sekunden
+ab, wenn er nicht erneuert wird - ein abgestürzter Prozess blockiert also höchstens eine
+TTL lang. Solange der Scan läuft, verlängert ein Daemon-Thread alle ttl/3 Sekunden.
+Mehrere Bibliotheken werden in einer Transaktion (BEGIN IMMEDIATE) ganz oder gar nicht
+belegt; Scans disjunkter Bibliotheken laufen parallel, auch im selben Prozess.
+
+Wartezeit bis zur Sperre und Haltedauer gehen als Histogramme nach metrics.py.
+"""
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Iterable, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 120.0
+WILDCARD = "library:*"  # Scan ohne Bibliotheksauswahl: kollidiert mit jeder Bibliothek
+POLL_INTERVAL = 2.0
+
+LOCK_WAIT_SECONDS = metrics.Histogram("psr_scan_lock_wait_seconds",
+                                      "Wartezeit auf die Scan-Sperre", ["outcome"],
+                                      buckets=(0.01, 0.1, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0))
+LOCK_HOLD_SECONDS = metrics.Histogram("psr_scan_lock_hold_seconds", "Haltedauer der Scan-Sperre",
+                                      buckets=(1.0, 10.0, 60.0, 300.0, 900.0, 1800.0, 3600.0, 7200.0, 21600.0))
+LEASES_LOST = metrics.Counter("psr_scan_lock_lost_total", "Leases, die vor dem Freigeben verloren gingen")
+
+
+def init_table(conn) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_leases(
+            resource TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            token TEXT NOT NULL,
+            acquired_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+
+def library_resources(libraries: Iterable[str]) -> List[str]:
+    """Ressourcen-Namen je Bibliothek; ohne Bibliothek die Wildcard (sperrt alle)."""
+    return sorted({f"library:{name}" for name in libraries if name}) or [WILDCARD]
+
+
+class LeaseLock:
+    """
+    Sperre über `resources` (z.B. library_resources(...)). `connect` ist ein Context-Manager
+    für eine DB-Verbindung (logic.get_db_connection).
+    """
+
+    def __init__(self, connect: Callable, resources: Iterable[str], owner: str, ttl: float = DEFAULT_TTL):
+        self._connect = connect
+        self.resources = sorted(set(resources))
+        self.owner = owner
+        self.ttl = float(ttl)
+        self.token = uuid.uuid4().hex
+        self.lost = False
+        self.blocked_by: dict = {}
+        self._held_since: Optional[float] = None
+        self._stop = threading.Event()
+        self._renewer: Optional[threading.Thread] = None
+
+    @property
+    def held(self) -> bool:
+        return self._held_since is not None
+
+    # --- Belegen ---
+
+    def try_acquire(self) -> bool:
+        """Ein Versuch: alle Ressourcen oder keine. Abgelaufene fremde Leases werden übernommen."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                marks = ",".join("?" * len(self.resources))
+                busy = conn.execute(
+                    f"SELECT resource, owner FROM scan_leases WHERE (resource IN ({marks}) OR resource = ? OR ?) "
+                    f"AND token != ? AND expires_at > ?",
+                    (*self.resources, WILDCARD, WILDCARD in self.resources, self.token, now)).fetchall()
+                if busy:
+                    conn.rollback()
+                    self.blocked_by = {r["resource"]: r["owner"] for r in busy}
+                    return False
+                conn.executemany("""
+                    INSERT INTO scan_leases(resource, owner, token, acquired_at, expires_at) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(resource) DO UPDATE SET owner = excluded.owner, token = excluded.token,
+                        acquired_at = excluded.acquired_at, expires_at = excluded.expires_at
+                """, [(r, self.owner, self.token, now, now + self.ttl) for r in self.resources])
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        self.blocked_by = {}
+        self._held_since = time.monotonic()
+        self.lost = False
+        self._start_renewer()
+        return True
+
+    def acquire(self, timeout: float = 0.0, cancel: Optional[Callable[[], bool]] = None,
+                on_wait: Optional[Callable[[dict], None]] = None) -> bool:
+        """Wartet bis `timeout` Sekunden (0 = nur ein Versuch); `cancel` bricht das Warten ab."""
+        t0 = time.monotonic()
+        deadline = t0 + max(0.0, timeout)
+        notified = False
+        while True:
+            if self.try_acquire():
+                LOCK_WAIT_SECONDS.labels("acquired").observe(time.monotonic() - t0)
+                return True
+            if time.monotonic() >= deadline or (cancel is not None and cancel()):
+                LOCK_WAIT_SECONDS.labels("busy").observe(time.monotonic() - t0)
+                return False
+            if on_wait is not None and not notified:
+                on_wait(dict(self.blocked_by))
+                notified = True
+            time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    # --- Erneuern / Freigeben ---
+
+    def renew(self) -> bool:
+        """Verlängert alle Leases; False, wenn eines abgelaufen und fremd übernommen wurde."""
+        with self._connect() as conn:
+            cur = conn.execute("UPDATE scan_leases SET expires_at = ? WHERE token = ?",
+                               (time.time() + self.ttl, self.token))
+            conn.commit()
+        if cur.rowcount < len(self.resources):
+            if not self.lost:
+                LEASES_LOST.inc()
+                logger.warning(f"🔒 Scan-Sperre verloren ({cur.rowcount}/{len(self.resources)} Leases aktiv)")
+            self.lost = True
+            return False
+        return True
+
+    def _start_renewer(self) -> None:
+        self._stop.clear()
+        self._renewer = threading.Thread(target=self._renew_loop, name="scan-lease-renew", daemon=True)
+        self._renewer.start()
+
+    def _renew_loop(self) -> None:
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                if not self.renew():
+                    return
+            except Exception as e:
+                # DB kurz nicht erreichbar: nächster Versuch, das Lease läuft erst nach ttl ab
+                logger.warning(f"🔒 Lease-Erneuerung fehlgeschlagen: {e}")
+
+    def release(self) -> None:
+        if self._held_since is None:
+            return
+        self._stop.set()
+        if self._renewer is not None:
+            self._renewer.join(timeout=5)
+            self._renewer = None
+        try:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM scan_leases WHERE token = ?", (self.token,))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"🔒 Scan-Sperre konnte nicht freigegeben werden (läuft nach {self.ttl:.0f}s ab): {e}")
+        LOCK_HOLD_SECONDS.observe(time.monotonic() - self._held_since)
+        self._held_since = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f"Scan-Sperre belegt: {self.blocked_by}")
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def active_leases(connect: Callable) -> List[dict]:
+    """Nicht abgelaufene Leases (für Wartung, UI und CLI)."""
+    with connect() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT resource, owner, acquired_at, expires_at FROM scan_leases WHERE expires_at > ? ORDER BY resource",
+            (time.time(),))]
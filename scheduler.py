@@ -0,0 +1,382 @@
+import datetime as dt
+import logging
+import threading
+from typing import Any, Optional
+
+import logic
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Obergrenze für einen einzelnen Schlaf: fängt Uhr-Sprünge (NTP, Suspend) ab, ohne zu pollen
+MAX_SLEEP_SECONDS = 3600
+
+
+# --- CRON ---
+
+class CronExpression:
+    """
+    Minimaler 5-Feld-Cron-Parser (Minute Stunde Tag Monat Wochentag).
+    Unterstützt *, Listen (1,15), Bereiche (1-5) und Schritte (*/15, 8-18/2).
+    Wochentag: 0-7 (0 und 7 = Sonntag). Sind Tag UND Wochentag eingeschränkt,
+    reicht wie bei cron ein Treffer in einem der beiden Felder.
+    """
+
+    _BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        self.expr = " ".join(str(expr).split())
+        fields = self.expr.split(" ")
+        if len(fields) != 5:
+            raise ValueError(f"Cron-Ausdruck braucht 5 Felder: {expr!r}")
+        parsed = [self._parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, self._BOUNDS)]
+        self.minutes, self.hours, self.days, self.months, dows = parsed
+        self.dows = {d % 7 for d in dows}
+        self.dom_restricted = fields[2] != "*"
+        self.dow_restricted = fields[4] != "*"
+
+    @staticmethod
+    def _parse_field(field: str, lo: int, hi: int) -> set:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_s = part.split("/", 1)
+                step = int(step_s)
+                if step <= 0:
+                    raise ValueError(f"Ungültige Schrittweite: {field!r}")
+            if part == "*":
+                start, end = lo, hi
+            elif "-" in part:
+                start_s, end_s = part.split("-", 1)
+                start, end = int(start_s), int(end_s)
+            else:
+                start = int(part)
+                end = hi if step > 1 else start
+            if start < lo or end > hi or start > end:
+                raise ValueError(f"Wert außerhalb {lo}-{hi}: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, d: dt.datetime) -> bool:
+        dom_ok = d.day in self.days
+        dow_ok = (d.isoweekday() % 7) in self.dows
+        if self.dom_restricted and self.dow_restricted:
+            return dom_ok or dow_ok
+        return dom_ok and dow_ok
+
+    def next_after(self, after: dt.datetime) -> Optional[dt.datetime]:
+        """Nächster Auslösezeitpunkt strikt nach `after` (None wenn keiner innerhalb ~5 Jahren)."""
+        t = after.replace(second=0, microsecond=0) + dt.timedelta(minutes=1)
+        limit = after + dt.timedelta(days=366 * 5)
+        while t <= limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + dt.timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + dt.timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + dt.timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += dt.timedelta(minutes=1)
+                continue
+            return t
+        return None
+
+    def prev_at_or_before(self, before: dt.datetime) -> Optional[dt.datetime]:
+        """Letzter Auslösezeitpunkt <= `before` (für Catch-up nach verpassten Läufen)."""
+        t = before.replace(second=0, microsecond=0)
+        limit = before - dt.timedelta(days=366 * 5)
+        while t >= limit:
+            if t.month not in self.months:
+                t = t.replace(day=1, hour=0, minute=0) - dt.timedelta(minutes=1)
+                continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) - dt.timedelta(minutes=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) - dt.timedelta(minutes=1)
+                continue
+            if t.minute not in self.minutes:
+                t -= dt.timedelta(minutes=1)
+                continue
+            return t
+        return None
+
+
+def _time_to_cron(hhmm: str) -> str:
+    hour, minute = map(int, str(hhmm).split(":"))
+    return f"{minute} {hour} * * *"
+
+
+# --- SCHEDULE ENTRIES ---
+
+def build_entries(settings: dict) -> list[dict[str, Any]]:
+    """
+    Leitet die Zeitplan-Einträge aus den Settings ab:
+      - schedule_time (HH:MM, Legacy) → täglicher Scan aller Bibliotheken
+      - schedule_crons: Liste aus Cron-Strings oder {"cron": ..., "libraries": [...], "name": ...}
+      - profiles: jedes aktive Profil mit cron → eigener Job mit den Profil-Parametern
+      - maintenance_time → tägliche DB-Wartung
+    """
+    entries = []
+    if settings.get("schedule_active"):
+        try:
+            entries.append({"id": "scan:default", "kind": "scan",
+                            "cron": CronExpression(_time_to_cron(settings.get("schedule_time", "04:00"))),
+                            "libraries": None})
+        except ValueError as e:
+            logger.error(f"Ungültiges Zeitformat: {settings.get('schedule_time')} ({e})")
+
+        for idx, spec in enumerate(settings.get("schedule_crons") or []):
+            if isinstance(spec, str):
+                spec = {"cron": spec}
+            try:
+                cron = CronExpression(spec.get("cron", ""))
+            except (ValueError, AttributeError) as e:
+                logger.error(f"Ungültiger Cron-Eintrag {spec!r}: {e}")
+                continue
+            entry_id = f"scan:{spec.get('name') or cron.expr}"
+            if spec.get("libraries"):
+                entry_id += ":" + ",".join(spec["libraries"])
+            entries.append({"id": entry_id, "kind": "scan", "cron": cron,
+                            "libraries": spec.get("libraries") or None})
+
+    # Scan-Profile laufen mit eigenem Zeitplan unabhängig von schedule_active
+    for profile in settings.get("profiles") or []:
+        if not profile.get("enabled", True) or not profile.get("cron"):
+            continue
+        try:
+            cron = CronExpression(profile["cron"])
+        except ValueError as e:
+            logger.error(f"Ungültiger Cron-Ausdruck in Profil {profile.get('name')}: {e}")
+            continue
+        entries.append({"id": f"profile:{profile['name']}", "kind": "scan", "cron": cron,
+                        "libraries": None, "profile": profile["name"]})
+
+    if settings.get("maintenance_active", True):
+        try:
+            entries.append({"id": "maintenance", "kind": "maintenance",
+                            "cron": CronExpression(_time_to_cron(settings.get("maintenance_time", "03:30"))),
+                            "libraries": None})
+        except ValueError as e:
+            logger.error(f"Ungültige Wartungszeit: {settings.get('maintenance_time')} ({e})")
+    return entries
+
+
+# --- SCHEDULER ---
+
+class Scheduler:
+    """
+    Berechnet den nächsten Auslösezeitpunkt aller Einträge und schläft bis dahin.
+    Settings-Änderungen wecken den Thread sofort (notify_settings_changed).
+    Verpasste Läufe (Host schlief, Prozess war down) werden innerhalb von
+    schedule_catchup_hours nachgeholt.
+    """
+
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._settings: Optional[dict] = None
+        self._settings_version: Optional[int] = None
+        self._entries: list[dict[str, Any]] = []
+        self.next_fire: Optional[dt.datetime] = None
+        self.next_entry_id: Optional[str] = None
+        self._published_next: Optional[dict[str, Optional[float]]] = None
+
+    # -- Settings --
+    def notify_settings_changed(self) -> None:
+        self._settings = None
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+
+    def _current_settings(self) -> dict:
+        # Settings-Store: Version ändert sich nur bei neuem Inhalt (stat statt Parsen)
+        version = logic.settings_version()
+        if self._settings is None or version != self._settings_version:
+            self._settings = logic.load_settings()
+            self._settings_version = version
+            self._entries = build_entries(self._settings)
+        return self._settings
+
+    # -- Fire-Zeiten --
+    def _due_entries(self, now: dt.datetime) -> list[tuple[dict[str, Any], dt.datetime]]:
+        """Einträge mit planmäßigem Zeitpunkt, der noch nicht beansprucht wurde (Eintrag, Slot)."""
+        settings = self._settings or {}
+        try:
+            catchup_s = float(settings.get("schedule_catchup_hours", 6)) * 3600
+        except (TypeError, ValueError):
+            catchup_s = 6 * 3600
+
+        slots = logic.get_schedule_slots()
+        unseen = {}
+        due = []
+        for entry in self._entries:
+            last = (slots.get(entry["id"]) or {}).get("last_fire")
+            if last is None:
+                # Neuer Eintrag: ab jetzt zählen, nichts rückwirkend auslösen
+                unseen[entry["id"]] = now.timestamp()
+                continue
+            prev = entry["cron"].prev_at_or_before(now)
+            if prev is None or prev.timestamp() <= last:
+                continue
+            if (now - prev).total_seconds() > catchup_s:
+                if logic.claim_schedule_slot(entry["id"], prev.timestamp()):
+                    logger.warning(f"⏰ Verpasster Lauf {entry['id']} um {prev:%Y-%m-%d %H:%M} liegt außerhalb des Catch-up-Fensters")
+                continue
+            due.append((entry, prev))
+        logic.seed_schedule_slots(unseen)
+        return due
+
+    def _compute_next(self, now: dt.datetime) -> None:
+        self.next_fire, self.next_entry_id = None, None
+        next_fires = {}
+        for entry in self._entries:
+            nxt = entry["cron"].next_after(now)
+            next_fires[entry["id"]] = nxt.timestamp() if nxt else None
+            if nxt and (self.next_fire is None or nxt < self.next_fire):
+                self.next_fire, self.next_entry_id = nxt, entry["id"]
+        metrics.SCHEDULER_NEXT_FIRE.set(self.next_fire.timestamp() if self.next_fire else 0)
+        if next_fires != self._published_next:
+            logic.record_schedule_next(next_fires)
+            self._published_next = next_fires
+
+    # -- Ausführung --
+    def _fire(self, entry: dict[str, Any], slot: dt.datetime, now: dt.datetime) -> None:
+        # Compare-and-Set: läuft ein zweiter Prozess mit Scheduler, löst nur einer den Slot aus
+        if not logic.claim_schedule_slot(entry["id"], slot.timestamp()):
+            logger.info(f"⏰ {entry['id']} ({slot:%H:%M}) wurde bereits von einem anderen Prozess ausgelöst.")
+            return
+        if entry["kind"] == "maintenance":
+            status = _run_maintenance()
+        else:
+            settings = logic.resolve_scan_settings(self._settings or logic.load_settings(), entry.get("profile"))
+            if entry.get("libraries"):
+                settings["libraries"] = list(entry["libraries"])
+            logger.info(f"⏰ ZEITPLAN AUSLÖSUNG ({entry['id']}): {now.strftime('%H:%M:%S')}")
+            status = _run_scheduled_scan(settings, profile=entry.get("profile"))
+        logic.finish_schedule_slot(entry["id"], status)
+
+    def run(self) -> None:
+        logger.info("⏰ Hintergrund-Scheduler gestartet.")
+        logic.ensure_db()
+        while not self._stop.is_set():
+            try:
+                self._current_settings()
+                now = dt.datetime.now()
+                for entry, slot in self._due_entries(now):
+                    self._fire(entry, slot, now)
+
+                now = dt.datetime.now()
+                self._compute_next(now)
+                if self.next_fire is not None:
+                    sleep_s = min(MAX_SLEEP_SECONDS, max(1.0, (self.next_fire - now).total_seconds()))
+                    logger.debug(f"⏰ Nächster Lauf: {self.next_entry_id} um {self.next_fire:%Y-%m-%d %H:%M}")
+                else:
+                    sleep_s = MAX_SLEEP_SECONDS
+
+                self._wakeup.wait(sleep_s)
+                self._wakeup.clear()
+            except Exception as e:
+                logger.error(f"Scheduler Fehler: {e}")
+                self._wakeup.wait(60)
+                self._wakeup.clear()
+
+
+def _run_scheduled_scan(settings: dict, profile: Optional[str] = None) -> str:
+    """Führt einen geplanten Scan als Job aus (erscheint in der UI mit Log). Gibt den Job-Status zurück."""
+    import jobs  # Lazy import - kein Circular Import
+
+    jobs.ensure_jobs_db()
+    job = jobs.create_scan_job(source="scheduler", profile=profile, settings=settings)
+    job_id = job["job_id"]
+    log_path = job.get("log_path")
+
+    def job_log(msg):
+        """Schreibt ins Job-Log-File und an Logger."""
+        logger.info(f"[AUTO-SCAN] {msg}")
+        if log_path:
+            try:
+                jobs.append_job_log_path(log_path, msg)
+            except Exception:
+                pass
+
+    scan_profile = logic.new_scan_profile(settings)
+    try:
+        result = logic.start_scan(
+            settings,
+            progress_bar=None,
+            log_callback=job_log,
+            cancel_flag=lambda: jobs.is_cancel_requested(job_id),
+            source="scheduler",
+            mark_run_date=False,
+            scan_profile=scan_profile,
+        )
+        if result is not None:
+            jobs.set_job_status(job_id, status="success", stats=result, timings=scan_profile.to_dict())
+            logic.update_last_run_date(dt.datetime.now().strftime("%Y-%m-%d"))
+            logger.info("⏰ Geplanter Scan abgeschlossen.")
+            return "success"
+        else:
+            jobs.set_job_status(job_id, status="cancelled", stats=None, error="Scan bereits aktiv")
+            logger.info("⏭️ Geplanter Scan übersprungen (Scan läuft bereits).")
+            return "cancelled"
+    except Exception as scan_error:
+        jobs.set_job_status(job_id, status="failed", stats=None, error=str(scan_error),
+                            timings=scan_profile.to_dict())
+        logger.error(f"Fehler beim geplanten Scan: {scan_error}")
+        return "failed"
+
+
+def _run_maintenance() -> str:
+    """DB-Wartung (nicht während eines Scans; sonst beim nächsten Termin). Gibt den Status zurück."""
+    import jobs  # Lazy import - kein Circular Import
+
+    if logic.scan_active():
+        logger.info("🧹 DB-Wartung übersprungen (Scan läuft).")
+        return "skipped"
+    today = dt.datetime.now().strftime("%Y-%m-%d")
+    try:
+        logic.ensure_db()
+        jobs.ensure_jobs_db()
+        # History-Retention vor VACUUM, damit der freigewordene Platz gleich zurückgegeben wird
+        history_removed = logic.compact_state_history()
+        report = jobs.run_db_maintenance()
+        report["history_removed"] = history_removed
+        report["query_plans_ok"] = logic.check_query_plans()["ok"]
+        logic.update_run_state(last_maintenance_date=today, last_maintenance_report=report)
+        logger.info(
+            f"🧹 DB-Wartung: {report['reclaimed_bytes'] / 1024 / 1024:.1f} MB freigegeben, "
+            f"{history_removed} History-Einträge kompaktiert, "
+            f"Integrität: {report['integrity']}, Dauer {report['duration_s']}s"
+        )
+        return "success"
+    except Exception as e:
+        logger.error(f"Fehler bei der DB-Wartung: {e}")
+        return "failed"
+
+
+_scheduler: Optional[Scheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            logic.subscribe_settings(lambda _settings: _scheduler.notify_settings_changed())
+            # Sonst sähe ein schlafender Scheduler Änderungen aus CLI/anderen Prozessen erst nach MAX_SLEEP_SECONDS
+            logic.watch_settings()
+        return _scheduler
+
+
+def notify_settings_changed() -> None:
+    """Weckt den Scheduler (falls gestartet), damit neue Settings sofort gelten."""
+    if _scheduler is not None:
+        _scheduler.notify_settings_changed()
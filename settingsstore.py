@@ -0,0 +1,180 @@
+"""
+Gecachte settings.json.
+
+Die geparste und validierte Konfiguration bleibt im Speicher; jeder Zugriff prüft nur
+per stat(), ob sich die Datei geändert hat (mtime_ns, Größe, Inode). Schreiben erfolgt
+atomar (Temp-Datei + fsync + os.replace), Leser sehen also nie eine halb geschriebene
+Datei. Subscriber werden nach jeder Änderung benachrichtigt - bei save() sofort, bei
+Änderungen durch andere Prozesse beim nächsten Zugriff bzw. spätestens nach einem
+Intervall des Watchers (watch()), der nur per stat() prüft.
+"""
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prüfintervall des Watchers: ein stat() alle paar Sekunden kostet praktisch nichts
+WATCH_INTERVAL_SECONDS = 5.0
+
+Settings = Dict[str, Any]
+Subscriber = Callable[[Settings], None]
+
+
+def _copy(value):
+    """Kopie für Aufrufer: Dicts/Listen rekursiv, Skalare geteilt (JSON-Daten, daher ohne deepcopy-Memo)."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class SettingsStore:
+    def __init__(self, path: str, defaults: Settings, validate: Optional[Callable[[Settings], Settings]] = None):
+        self.path = path
+        self.defaults = copy.deepcopy(defaults)
+        self._validate = validate or (lambda data: data)
+        self._lock = threading.RLock()
+        self._settings: Optional[Settings] = None
+        self._file_key: Optional[Tuple[int, int, int]] = None
+        self._subscribers: List[Subscriber] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        self.version = 0
+
+    def _stat_key(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def _read_file(self) -> Optional[Settings]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(f"Error loading settings: {e}")
+            return None
+        if not isinstance(data, dict):
+            logger.error("Error loading settings: settings.json enthält kein Objekt")
+            return None
+        return data
+
+    def _refresh(self) -> bool:
+        """Lädt neu, falls sich die Datei geändert hat. True = neue Settings."""
+        key = self._stat_key()
+        if self._settings is not None and key == self._file_key:
+            return False
+        data = self._read_file()
+        if data is None:
+            if self._settings is not None:
+                # Kaputte Datei: letzten gültigen Stand behalten, erst nach der nächsten Änderung neu lesen
+                self._file_key = key
+                return False
+            data = {}
+        self._settings = self._validate({**copy.deepcopy(self.defaults), **data})
+        self._file_key = key
+        self.version += 1
+        return True
+
+    def poll(self) -> int:
+        """Prüft auf Änderungen der Datei (ohne Kopie) und gibt die aktuelle Version zurück."""
+        with self._lock:
+            changed = self._refresh() and self.version > 1
+            current = _copy(self._settings) if changed else None
+        if current is not None:
+            self._notify(current)
+        return self.version
+
+    def get(self) -> Settings:
+        """Kopie der aktuellen Settings (Aufrufer dürfen sie verändern)."""
+        self.poll()
+        with self._lock:
+            return _copy(self._settings)
+
+    def save(self, settings: Settings) -> Settings:
+        """Validiert, schreibt atomar und benachrichtigt die Subscriber."""
+        with self._lock:
+            validated = self._validate({**copy.deepcopy(self.defaults), **copy.deepcopy(settings)})
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(validated, f, indent=4, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                try:
+                    os.chmod(tmp_path, os.stat(self.path).st_mode & 0o777)
+                except OSError:
+                    pass
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._settings = validated
+            self._file_key = self._stat_key()
+            self.version += 1
+            current = _copy(validated)
+        self._notify(current)
+        return current
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._file_key = None
+
+    def watch(self, interval: float = WATCH_INTERVAL_SECONDS) -> None:
+        """Startet (einmalig) einen Daemon-Thread, der die Datei pollt, damit Änderungen anderer
+        Prozesse die Subscriber auch ohne eigenen Zugriff erreichen."""
+        with self._lock:
+            if self._watcher is not None and self._watcher.is_alive():
+                return
+            self._watch_stop.clear()
+            self._watcher = threading.Thread(target=self._watch_loop, args=(interval,),
+                                             name="settings-watcher", daemon=True)
+            self._watcher.start()
+
+    def stop_watch(self) -> None:
+        self._watch_stop.set()
+        watcher = self._watcher
+        if watcher is not None:
+            watcher.join(timeout=5)
+        self._watcher = None
+
+    def _watch_loop(self, interval: float) -> None:
+        while not self._watch_stop.wait(interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Settings-Watcher fehlgeschlagen: {e}")
+
+    def subscribe(self, callback: Subscriber) -> Callable[[], None]:
+        """Registriert einen Callback für geänderte Settings; gibt eine Abmelde-Funktion zurück."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _notify(self, settings: Settings) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(_copy(settings))
+            except Exception as e:
+                logger.error(f"Settings-Subscriber fehlgeschlagen: {e}")
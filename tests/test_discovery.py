@@ -0,0 +1,15 @@
+from types import SimpleNamespace
+
+import logic
+
+
+def test_fetched_seasons_are_counted_separately():
+    fetched = [
+        (1, "Filme", SimpleNamespace(TYPE="movie")),
+        (2, "Serien", SimpleNamespace(TYPE="episode")),
+        (3, "Serien", SimpleNamespace(TYPE="season")),
+    ]
+    result = logic.DiscoveryResult(candidates=[])
+    logic._count_fetched(result, fetched)
+    assert result.checked == 2
+    assert result.seasons_checked == 1
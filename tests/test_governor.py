@@ -0,0 +1,58 @@
+"""LoadGovernor gegen den /status/sessions-Stub von fakeplex."""
+import asyncio
+
+import pytest
+from plexapi.server import PlexServer
+
+from fakeplex import FakePlexConfig, start_fake_plex
+from governor import LoadGovernor
+
+
+@pytest.fixture
+def plex():
+    server, url, lib = start_fake_plex(FakePlexConfig(movies=1))
+    try:
+        yield PlexServer(url, "x"), lib.config
+    finally:
+        server.shutdown()
+
+
+def test_sample_counts_streams_and_transcodes(plex):
+    server, config = plex
+    config.sessions, config.transcodes = 3, 1
+    assert LoadGovernor(server, 2).sample() == (3, 1)
+
+
+@pytest.mark.parametrize("max_concurrency, sessions, transcodes, expected", [
+    (1, 0, 0, 1),
+    (1, 1, 0, 0),   # Default fix_concurrency=1: schon ein Direct-Play-Stream pausiert
+    (4, 1, 0, 3),
+    (4, 4, 0, 0),
+    (4, 6, 0, 0),
+    (4, 1, 1, 0),   # Transcode >= pause_transcodes
+])
+def test_compute_limit(max_concurrency, sessions, transcodes, expected):
+    assert LoadGovernor(None, max_concurrency, pause_transcodes=1).compute_limit(sessions, transcodes) == expected
+
+
+def test_pause_while_streaming_then_resume(plex):
+    server, config = plex
+    config.sessions, config.transcodes = 1, 0
+    governor = LoadGovernor(server, 1, interval=60, pause_transcodes=0, log_callback=lambda msg: None)
+
+    async def run():
+        await governor.start()
+        try:
+            assert governor.limit == 0
+            waiter = asyncio.create_task(governor.acquire(lambda: False))
+            await asyncio.sleep(0.2)
+            assert not waiter.done()
+            config.sessions = 0
+            await governor.refresh()
+            assert await asyncio.wait_for(waiter, 2) is True
+            await governor.release()
+        finally:
+            await governor.stop()
+
+    asyncio.run(run())
+    assert governor.paused_seconds > 0
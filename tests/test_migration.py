@@ -0,0 +1,57 @@
+"""Upgrade einer DB im Ausgangsschema (TEXT-Tabelle media_state) auf media_items."""
+import datetime as dt
+import sqlite3
+
+import pytest
+
+import logic
+
+BASELINE_SCHEMA = """
+    CREATE TABLE media_state(
+        rating_key TEXT PRIMARY KEY,
+        library TEXT,
+        title TEXT,
+        updated_at TEXT,
+        state TEXT,
+        note TEXT,
+        last_scan TEXT
+    )
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    path = str(tmp_path / "refresh_state.db")
+    monkeypatch.setattr(logic, "DB_PATH", path)
+    monkeypatch.setattr(logic, "STATE_FILE", str(tmp_path / "run_state.json"))
+    monkeypatch.setattr(logic, "load_settings", lambda: {"failed_backoff_hours": 2})
+    monkeypatch.setattr(logic, "_library_ids", {})
+    conn = sqlite3.connect(path)
+    conn.execute(BASELINE_SCHEMA)
+    conn.executemany("INSERT INTO media_state VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        ("101", "Filme", "Kaputt", "2024-05-01T10:00:00", "failed", "Timeout", "2024-05-01T10:00:00"),
+        ("102", "Filme", "Heil", "2024-05-02T10:00:00", "fixed", "ok", "2024-05-02T10:00:00"),
+        ("kein-key", "Filme", "Müll", None, "failed", None, None),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_migrated_failed_rows_keep_backoff(baseline_db):
+    logic.init_db()
+    conn = sqlite3.connect(baseline_db)
+    rows = {r[0]: r[1:] for r in conn.execute(
+        "SELECT rating_key, state, last_scan, attempt_count, next_eligible_at FROM media_items")}
+    conn.close()
+    failed_scan = int(dt.datetime.fromisoformat("2024-05-01T10:00:00").timestamp())
+    assert rows[101] == (logic.STATE_CODES["failed"], failed_scan, 1, failed_scan + 2 * 3600)
+    assert rows[102][2:] == (0, None)
+    assert set(rows) == {101, 102}
+
+
+def test_migrated_failed_rows_wait_for_backoff(baseline_db):
+    logic.init_db()
+    failed_scan = int(dt.datetime.fromisoformat("2024-05-01T10:00:00").timestamp())
+    assert logic.select_retry_candidates(now=failed_scan + 3600) == []
+    assert [r["rating_key"] for r in logic.select_retry_candidates(now=failed_scan + 2 * 3600)] == [101]
@@ -0,0 +1,25 @@
+"""Profil-Overrides werden nach SETTINGS_SCHEMA geprüft (wie validate_settings)."""
+import pytest
+
+import logic
+
+
+def test_overrides_keep_type_and_value():
+    [profile] = logic.normalize_profiles([{
+        "name": "nacht", "days": "7", "failed_backoff_hours": 0.5, "time_budget_minutes": 12.5,
+        "finish_by": "06:30", "dry_run": True, "fix_concurrency": 2,
+    }])
+    assert profile["days"] == 7
+    assert profile["failed_backoff_hours"] == 0.5  # nicht auf 0 abgeschnitten (= Backoff aus)
+    assert profile["time_budget_minutes"] == 12.5
+    assert profile["finish_by"] == "06:30"
+    assert profile["dry_run"] is True
+
+
+@pytest.mark.parametrize("override", [
+    {"days": 0}, {"max_items": 0}, {"fix_concurrency": 9}, {"failed_backoff_hours": -1},
+    {"time_budget_minutes": -5}, {"finish_by": "25:00"}, {"days": 1.5}, {"max_items": "viele"},
+])
+def test_invalid_overrides_raise(override):
+    with pytest.raises(ValueError):
+        logic.normalize_profiles([{"name": "x", **override}])
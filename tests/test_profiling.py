@@ -0,0 +1,46 @@
+"""Blockierte Zeit wird genau einer Art zugeordnet (keine Doppelzählung verschachtelter Blöcke)."""
+import asyncio
+import time
+
+import profiling
+
+
+def _plex_call_with_db():
+    time.sleep(0.05)
+    with profiling.block("sqlite"):
+        time.sleep(0.1)
+
+
+def test_nested_sqlite_is_not_counted_as_plex():
+    profile = profiling.ScanProfile()
+    token = profiling.activate(profile)
+    try:
+        profiling.enter_phase("phase3")
+        asyncio.run(profiling.to_thread(_plex_call_with_db))
+        profile.finish()
+    finally:
+        profiling.deactivate(token)
+    data = profile.to_dict()
+    blocked = data["blocked"]
+    assert 0.09 <= blocked["sqlite_s"] < 0.15
+    assert 0.04 <= blocked["plex_s"] < 0.09
+    assert blocked["plex_s"] + blocked["sqlite_s"] <= data["wall_s"]
+    # to_thread-Statistik behält die volle Dauer des Aufrufs
+    assert data["to_thread"]["calls"] == 1 and data["to_thread"]["seconds"] >= 0.15
+
+
+def test_parallel_workers_are_attributed_separately():
+    profile = profiling.ScanProfile()
+    token = profiling.activate(profile)
+
+    async def run():
+        await asyncio.gather(*(profiling.to_thread(_plex_call_with_db) for _ in range(3)))
+
+    try:
+        asyncio.run(run())
+        profile.finish()
+    finally:
+        profiling.deactivate(token)
+    blocked = profile.to_dict()["blocked"]
+    assert 0.27 <= blocked["sqlite_s"] < 0.4
+    assert 0.12 <= blocked["plex_s"] < 0.25
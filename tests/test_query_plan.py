@@ -0,0 +1,85 @@
+"""Retry-Pool-Abfrage muss den partiellen Index idx_media_items_retry nutzen (temporäre DB)."""
+import random
+import sqlite3
+
+import pytest
+
+import logic
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(logic, "DB_PATH", str(tmp_path / "refresh_state.db"))
+    monkeypatch.setattr(logic, "STATE_FILE", str(tmp_path / "run_state.json"))
+    logic.init_db()
+    return logic.DB_PATH
+
+
+def _fill(path, rows=5000):
+    rnd = random.Random(1)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO libraries(id, name) VALUES (?, ?)", [(1, "Filme"), (2, "Serien"), (3, "Doku")])
+    scans = rnd.sample(range(10 ** 6), rows)  # eindeutig, damit ORDER BY last_scan deterministisch ist
+    conn.executemany(
+        "INSERT INTO media_items(rating_key, library_id, state, last_scan, next_eligible_at) VALUES (?, ?, ?, ?, ?)",
+        [(i, rnd.randint(1, 3), rnd.choice([0, 0, 0, 0, 1, 2, 3]), scans[i - 1],
+          rnd.choice([None, rnd.randint(0, 2 * 10 ** 6)])) for i in range(1, rows + 1)])
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def _assert_retry_index(report):
+    assert report["ok"], report["reasons"]
+    for details in report["plans"].values():
+        # Kein Full-Scan: erlaubt ist nur der geordnete Scan des partiellen Index (nur failed-Zeilen,
+        # schon in last_scan DESC, Abbruch nach LIMIT) - siehe logic.RETRY_INDEX_PLAN
+        scans = [d for d in details if d.startswith("SCAN m")]
+        assert all(d.startswith(logic.RETRY_INDEX_PLAN) for d in scans), f"Full-Scan von media_items: {details}"
+        assert any("USING INDEX idx_media_items_retry" in d for d in details), details
+        assert not any("TEMP B-TREE" in d for d in details), f"Sortierung nicht über den Index: {details}"
+
+
+def test_plan_empty_db(db):
+    _assert_retry_index(logic.check_query_plans())
+
+
+def test_plan_after_analyze(db):
+    _fill(db)
+    _assert_retry_index(logic.check_query_plans())
+
+
+def test_old_index_is_replaced(db):
+    conn = sqlite3.connect(db)
+    conn.execute("DROP INDEX idx_media_items_retry")
+    conn.execute("CREATE INDEX idx_media_items_retry ON media_items(library_id, last_scan, next_eligible_at) "
+                 f"WHERE state = {logic.STATE_CODES['failed']}")
+    conn.commit()
+    conn.close()
+    logic.init_db()
+    _assert_retry_index(logic.check_query_plans())
+
+
+def test_select_retry_candidates_order_and_filters(db):
+    _fill(db)
+    now = 10 ** 6
+    got = logic.select_retry_candidates(["Filme", "Doku"], limit=20, now=now)
+    conn = sqlite3.connect(db)
+    expected = conn.execute(
+        "SELECT m.rating_key, l.name FROM media_items m JOIN libraries l ON l.id = m.library_id "
+        "WHERE m.state = ? AND l.name IN ('Filme', 'Doku') AND (m.next_eligible_at IS NULL OR m.next_eligible_at <= ?) "
+        "ORDER BY m.last_scan DESC LIMIT 20", (logic.STATE_CODES["failed"], now)).fetchall()
+    conn.close()
+    assert [(r["rating_key"], r["library"]) for r in got] == [tuple(r) for r in expected]
+
+
+def test_missing_index_degrades(db):
+    _fill(db)
+    expected = logic.select_retry_candidates(limit=10, now=10 ** 6)
+    conn = sqlite3.connect(db)
+    conn.execute("DROP INDEX idx_media_items_retry")
+    conn.commit()
+    conn.close()
+    assert logic.select_retry_candidates(limit=10, now=10 ** 6) == expected
+    report = logic.check_query_plans()
+    assert not report["ok"] and set(report["regressions"]) == {"retry_pool", "retry_pool_libraries"}
@@ -0,0 +1,25 @@
+import json
+import time
+
+import settingsstore
+
+
+def test_watcher_notifies_external_change(tmp_path):
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({"days": 7}))
+    store = settingsstore.SettingsStore(str(path), {"days": 30})
+    assert store.get()["days"] == 7
+
+    seen = []
+    store.subscribe(seen.append)
+    store.watch(interval=0.05)
+    try:
+        # Anderer Prozess schreibt; niemand ruft get()/poll() auf
+        time.sleep(0.02)
+        path.write_text(json.dumps({"days": 14, "padding": "x"}))
+        deadline = time.monotonic() + 2
+        while not seen and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        store.stop_watch()
+    assert seen and seen[-1]["days"] == 14